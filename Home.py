@@ -8,17 +8,29 @@ from typing import List, Optional, Tuple
 import streamlit as st
 from audio_recorder_streamlit import audio_recorder
 
+from app.admission import AdmissionRejected, acquire, admit
+from app.audio_ingest import AUDIO_MIME_TYPES
 from app.constants import CLASS_BY_NAME, CLASS_OPTIONS
-from app.storage import (
-    ensure_entry_dir,
-    save_audio,
-    save_text,
-    save_uploaded_files,
-)
+from app.image_ingest import IMAGE_INGEST_ENABLED, IMAGE_MAX_EDGE
+from app.resumable_upload import render_resumable_uploader
+from app.save_pipeline import get_save_pipeline
+from app.sidecar import start_sidecar
+from app.storage import DATA_ROOT
 from app.styling import inject_base_css
-from app.transcription import AudioState, TranscriptionRuntimeError, transcribe_audio
+from app.transcription import (
+    TRANSCRIPT_UPGRADES_ENABLED,
+    AudioState,
+    TranscriptionRuntimeError,
+    transcribe_audio_detailed,
+)
+from app.usage import quota_status
 
 
+RECENT_SAVES_SHOWN = 5
+SAVE_STATUS_ICONS = {"pending": "⏳", "retrying": "🔁", "complete": "✅", "failed": "❌"}
+# Statuses the save pipeline may still move on from.
+SAVE_IN_PROGRESS = {"pending", "retrying"}
+
 def _display_feedback(feedback: Optional[Tuple[str, str]]) -> None:
     if not feedback:
         return
@@ -63,7 +75,7 @@ def _render_header() -> None:
     """, unsafe_allow_html=True)
 
 
-def _render_recorder_controls() -> None:
+def _render_recorder_controls(class_name: str) -> None:
     st.session_state.setdefault("transcription_request", False)
     st.session_state.setdefault("transcription_error", None)
     st.session_state.setdefault("transcription_error_detail", None)
@@ -95,7 +107,8 @@ def _render_recorder_controls() -> None:
     st.markdown("</div>", unsafe_allow_html=True)
 
     if audio_bytes and AudioState.needs_update(audio_bytes):
-        AudioState.set_audio(audio_bytes, None)
+        with st.spinner("Preparing audio..."):
+            AudioState.set_recording(audio_bytes)
         st.session_state["transcription_request"] = True
         st.session_state["transcription_error"] = None
         st.session_state["transcription_error_detail"] = None
@@ -105,8 +118,17 @@ def _render_recorder_controls() -> None:
 
     if stored_audio and st.session_state.get("transcription_request"):
         try:
-            with st.spinner("Transcribing audio..."):
-                transcript = transcribe_audio(stored_audio)
+            with admit("transcribe"), st.spinner("Transcribing audio..."):
+                transcript = transcribe_audio_detailed(
+                    stored_audio,
+                    profile="fast",
+                    class_slug=CLASS_BY_NAME[class_name].slug,
+                )
+        except AdmissionRejected as exc:
+            # Leaves the recording in place so the retry button can resubmit it.
+            st.session_state["transcription_error"] = str(exc)
+            st.session_state["transcription_error_detail"] = None
+            st.session_state["transcription_feedback"] = ("warning", str(exc))
         except TranscriptionRuntimeError as exc:  # pragma: no cover - runtime safety net
             detail = str(exc.__cause__) if exc.__cause__ else str(exc)
             st.session_state["transcription_error"] = str(exc)
@@ -128,7 +150,7 @@ def _render_recorder_controls() -> None:
             )
         else:
             if transcript:
-                AudioState.set_audio(stored_audio, transcript)
+                AudioState.set_transcript(transcript.text, transcript.segments)
                 st.session_state["transcription_error"] = None
                 st.session_state["transcription_error_detail"] = None
                 st.session_state["transcription_feedback"] = (
@@ -150,9 +172,11 @@ def _render_recorder_controls() -> None:
     transcript_text = AudioState.get_transcript()
 
     if stored_audio:
-        st.audio(stored_audio, format="audio/wav")
+        st.audio(stored_audio, format=AUDIO_MIME_TYPES.get(AudioState.get_suffix(), "audio/wav"))
         if transcript_text:
             st.markdown("**Voice transcript**")
+            if TRANSCRIPT_UPGRADES_ENABLED:
+                st.caption("Quick draft. A more accurate transcript replaces it in the background after saving.")
             st.markdown(
                 f"<div class='entry-text'>{transcript_text}</div>",
                 unsafe_allow_html=True,
@@ -172,6 +196,39 @@ def _render_recorder_controls() -> None:
                     st.rerun()
 
 
+def _render_recent_saves() -> None:
+    ticket_ids = st.session_state.get("save_tickets") or []
+    if not ticket_ids:
+        return
+    pipeline = get_save_pipeline()
+    tickets = [ticket for ticket in map(pipeline.get, ticket_ids) if ticket]
+    if not tickets:
+        return
+    pending = any(ticket.status in SAVE_IN_PROGRESS for ticket in tickets)
+
+    @st.fragment(run_every=1.5 if pending else None)
+    def _status_list() -> None:
+        rows = []
+        for ticket in tickets:
+            icon = SAVE_STATUS_ICONS.get(ticket.status, "ℹ️")
+            detail = f" · {ticket.summary}" if ticket.summary else ""
+            if ticket.status in {"failed", "retrying"} and ticket.error:
+                detail += f" · {ticket.error}"
+            rows.append(
+                f"<li>{icon} {ticket.submitted_at.strftime('%H:%M:%S')} → "
+                f"<code>{ticket.target}</code>{detail}</li>"
+            )
+        st.markdown(
+            "<div class='field-label'>Recent saves</div>"
+            f"<ul style='padding-left:1.1rem;margin-top:0.3rem;'>{''.join(rows)}</ul>",
+            unsafe_allow_html=True,
+        )
+        if pending and all(ticket.status not in SAVE_IN_PROGRESS for ticket in tickets):
+            st.rerun()
+
+    _status_list()
+
+
 def _validate_inputs(
     uploaded_files: List,
     text_input: str,
@@ -187,6 +244,7 @@ def _handle_save(
     selected_date: dt.date,
     uploaded_files: List,
     text_input: str,
+    keep_originals: bool = False,
 ) -> None:
     uploads = list(uploaded_files)
     audio_bytes = AudioState.get_audio()
@@ -196,34 +254,46 @@ def _handle_save(
     if validation_error:
         st.warning(validation_error)
         return
+    incoming_bytes = sum(len(file.getbuffer()) for file in uploads if file) + len(audio_bytes or b"")
+    quota = quota_status(DATA_ROOT, CLASS_BY_NAME[class_name].slug, incoming_bytes)
+    if quota is not None and quota[0] == "error":
+        st.error(quota[1])
+        return
 
-    class_info = CLASS_BY_NAME[class_name]
-    entry_dir = ensure_entry_dir(class_name, selected_date)
-    save_uploaded_files(entry_dir, uploads)
-
-    if has_audio and audio_bytes:
-        save_audio(entry_dir, audio_bytes)
-        if transcript_text:
-            save_text(entry_dir, "voice_transcript.txt", transcript_text)
-
-    if text_input.strip():
-        save_text(entry_dir, "notes.txt", text_input)
+    try:
+        release = acquire("save")
+    except AdmissionRejected as exc:
+        st.warning(str(exc))
+        return
 
-    summary_parts: List[str] = []
-    if uploads:
-        summary_parts.append(
-            f"{len(uploads)} upload{'s' if len(uploads) != 1 else ''}"
+    try:
+        ticket = get_save_pipeline().submit(
+            class_name,
+            selected_date,
+            uploads,
+            audio_bytes if has_audio else None,
+            transcript_text,
+            text_input,
+            segments=AudioState.get_segments(),
+            audio_suffix=AudioState.get_suffix(),
+            keep_originals=keep_originals,
+            # The slot is held until the background write finishes.
+            on_complete=release,
         )
-    if has_audio:
-        summary_parts.append("audio clip")
-    if text_input.strip():
-        summary_parts.append("typed notes")
-
-    attachment_summary = f" ({', '.join(summary_parts)})" if summary_parts else ""
+    except Exception:
+        release()
+        raise
+    recent = st.session_state.setdefault("save_tickets", [])
+    recent.insert(0, ticket.ticket_id)
+    del recent[RECENT_SAVES_SHOWN:]
+
+    attachment_summary = f" ({ticket.summary})" if ticket.summary else ""
     feedback = (
         "success",
-        f"Saved entry to {class_info.slug}/{selected_date.isoformat()}{attachment_summary}.",
+        f"Saving entry to {ticket.target}{attachment_summary}. You can keep capturing.",
     )
+    if quota is not None:
+        feedback = ("warning", f"{feedback[1]} {quota[1]}")
     st.session_state["save_feedback"] = feedback
     st.session_state["save_feedback_inline"] = feedback
     AudioState.clear()
@@ -301,11 +371,25 @@ def main() -> None:
             ],
             key="media_uploader",
         )
+        keep_originals = False
+        if IMAGE_INGEST_ENABLED:
+            keep_originals = st.checkbox(
+                "Keep full-resolution originals",
+                key="keep_originals",
+                help=f"By default photos are rotated upright, stripped of location data and capped at {IMAGE_MAX_EDGE}px.",
+            )
         if uploaded_files:
             st.markdown(f"<div class='file-count-badge'>{len(uploaded_files)} file{'s' if len(uploaded_files) > 1 else ''} selected</div>", unsafe_allow_html=True)
         st.caption(
             "💡 Tip: On mobile, pick \"Camera\" after tapping the uploader to snap a photo or video directly."
         )
+        with st.expander("Long recordings: resumable upload"):
+            start_sidecar()
+            st.caption(
+                "Uploads in small verified chunks and picks up where it left off if the Wi-Fi drops."
+                " Each upload batch becomes its own entry."
+            )
+            render_resumable_uploader(class_name, selected_date)
 
     # Typed Notes Section
     with st.container(key="typed-notes-section"):
@@ -322,7 +406,7 @@ def main() -> None:
     # Voice Recorder Section
     with st.container(key="voice-recorder-section"):
         st.markdown("<div class='section-header'><span class='section-icon'>🎙️</span> Voice Recorder</div>", unsafe_allow_html=True)
-        _render_recorder_controls()
+        _render_recorder_controls(class_name)
 
     # Close sections container
     st.markdown("</div>", unsafe_allow_html=True)
@@ -344,12 +428,15 @@ def main() -> None:
             selected_date,
             list(uploaded_files or []),
             text_input,
+            keep_originals,
         )
 
     inline_feedback = st.session_state.get("save_feedback_inline")
     if inline_feedback:
         _render_inline_feedback(inline_feedback)
 
+    _render_recent_saves()
+
 
 if __name__ == "__main__":
     main()
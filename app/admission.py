@@ -0,0 +1,222 @@
+"""Admission control for expensive operations.
+
+Transcription, saves and deletes all run on the machine that serves the
+gallery. Each operation has a global and a per-session concurrency limit
+plus token-bucket rate limits. A request over a limit is rejected at once
+with an estimate of when to retry, instead of queueing behind other users
+and stalling every page.
+
+Limits are read from the environment as ``ADMISSION_<OPERATION>_<LIMIT>``,
+for example ``ADMISSION_TRANSCRIBE_GLOBAL=2``. The limits are ``GLOBAL`` and
+``SESSION`` (concurrent operations), ``PER_MINUTE`` (sustained rate per
+session) and ``BURST`` (bucket size). ``ADMISSION_ENABLED=0`` turns
+everything off.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import streamlit as st
+
+from .metrics import observe
+from .transcription import pool_settings
+
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1").lower() in {"1", "true", "yes"}
+MAX_TRACKED_BUCKETS = 2000
+
+
+@dataclass(frozen=True)
+class Limits:
+    global_concurrency: int
+    session_concurrency: int
+    per_minute: float
+    burst: int
+    # Rough duration of one operation, used to suggest a retry time when full.
+    typical_seconds: float
+    busy_message: str
+
+
+def _limits(
+    operation: str,
+    global_concurrency: int,
+    session_concurrency: int,
+    per_minute: float,
+    burst: int,
+    typical_seconds: float,
+    busy_message: str,
+) -> Limits:
+    def setting(name: str, default: float) -> float:
+        return float(os.environ.get(f"ADMISSION_{operation.upper()}_{name}", default))
+
+    return Limits(
+        global_concurrency=int(setting("GLOBAL", global_concurrency)),
+        session_concurrency=int(setting("SESSION", session_concurrency)),
+        per_minute=setting("PER_MINUTE", per_minute),
+        burst=int(setting("BURST", burst)),
+        typical_seconds=typical_seconds,
+        busy_message=busy_message,
+    )
+
+
+OPERATION_LIMITS: Dict[str, Limits] = {
+    # One transcription per Whisper instance, so the default follows WHISPER_POOL_SIZE.
+    "transcribe": _limits(
+        "transcribe", pool_settings()[0], 1, 6, 3, typical_seconds=10, busy_message="Transcription is busy"
+    ),
+    "save": _limits("save", 4, 2, 12, 4, typical_seconds=5, busy_message="Saving is busy"),
+    "delete": _limits("delete", 2, 1, 20, 5, typical_seconds=2, busy_message="Deleting is busy"),
+}
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when an operation is over a limit; ``retry_after`` is in seconds."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"{message}, retry in {self.retry_after} s.")
+
+
+class TokenBucket:
+    """Classic token bucket: ``capacity`` tokens, refilled at ``rate`` per second."""
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (``0`` if one is available now)."""
+
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate else math.inf
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        return self.tokens >= self.capacity
+
+
+class AdmissionController:
+    """Tracks running operations and rate buckets for every session."""
+
+    def __init__(self, limits: Dict[str, Limits] = OPERATION_LIMITS) -> None:
+        self._limits = limits
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = defaultdict(int)
+        self._session_running: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _bucket(self, operation: str, session_id: str, limits: Limits) -> TokenBucket:
+        key = (operation, session_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_BUCKETS:
+                # Full buckets carry no state worth keeping.
+                for stale in [stale for stale, kept in self._buckets.items() if kept.full]:
+                    del self._buckets[stale]
+            bucket = self._buckets[key] = TokenBucket(limits.burst, limits.per_minute / 60)
+        return bucket
+
+    def acquire(self, operation: str, session_id: str) -> Callable[[], None]:
+        """Claim a slot for ``operation`` or raise :class:`AdmissionRejected`.
+
+        Returns a function that releases the slot; call it exactly once.
+        """
+
+        limits = self._limits[operation]
+        with self._lock:
+            if self._session_running[(operation, session_id)] >= limits.session_concurrency:
+                rejected = AdmissionRejected(
+                    f"{limits.busy_message} with your previous request", limits.typical_seconds
+                )
+            elif self._running[operation] >= limits.global_concurrency:
+                rejected = AdmissionRejected(f"{limits.busy_message} for other users", limits.typical_seconds)
+            else:
+                bucket = self._bucket(operation, session_id, limits)
+                wait = bucket.wait_time(time.monotonic())
+                if wait:
+                    rejected = AdmissionRejected(f"{limits.busy_message}: too many requests", wait)
+                else:
+                    bucket.take()
+                    self._running[operation] += 1
+                    self._session_running[(operation, session_id)] += 1
+                    rejected = None
+        if rejected is not None:
+            observe(f"admission.{operation}.rejected", 1)
+            raise rejected
+
+        released = threading.Event()
+
+        def release() -> None:
+            if released.is_set():
+                return
+            released.set()
+            with self._lock:
+                self._running[operation] -= 1
+                key = (operation, session_id)
+                self._session_running[key] -= 1
+                if not self._session_running[key]:
+                    del self._session_running[key]
+
+        return release
+
+    @contextmanager
+    def admit(self, operation: str, session_id: str) -> Iterator[None]:
+        release = self.acquire(operation, session_id)
+        try:
+            yield
+        finally:
+            release()
+
+
+@st.cache_resource(show_spinner=False)
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide admission controller shared by all sessions."""
+
+    return AdmissionController()
+
+
+def current_session_id() -> str:
+    """Identify the browser session running this script, or ``"default"`` outside one."""
+
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
+
+def acquire(operation: str, session_id: Optional[str] = None) -> Callable[[], None]:
+    """Claim a slot for ``operation`` in the current session; see :meth:`AdmissionController.acquire`."""
+
+    if not ADMISSION_ENABLED:
+        return lambda: None
+    return get_admission_controller().acquire(operation, session_id or current_session_id())
+
+
+@contextmanager
+def admit(operation: str, session_id: Optional[str] = None) -> Iterator[None]:
+    """Run the body as one admitted ``operation`` or raise :class:`AdmissionRejected`."""
+
+    release = acquire(operation, session_id)
+    try:
+        yield
+    finally:
+        release()
@@ -0,0 +1,108 @@
+"""Prepare recorder audio once: 16 kHz mono, loudness-normalised, compactly encoded.
+
+Whisper works on 16 kHz mono PCM, so converting at record time means the
+stored clip is smaller and no later transcription has to resample it again.
+The decoded samples are kept in a small in-process cache keyed by the
+stored bytes, so re-transcribing a clip (for example the background
+``accurate`` pass) can skip decoding entirely.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import numpy as np
+
+
+TARGET_SAMPLE_RATE = 16000
+# ``flac`` is lossless and plays everywhere; ``opus`` (stored as .ogg) is far
+# smaller; ``wav`` keeps uncompressed 16-bit PCM.
+AUDIO_STORE_FORMAT = os.environ.get("AUDIO_STORE_FORMAT", "flac").lower()
+AUDIO_TARGET_DBFS = float(os.environ.get("AUDIO_TARGET_DBFS", "-20"))
+AUDIO_NORMALIZE = os.environ.get("AUDIO_NORMALIZE", "1").lower() in {"1", "true", "yes"}
+PEAK_CEILING_DBFS = -1.0
+PCM_CACHE_ENTRIES = 8
+
+_EXPORT_OPTIONS: Dict[str, Dict[str, object]] = {
+    "flac": {"format": "flac"},
+    "opus": {"format": "ogg", "codec": "libopus", "bitrate": "32k"},
+    "wav": {"format": "wav"},
+}
+_SUFFIXES = {"flac": ".flac", "opus": ".ogg", "wav": ".wav"}
+AUDIO_MIME_TYPES = {".flac": "audio/flac", ".ogg": "audio/ogg", ".wav": "audio/wav"}
+
+_pcm_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_pcm_lock = threading.Lock()
+
+
+@dataclass
+class IngestedAudio:
+    """Encoded clip ready to store, plus its suffix and MIME type."""
+
+    data: bytes
+    suffix: str
+
+    @property
+    def mime_type(self) -> str:
+        return AUDIO_MIME_TYPES.get(self.suffix, "audio/wav")
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _remember_pcm(data: bytes, samples: "np.ndarray") -> None:
+    with _pcm_lock:
+        _pcm_cache[_digest(data)] = samples
+        while len(_pcm_cache) > PCM_CACHE_ENTRIES:
+            _pcm_cache.popitem(last=False)
+
+
+def cached_pcm(data: bytes) -> Optional["np.ndarray"]:
+    """Return 16 kHz float32 samples for previously ingested ``data``, if cached."""
+
+    key = _digest(data)
+    with _pcm_lock:
+        samples = _pcm_cache.get(key)
+        if samples is not None:
+            _pcm_cache.move_to_end(key)
+        return samples
+
+
+def _normalise(segment):
+    """Bring average loudness to ``AUDIO_TARGET_DBFS`` without clipping peaks."""
+
+    if segment.dBFS == float("-inf"):
+        return segment
+    gain = AUDIO_TARGET_DBFS - segment.dBFS
+    gain = min(gain, PEAK_CEILING_DBFS - segment.max_dBFS)
+    return segment.apply_gain(gain)
+
+
+def ingest_audio(audio_bytes: bytes) -> IngestedAudio:
+    """Resample, normalise and encode a recording; pass it through unchanged on failure."""
+
+    try:
+        import numpy as np
+        from pydub import AudioSegment
+
+        segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
+        segment = segment.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE).set_sample_width(2)
+        if AUDIO_NORMALIZE:
+            segment = _normalise(segment)
+        store_format = AUDIO_STORE_FORMAT if AUDIO_STORE_FORMAT in _EXPORT_OPTIONS else "flac"
+        output = io.BytesIO()
+        segment.export(output, **_EXPORT_OPTIONS[store_format])
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32) / 32768.0
+    except Exception:  # pragma: no cover - needs pydub, numpy and ffmpeg at runtime
+        return IngestedAudio(data=audio_bytes, suffix=".wav")
+    ingested = IngestedAudio(data=output.getvalue(), suffix=_SUFFIXES[store_format])
+    _remember_pcm(ingested.data, samples)
+    return ingested
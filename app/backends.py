@@ -0,0 +1,230 @@
+"""Storage backends that persist the files written under ``DATA_ROOT``.
+
+Entries are always assembled under a local root so Streamlit can read and
+serve plain files. The local backend treats that root as the store itself.
+The S3 backend pushes every committed file to an S3-compatible bucket, keeps
+a per-class metadata index in the bucket so listings never issue ``LIST``
+calls, and uses the local root as a bounded read-through cache.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+IndexMutator = Callable[[Dict], None]
+# Small files that listings read; the cache keeps them instead of evicting them.
+PINNED_NAMES = {"metadata.json", "notes.txt", "voice_transcript.txt"}
+
+
+class StorageBackendError(RuntimeError):
+    """Raised when the configured storage backend cannot be used."""
+
+
+class StorageBackend:
+    """Interface used by ``app.storage`` for everything beyond the local root."""
+
+    #: Whether listings should come from the metadata index instead of the tree.
+    uses_index = False
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def key_for(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def commit(self, path: Path) -> None:
+        """Persist a file that was just written under the local root."""
+
+    def materialize(self, path: Path) -> Path:
+        """Return a readable local copy of ``path``; raise ``FileNotFoundError`` if it is not stored."""
+
+        return path
+
+    def remove_entry(self, entry_dir: Path, filenames: List[str]) -> None:
+        """Delete an entry's files from the store (the local tree is handled by the caller)."""
+
+    def read_index(self, class_slug: str) -> Dict:
+        return {"entries": {}}
+
+    def update_index(self, class_slug: str, mutate: IndexMutator) -> None:
+        """Apply ``mutate`` to the class index and store the result."""
+
+
+class LocalBackend(StorageBackend):
+    """Files live only on the local (or shared) volume; the tree is the index."""
+
+
+class S3Backend(StorageBackend):
+    """Persist entries to an S3-compatible bucket with a local read-through cache."""
+
+    uses_index = True
+    max_index_retries = 8
+
+    def __init__(
+        self,
+        root: Path,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        cache_bytes: int = 0,
+    ) -> None:
+        super().__init__(root)
+        try:
+            import boto3
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise StorageBackendError("STORAGE_BACKEND=s3 needs the 'boto3' package.") from exc
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.cache_bytes = cache_bytes
+        # Cached file sizes in least-recently-used order; filled by one scan on first use.
+        self._cache_lock = threading.Lock()
+        self._cached: "Optional[OrderedDict[Path, int]]" = None
+        self._cached_bytes = 0
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _index_key(self, class_slug: str) -> str:
+        return self._object_key(f"index/{class_slug}.json")
+
+    def commit(self, path: Path) -> None:
+        self.client.upload_file(str(path), self.bucket, self._object_key(self.key_for(path)))
+        self._touch(path)
+        self._evict()
+
+    def materialize(self, path: Path) -> Path:
+        if path.exists():
+            os.utime(path)
+            self._touch(path)
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.download")
+        try:
+            self.client.download_file(self.bucket, self._object_key(self.key_for(path)), str(temp_path))
+        except self.client.exceptions.ClientError as exc:
+            temp_path.unlink(missing_ok=True)
+            raise FileNotFoundError(str(path)) from exc
+        temp_path.replace(path)
+        self._touch(path)
+        self._evict()
+        return path
+
+    def remove_entry(self, entry_dir: Path, filenames: List[str]) -> None:
+        keys = [{"Key": self._object_key(self.key_for(entry_dir / name))} for name in filenames]
+        if keys:
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": keys, "Quiet": True})
+        if self.cache_bytes:
+            with self._cache_lock:
+                cached = self._load_cache()
+                for name in filenames:
+                    self._cached_bytes -= cached.pop(entry_dir / name, 0)
+
+    def _get_index(self, class_slug: str):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._index_key(class_slug))
+        except self.client.exceptions.NoSuchKey:
+            return {"entries": {}}, None
+        return json.loads(response["Body"].read()), response["ETag"]
+
+    def read_index(self, class_slug: str) -> Dict:
+        return self._get_index(class_slug)[0]
+
+    def update_index(self, class_slug: str, mutate: IndexMutator) -> None:
+        """Read-modify-write the index with a conditional put, retrying on races."""
+
+        for attempt in range(self.max_index_retries):
+            index, etag = self._get_index(class_slug)
+            mutate(index)
+            condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+            try:
+                self.client.put_object(
+                    Bucket=self.bucket,
+                    Key=self._index_key(class_slug),
+                    Body=json.dumps(index).encode("utf-8"),
+                    ContentType="application/json",
+                    **condition,
+                )
+                return
+            except self.client.exceptions.ClientError as exc:
+                code = exc.response.get("Error", {}).get("Code")
+                if code not in {"PreconditionFailed", "ConditionalRequestConflict"}:
+                    raise
+                time.sleep(0.05 * (2**attempt))
+        raise StorageBackendError(f"Could not update the {class_slug} index after repeated conflicts.")
+
+    def _cacheable(self, path: Path) -> bool:
+        parts = path.relative_to(self.root).parts
+        return path.name not in PINNED_NAMES and not any(part.startswith(".") for part in parts)
+
+    def _load_cache(self) -> "OrderedDict[Path, int]":
+        """Return the LRU of cached files, scanning the local root the first time.
+
+        Call with ``_cache_lock`` held.
+        """
+
+        if self._cached is None:
+            found = [
+                (path.stat(), path) for path in self.root.rglob("*") if path.is_file() and self._cacheable(path)
+            ]
+            self._cached = OrderedDict(
+                (path, stat.st_size) for stat, path in sorted(found, key=lambda item: item[0].st_atime)
+            )
+            self._cached_bytes = sum(self._cached.values())
+        return self._cached
+
+    def _touch(self, path: Path) -> None:
+        """Mark ``path`` as the most recently used cached file."""
+
+        if not self.cache_bytes or not self._cacheable(path):
+            return
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        with self._cache_lock:
+            cached = self._load_cache()
+            self._cached_bytes += size - cached.pop(path, 0)
+            cached[path] = size
+
+    def _evict(self) -> None:
+        """Trim cached media, least recently used first, to ``cache_bytes``."""
+
+        if not self.cache_bytes:
+            return
+        with self._cache_lock:
+            cached = self._load_cache()
+            # Keep the file just used even when it alone is over the limit.
+            while self._cached_bytes > self.cache_bytes and len(cached) > 1:
+                path, size = cached.popitem(last=False)
+                path.unlink(missing_ok=True)
+                self._cached_bytes -= size
+
+
+@lru_cache(maxsize=None)
+def get_backend(root: Path) -> StorageBackend:
+    """Build the backend selected by ``STORAGE_BACKEND`` (``local`` or ``s3``)."""
+
+    kind = os.environ.get("STORAGE_BACKEND", "local").lower()
+    if kind == "local":
+        return LocalBackend(root)
+    if kind == "s3":
+        bucket = os.environ.get("STORAGE_S3_BUCKET")
+        if not bucket:
+            raise StorageBackendError("STORAGE_S3_BUCKET is required when STORAGE_BACKEND=s3.")
+        return S3Backend(
+            root,
+            bucket,
+            prefix=os.environ.get("STORAGE_S3_PREFIX", ""),
+            endpoint_url=os.environ.get("STORAGE_S3_ENDPOINT"),
+            cache_bytes=int(os.environ.get("STORAGE_CACHE_BYTES", str(2 * 1024**3))),
+        )
+    raise StorageBackendError(f"Unknown STORAGE_BACKEND '{kind}'.")
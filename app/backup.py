@@ -0,0 +1,471 @@
+"""Incremental, content-addressed backups of ``DATA_ROOT``.
+
+Run ``python -m app.backup --help`` for usage. Targets are either a local
+directory (``/mnt/backup`` or ``file:///mnt/backup``) or an S3-compatible
+bucket (``s3://bucket/prefix``; set ``BACKUP_S3_ENDPOINT`` for MinIO and
+similar stores, credentials come from the usual ``AWS_*`` variables).
+
+Every file is stored once under ``objects/<sha256>``; each run writes a
+snapshot manifest mapping ``class/date/entry/file`` paths to hashes, so only
+new or changed content is uploaded.
+
+With ``STORAGE_BACKEND=s3`` the local tree is only a cache, so backups list
+files from the metadata index and download any that have been evicted.
+Restores write plain files and so need a local storage backend.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .backends import StorageBackend, get_backend
+from .constants import CLASS_INFOS
+from .storage import DATA_ROOT, INDEX_TEXT_FIELDS
+from .usage import rebuild_usage
+
+
+HASH_CACHE_NAME = ".backup-cache.json"
+READ_CHUNK_BYTES = 1024 * 1024
+DEFAULT_WORKERS = int(os.environ.get("BACKUP_WORKERS", "4"))
+
+
+class BackupError(RuntimeError):
+    """Raised when a backup or restore cannot proceed."""
+
+
+class BandwidthLimiter:
+    """Token bucket shared by all transfer threads, in bytes per second."""
+
+    def __init__(self, bytes_per_second: Optional[int]) -> None:
+        self._rate = bytes_per_second
+        self._tokens = float(bytes_per_second or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> None:
+        if not self._rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._rate, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= min(amount, self._rate):
+                    self._tokens -= amount
+                    return
+                wait = (min(amount, self._rate) - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class _ThrottledReader:
+    """File wrapper that charges every read against a ``BandwidthLimiter``."""
+
+    def __init__(self, handle: BinaryIO, limiter: BandwidthLimiter) -> None:
+        self._handle = handle
+        self._limiter = limiter
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._handle.read(READ_CHUNK_BYTES if size is None or size < 0 else size)
+        self._limiter.consume(len(data))
+        return data
+
+
+class BackupTarget:
+    """Minimal object store interface used by backup and restore."""
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def upload(self, key: str, source: Path, limiter: BandwidthLimiter) -> None:
+        raise NotImplementedError
+
+    def download(self, key: str, destination: Path, limiter: BandwidthLimiter) -> None:
+        raise NotImplementedError
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def list_keys(self, prefix: str) -> List[str]:
+        raise NotImplementedError
+
+
+class LocalTarget(BackupTarget):
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def _copy(self, source: Path, destination: Path, limiter: BandwidthLimiter) -> None:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = destination.with_name(destination.name + ".tmp")
+        with source.open("rb") as reader, temp_path.open("wb") as writer:
+            shutil.copyfileobj(_ThrottledReader(reader, limiter), writer, READ_CHUNK_BYTES)
+        temp_path.replace(destination)
+
+    def upload(self, key: str, source: Path, limiter: BandwidthLimiter) -> None:
+        self._copy(source, self._path(key), limiter)
+
+    def download(self, key: str, destination: Path, limiter: BandwidthLimiter) -> None:
+        try:
+            self._copy(self._path(key), destination, limiter)
+        except FileNotFoundError as exc:
+            raise BackupError(f"Object {key} is missing from the target.") from exc
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + ".tmp")
+        temp_path.write_bytes(data)
+        temp_path.replace(path)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def list_keys(self, prefix: str) -> List[str]:
+        base = self._path(prefix)
+        if not base.exists():
+            return []
+        return sorted(str(path.relative_to(self.root)) for path in base.rglob("*") if path.is_file())
+
+
+class S3Target(BackupTarget):
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None) -> None:
+        try:
+            import boto3
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise BackupError("S3 targets need the 'boto3' package.") from exc
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self.client.exceptions.ClientError:
+            return False
+        return True
+
+    def upload(self, key: str, source: Path, limiter: BandwidthLimiter) -> None:
+        with source.open("rb") as reader:
+            self.client.upload_fileobj(_ThrottledReader(reader, limiter), self.bucket, self._key(key))
+
+    def download(self, key: str, destination: Path, limiter: BandwidthLimiter) -> None:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = destination.with_name(destination.name + ".tmp")
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except self.client.exceptions.ClientError as exc:
+            raise BackupError(f"Object {key} could not be read from the target: {exc}") from exc
+        with temp_path.open("wb") as writer:
+            shutil.copyfileobj(_ThrottledReader(body, limiter), writer, READ_CHUNK_BYTES)
+        temp_path.replace(destination)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def list_keys(self, prefix: str) -> List[str]:
+        keys: List[str] = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            keys.extend(item["Key"][strip:] for item in page.get("Contents", []))
+        return sorted(keys)
+
+
+def open_target(spec: str) -> BackupTarget:
+    """Build a target from ``/path``, ``file:///path`` or ``s3://bucket/prefix``."""
+
+    if spec.startswith("s3://"):
+        bucket, _, prefix = spec[len("s3://") :].partition("/")
+        if not bucket:
+            raise BackupError("S3 targets look like s3://bucket/prefix.")
+        return S3Target(bucket, prefix, os.environ.get("BACKUP_S3_ENDPOINT"))
+    if spec.startswith("file://"):
+        spec = spec[len("file://") :]
+    return LocalTarget(Path(spec))
+
+
+@dataclass
+class FileRecord:
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+def _iter_indexed_files(root: Path, backend: StorageBackend) -> Iterator[Tuple[str, Path]]:
+    for class_info in CLASS_INFOS:
+        for key, record in sorted(backend.read_index(class_info.slug)["entries"].items()):
+            names = {"metadata.json", *record.get("files", []), *record.get("sizes", {})}
+            names.update(name for name, field in INDEX_TEXT_FIELDS.items() if record.get(field) is not None)
+            for name in sorted(names):
+                yield f"{class_info.slug}/{key}/{name}", root / class_info.slug / key / name
+
+
+def iter_data_files(root: Path = DATA_ROOT) -> Iterator[Tuple[str, Path]]:
+    """Yield ``(relative_path, path)`` for files in the class/date/entry layout.
+
+    On an index backend the files come from the metadata index, and paths may
+    not exist locally until they are materialized.
+    """
+
+    backend = get_backend(root)
+    if backend.uses_index:
+        yield from _iter_indexed_files(root, backend)
+        return
+    for class_info in CLASS_INFOS:
+        class_dir = root / class_info.slug
+        if not class_dir.is_dir():
+            continue
+        for date_dir in sorted(class_dir.iterdir()):
+            if not date_dir.is_dir() or date_dir.name.startswith("."):
+                continue
+            for entry_dir in sorted(date_dir.iterdir()):
+                if not entry_dir.is_dir() or entry_dir.name.startswith("."):
+                    continue
+                for path in sorted(entry_dir.iterdir()):
+                    if path.is_file() and not path.name.startswith("."):
+                        yield path.relative_to(root).as_posix(), path
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as reader:
+        while chunk := reader.read(READ_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_key(sha256: str) -> str:
+    return f"objects/{sha256[:2]}/{sha256}"
+
+
+def _load_hash_cache(root: Path) -> Dict[str, FileRecord]:
+    try:
+        raw = json.loads((root / HASH_CACHE_NAME).read_text(encoding="utf-8"))
+        return {path: FileRecord(**record) for path, record in raw.items()}
+    except (OSError, json.JSONDecodeError, TypeError):
+        return {}
+
+
+def _save_hash_cache(root: Path, records: Dict[str, FileRecord]) -> None:
+    temp_path = root / (HASH_CACHE_NAME + ".tmp")
+    temp_path.write_text(
+        json.dumps({path: record.__dict__ for path, record in records.items()}), encoding="utf-8"
+    )
+    temp_path.replace(root / HASH_CACHE_NAME)
+
+
+def scan(root: Path = DATA_ROOT) -> Dict[str, FileRecord]:
+    """Hash the data tree, reusing cached hashes for files whose size and mtime match."""
+
+    backend = get_backend(root)
+    cache = _load_hash_cache(root)
+    records: Dict[str, FileRecord] = {}
+    for relative, path in iter_data_files(root):
+        cached = cache.get(relative)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+        if stat and cached and cached.size == stat.st_size and cached.mtime_ns == stat.st_mtime_ns:
+            records[relative] = cached
+            continue
+        try:
+            stat = backend.materialize(path).stat()
+        except FileNotFoundError:  # deleted since it was listed
+            continue
+        records[relative] = FileRecord(_hash_file(path), stat.st_size, stat.st_mtime_ns)
+    if root.exists():
+        _save_hash_cache(root, records)
+    return records
+
+
+def _latest_snapshot(target: BackupTarget) -> Optional[str]:
+    latest = target.get_bytes("snapshots/LATEST")
+    return latest.decode("utf-8").strip() if latest else None
+
+
+def _load_snapshot(target: BackupTarget, name: str) -> Dict[str, Dict]:
+    raw = target.get_bytes(f"snapshots/{name}.json")
+    if raw is None:
+        raise BackupError(f"Snapshot {name} was not found on the target.")
+    return json.loads(raw)
+
+
+def run_backup(
+    target: BackupTarget,
+    root: Path = DATA_ROOT,
+    workers: int = DEFAULT_WORKERS,
+    bandwidth: Optional[int] = None,
+) -> Tuple[str, int, int]:
+    """Upload new content and record a snapshot. Returns ``(name, uploaded, bytes)``."""
+
+    records = scan(root)
+    known: set = set()
+    previous = _latest_snapshot(target)
+    if previous:
+        known = {item["sha256"] for item in _load_snapshot(target, previous)["files"].values()}
+
+    pending: Dict[str, Path] = {}
+    for relative, record in records.items():
+        if record.sha256 not in known and record.sha256 not in pending:
+            pending[record.sha256] = root / relative
+
+    backend = get_backend(root)
+    limiter = BandwidthLimiter(bandwidth)
+
+    def _upload(item: Tuple[str, Path]) -> int:
+        sha256, path = item
+        key = _object_key(sha256)
+        if target.exists(key):
+            return 0
+        try:
+            # The cache may have evicted the file since it was hashed.
+            path = backend.materialize(path)
+        except FileNotFoundError as exc:
+            raise BackupError(f"{path} was deleted during the backup; run it again.") from exc
+        target.upload(key, path, limiter)
+        return path.stat().st_size
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        sizes = [size for size in executor.map(_upload, pending.items()) if size]
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    name = stamp
+    # Runs in the same second get a counter, so an earlier snapshot is never overwritten.
+    for count in itertools.count(2):
+        if not target.exists(f"snapshots/{name}.json"):
+            break
+        name = f"{stamp}-{count}"
+    snapshot = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "files": {path: {"sha256": record.sha256, "size": record.size} for path, record in records.items()},
+    }
+    target.put_bytes(f"snapshots/{name}.json", json.dumps(snapshot, indent=1).encode("utf-8"))
+    target.put_bytes("snapshots/LATEST", name.encode("utf-8"))
+    return name, len(sizes), sum(sizes)
+
+
+def run_restore(
+    target: BackupTarget,
+    destination: Path = DATA_ROOT,
+    snapshot: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    bandwidth: Optional[int] = None,
+) -> int:
+    """Restore a snapshot into ``destination``, skipping files that already match.
+
+    The usage ledger of every class is recounted afterwards.
+    """
+
+    if get_backend(destination).uses_index:
+        raise BackupError(
+            "Restores write plain files; run them with STORAGE_BACKEND=local into a directory."
+        )
+    name = snapshot or _latest_snapshot(target)
+    if not name:
+        raise BackupError("The target has no snapshots yet.")
+    files = _load_snapshot(target, name)["files"]
+    limiter = BandwidthLimiter(bandwidth)
+
+    def _restore(item: Tuple[str, Dict]) -> int:
+        relative, record = item
+        path = destination / relative
+        if path.exists() and path.stat().st_size == record["size"] and _hash_file(path) == record["sha256"]:
+            return 0
+        target.download(_object_key(record["sha256"]), path, limiter)
+        if _hash_file(path) != record["sha256"]:
+            raise BackupError(f"Checksum mismatch while restoring {relative}.")
+        return 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        restored = sum(executor.map(_restore, files.items()))
+    for class_info in CLASS_INFOS:
+        rebuild_usage(destination, class_info.slug)
+    return restored
+
+
+def _parse_rate(value: Optional[str]) -> Optional[int]:
+    """Parse ``500K``/``4M``/``1G`` (bytes per second) into an integer."""
+
+    if not value:
+        return None
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    suffix = value[-1].upper()
+    if suffix in units:
+        return int(float(value[:-1]) * units[suffix])
+    return int(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.backup", description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default=os.environ.get("BACKUP_TARGET"), help="Backup target spec.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel transfers.")
+    parser.add_argument(
+        "--bandwidth",
+        default=os.environ.get("BACKUP_BANDWIDTH"),
+        help="Transfer limit in bytes per second, e.g. 4M.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backup", help="Upload new or changed files and record a snapshot.")
+    commands.add_parser("list", help="List snapshots on the target.")
+    restore = commands.add_parser("restore", help="Restore a snapshot.")
+    restore.add_argument("--snapshot", help="Snapshot name (default: latest).")
+    restore.add_argument("--dest", type=Path, default=DATA_ROOT, help="Directory to restore into.")
+    args = parser.parse_args(argv)
+
+    if not args.target:
+        parser.error("--target or BACKUP_TARGET is required.")
+    try:
+        target = open_target(args.target)
+        bandwidth = _parse_rate(args.bandwidth)
+        if args.command == "backup":
+            name, uploaded, size = run_backup(target, workers=args.workers, bandwidth=bandwidth)
+            print(f"Snapshot {name}: uploaded {uploaded} new object(s), {size} bytes.")
+        elif args.command == "list":
+            # Sorted by name, so same-second snapshots ("...Z-2") follow the first one.
+            for name in sorted(Path(key).stem for key in target.list_keys("snapshots") if key.endswith(".json")):
+                print(name)
+        else:
+            restored = run_restore(target, args.dest, args.snapshot, args.workers, bandwidth)
+            print(f"Restored {restored} file(s) into {args.dest}.")
+    except BackupError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
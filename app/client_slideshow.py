@@ -0,0 +1,192 @@
+"""Browser-side slideshow that navigates without Streamlit reruns.
+
+The component starts with a window of slide manifests rendered into the page
+and moves between them locally: buttons, the keyboard arrows and swipes all
+work in the browser. When it reaches the edge of its window it asks the
+sidecar's ``/slides`` endpoint for the next batch. Media is streamed from
+the sidecar's ``/media`` endpoint. Both calls carry the session's sidecar token.
+"""
+
+from __future__ import annotations
+
+import json
+from urllib.parse import urlencode
+
+import streamlit.components.v1 as components
+
+from .sidecar import SIDECAR_PORT, issue_token, sidecar_base_url, start_sidecar
+from .slides import query_params, slide_window
+from .storage import ALL_ENTRIES, EntryQuery
+
+
+WINDOW_SIZE = 10
+COMPONENT_HEIGHT = 760
+
+SLIDESHOW_HTML = """
+<div class="cs" id="cs" tabindex="0">
+  <div class="cs-nav">
+    <button id="cs-prev" title="Newer entry (left arrow)">&lsaquo;</button>
+    <div class="cs-head"><div id="cs-date" class="cs-date"></div><div id="cs-counter" class="cs-counter"></div></div>
+    <button id="cs-next" title="Earlier entry (right arrow)">&rsaquo;</button>
+  </div>
+  <div id="cs-body"></div>
+</div>
+<style>
+.cs { font-family: sans-serif; color: #0f172a; outline: none; }
+.cs-nav { display: flex; align-items: center; gap: 0.6rem; margin-bottom: 0.6rem; }
+.cs-nav button { font-size: 1.6rem; width: 2.6rem; height: 2.6rem; border-radius: 50%; border: none;
+  background: #0ea5e9; color: #fff; cursor: pointer; }
+.cs-nav button:disabled { opacity: 0.35; cursor: default; }
+.cs-head { flex: 1; text-align: center; }
+.cs-date { font-weight: 600; }
+.cs-counter, .cs-meta { font-size: 0.78rem; color: #64748b; letter-spacing: 0.06em; text-transform: uppercase; }
+.cs-section { margin: 0.8rem 0; }
+.cs-section h4 { margin: 0 0 0.35rem; font-size: 0.95rem; }
+.cs-text { font-size: 0.92rem; line-height: 1.45; white-space: pre-wrap; }
+.cs-segment { display: block; width: 100%; text-align: left; border: none; background: #f1f5f9; border-radius: 8px;
+  margin: 0.2rem 0; padding: 0.35rem 0.6rem; cursor: pointer; font-size: 0.88rem; }
+.cs img, .cs video { width: 100%; border-radius: 12px; margin-bottom: 0.5rem; }
+.cs audio { width: 100%; }
+</style>
+<script>
+const CONFIG = __CONFIG__;
+const host = window.parent.location;  // component iframes are same-origin srcdoc documents
+const base = CONFIG.baseUrl || `${host.protocol}//${host.hostname}:${CONFIG.port}`;
+// Media elements cannot send headers, so their URLs carry the token instead.
+const media = (src) => `${base}${src}?token=${encodeURIComponent(CONFIG.token)}`;
+const slides = new Map(CONFIG.window.slides.map((slide) => [slide.index, slide]));
+let total = CONFIG.window.total;
+let current = CONFIG.start;
+const pending = new Set();
+
+const el = (tag, props = {}, children = []) => {
+  const node = Object.assign(document.createElement(tag), props);
+  children.forEach((child) => node.appendChild(child));
+  return node;
+};
+const fmt = (seconds) => `${Math.floor(seconds / 60)}:${String(Math.floor(seconds % 60)).padStart(2, "0")}`;
+
+async function fetchWindow(offset) {
+  offset = Math.max(0, Math.min(offset, total - 1));
+  if (pending.has(offset)) return;
+  pending.add(offset);
+  try {
+    const url = `${base}/slides?class=${encodeURIComponent(CONFIG.classSlug)}&offset=${offset}&limit=${CONFIG.windowSize}&${CONFIG.filters}`;
+    const response = await fetch(url, { headers: { Authorization: `Bearer ${CONFIG.token}` } });
+    if (!response.ok) return;
+    const data = await response.json();
+    total = data.total;
+    data.slides.forEach((slide) => slides.set(slide.index, slide));
+  } finally {
+    pending.delete(offset);
+  }
+}
+
+function ensureLoaded(index) {
+  // Fetch only when the neighbour just past the current slide is missing.
+  if (index + 1 < total && !slides.has(index + 1)) fetchWindow(index + 1);
+  if (index > 0 && !slides.has(index - 1)) fetchWindow(index - CONFIG.windowSize);
+}
+
+function section(title, content) {
+  return el("div", { className: "cs-section" }, [el("h4", { textContent: title }), ...content]);
+}
+
+function render() {
+  const slide = slides.get(current);
+  document.getElementById("cs-prev").disabled = current <= 0;
+  document.getElementById("cs-next").disabled = current >= total - 1;
+  document.getElementById("cs-counter").textContent = `${current + 1} / ${total}`;
+  const body = document.getElementById("cs-body");
+  body.replaceChildren();
+  if (!slide) {
+    document.getElementById("cs-date").textContent = "Loading…";
+    fetchWindow(current).then(() => slides.has(current) && render());
+    return;
+  }
+  document.getElementById("cs-date").textContent = slide.date_label;
+  body.appendChild(el("div", { className: "cs-meta", textContent: slide.time }));
+  if (slide.notes) body.appendChild(section("✍️ Typed Notes", [el("div", { className: "cs-text", textContent: slide.notes })]));
+  const audio = slide.audio.map((src) => el("audio", { src: media(src), controls: true, preload: "none" }));
+  if (slide.segments) {
+    const voice = audio.find((node, position) => slide.audio[position].split("/").pop().startsWith("audio-")) || audio[0];
+    const rows = slide.segments.start.map((start, position) => {
+      const row = el("button", { className: "cs-segment", textContent: `${fmt(start)} · ${slide.segments.text[position]}` });
+      row.onclick = () => { if (voice) { voice.currentTime = start; voice.play(); } };
+      return row;
+    });
+    body.appendChild(section("🎙️ Voice Transcript", rows));
+  } else if (slide.transcript) {
+    body.appendChild(section("🎙️ Voice Transcript", [el("div", { className: "cs-text", textContent: slide.transcript })]));
+  }
+  if (slide.image.length) body.appendChild(section("📸 Images", slide.image.map((src) => el("img", { src: media(src), loading: "lazy" }))));
+  if (slide.video.length) body.appendChild(section("🎬 Videos", slide.video.map((src) => el("video", { src: media(src), controls: true, preload: "metadata" }))));
+  if (audio.length) body.appendChild(section("🔊 Audio", audio));
+  ensureLoaded(current);
+  preloadImages(current + 1);
+  preloadImages(current - 1);
+}
+
+function preloadImages(index) {
+  const slide = slides.get(index);
+  if (slide) slide.image.forEach((src) => { new Image().src = media(src); });
+}
+
+function go(step) {
+  const next = current + step;
+  if (next < 0 || next >= total) return;
+  current = next;
+  render();
+}
+
+document.getElementById("cs-prev").onclick = () => go(-1);
+document.getElementById("cs-next").onclick = () => go(1);
+const onKey = (event) => {
+  const tag = (event.target && event.target.tagName) || "";
+  if (["INPUT", "TEXTAREA"].includes(tag)) return;
+  if (event.key === "ArrowLeft") go(-1);
+  if (event.key === "ArrowRight") go(1);
+};
+document.addEventListener("keydown", onKey);
+try {
+  // Replace the listener left by a previous render of this component.
+  const parentDoc = window.parent.document;
+  if (window.parent.__slideshowKeys) parentDoc.removeEventListener("keydown", window.parent.__slideshowKeys);
+  window.parent.__slideshowKeys = onKey;
+  parentDoc.addEventListener("keydown", onKey);
+  window.addEventListener("pagehide", () => parentDoc.removeEventListener("keydown", onKey));
+} catch (err) { /* cross-origin host */ }
+
+let touchX = null;
+const root = document.getElementById("cs");
+root.addEventListener("touchstart", (event) => { touchX = event.changedTouches[0].clientX; }, { passive: true });
+root.addEventListener("touchend", (event) => {
+  if (touchX === null) return;
+  const dx = event.changedTouches[0].clientX - touchX;
+  touchX = null;
+  if (Math.abs(dx) > 50) go(dx > 0 ? -1 : 1);
+}, { passive: true });
+
+render();
+</script>
+"""
+
+
+def render_client_slideshow(class_slug: str, start_index: int = 0, query: EntryQuery = ALL_ENTRIES) -> None:
+    """Render the browser-side slideshow over entries matching ``query``."""
+
+    start_sidecar()
+    offset = max(0, start_index - WINDOW_SIZE // 2)
+    window = slide_window(class_slug, offset, WINDOW_SIZE, query)
+    config = {
+        "baseUrl": sidecar_base_url(),
+        "port": SIDECAR_PORT,
+        "token": issue_token(),
+        "classSlug": class_slug,
+        "start": max(0, min(start_index, window["total"] - 1)),
+        "windowSize": WINDOW_SIZE,
+        "filters": urlencode(query_params(query)),
+        "window": window,
+    }
+    payload = json.dumps(config).replace("</", "<\\/")
+    components.html(SLIDESHOW_HTML.replace("__CONFIG__", payload), height=COMPONENT_HEIGHT, scrolling=True)
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
 
 
 @dataclass(frozen=True)
@@ -14,6 +14,8 @@ class ClassInfo:
     slug: str
     gallery_title: str
     accent_color: str
+    # ISO-639-1 code to pin Whisper to (e.g. "en"); None falls back to WHISPER_LANGUAGE.
+    language: Optional[str] = None
 
 
 CLASS_INFOS: List[ClassInfo] = [
@@ -40,3 +42,10 @@ CLASS_INFOS: List[ClassInfo] = [
 CLASS_OPTIONS: List[str] = [info.name for info in CLASS_INFOS]
 CLASS_BY_NAME: Dict[str, ClassInfo] = {info.name: info for info in CLASS_INFOS}
 CLASS_BY_SLUG: Dict[str, ClassInfo] = {info.slug: info for info in CLASS_INFOS}
+
+MEDIA_EXTENSIONS: Dict[str, Set[str]] = {
+    "image": {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".heic"},
+    "video": {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm"},
+    "audio": {".wav", ".flac", ".mp3", ".m4a", ".aac", ".ogg"},
+}
+MEDIA_TYPES = ("image", "video", "audio")
@@ -0,0 +1,119 @@
+"""Time-sortable entry ids.
+
+New entries get a ULID-style id: 26 Crockford base32 characters, of which
+the first 10 encode the creation time in milliseconds and the rest are
+random. Ids made in the same process never go backwards. If the clock
+stalls or steps back, the previous id is incremented instead. Sorting
+entry folder names therefore sorts entries by creation time, and the
+creation time can be read from the name without opening ``metadata.json``.
+
+Older entries are named ``HHMMSS-<hex>``. They sort after every new id
+through :func:`entry_sort_key`. ``python -m app.entry_ids migrate``
+renames them to ids derived from their recorded creation time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_LENGTH = 26
+RANDOM_BITS = 80
+_DECODE = {char: value for value, char in enumerate(CROCKFORD)}
+
+_last = 0
+_lock = threading.Lock()
+
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD[digit])
+    return "".join(reversed(chars))
+
+
+def _decode(entry_id: str) -> int:
+    value = 0
+    for char in entry_id:
+        value = value * 32 + _DECODE[char]
+    return value
+
+
+def _random_value(millis: int) -> int:
+    return (millis << RANDOM_BITS) | int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+
+
+def entry_id_at(moment: datetime, after: Optional[str] = None) -> str:
+    """Return an id for an entry created at ``moment``, for migrations.
+
+    When ``after`` is given the result sorts after it, so entries recorded
+    in the same millisecond keep their relative order.
+    """
+
+    value = _random_value(int(moment.timestamp() * 1000))
+    if after is not None and is_time_sortable(after):
+        value = max(value, _decode(after) + 1)
+    return _encode(value)
+
+
+def new_entry_id() -> str:
+    """Return a new id that sorts after every id this process made before."""
+
+    global _last
+    with _lock:
+        # If the clock has not moved on (or stepped back), count up from the last id.
+        _last = max(_random_value(time.time_ns() // 1_000_000), _last + 1)
+        return _encode(_last)
+
+
+def is_time_sortable(entry_id: str) -> bool:
+    return len(entry_id) == ID_LENGTH and all(char in _DECODE for char in entry_id)
+
+
+def entry_id_time(entry_id: str) -> Optional[datetime]:
+    """Return the creation time encoded in a time-sortable id, or ``None``."""
+
+    if not is_time_sortable(entry_id):
+        return None
+    return datetime.fromtimestamp((_decode(entry_id) >> RANDOM_BITS) / 1000)
+
+
+def entry_sort_key(entry_id: str) -> Tuple[bool, str]:
+    """Sort key that orders entries by creation time, with legacy ids first.
+
+    Legacy ids predate every time-sortable id, so in newest-first listings
+    (``reverse=True``) they come after all of them.
+    """
+
+    return is_time_sortable(entry_id), entry_id
+
+
+def main(argv: Optional[list] = None) -> int:
+    from .constants import CLASS_INFOS
+    from .storage import migrate_entry_ids
+
+    parser = argparse.ArgumentParser(prog="python -m app.entry_ids", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="rename legacy HHMMSS-<hex> entry folders")
+    migrate.add_argument("--dry-run", action="store_true", help="list the renames without making them")
+    args = parser.parse_args(argv)
+
+    total = 0
+    for class_info in CLASS_INFOS:
+        for old, new in migrate_entry_ids(class_info.slug, dry_run=args.dry_run):
+            print(f"{'would rename' if args.dry_run else 'renamed'} {old} -> {new.name}")
+            total += 1
+    print(f"{total} entr{'y' if total == 1 else 'ies'} {'to migrate' if args.dry_run else 'migrated'}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
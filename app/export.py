@@ -0,0 +1,144 @@
+"""Stream ZIP exports of saved entries without building the archive on disk."""
+
+from __future__ import annotations
+
+import io
+import json
+import tempfile
+import zipfile
+from datetime import date, datetime
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from .storage import MEDIA_EXTENSIONS, EntryContent, EntryQuery, entry_file_paths, iter_entries
+
+
+READ_CHUNK_BYTES = 1024 * 1024
+# Formats that are already compressed gain nothing from deflate; store them as-is.
+STORED_SUFFIXES = (
+    MEDIA_EXTENSIONS["image"] | MEDIA_EXTENSIONS["video"] | MEDIA_EXTENSIONS["audio"]
+) - {".bmp", ".wav"}
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only sink that hands finished bytes back to the generator.
+
+    It reports ``tell()`` but refuses ``seek()``, which makes ``zipfile`` emit
+    data descriptors instead of rewinding to patch local headers.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def select_entries(
+    class_slug: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    entry_ids: Optional[Collection[str]] = None,
+) -> Iterator[Tuple[date, EntryContent]]:
+    """Lazily yield ``(date, entry)`` pairs of a class within an optional date range or id selection."""
+
+    for day, entry in iter_entries(class_slug, EntryQuery(start=start, end=end)):
+        if entry_ids and entry.entry_id not in entry_ids:
+            continue
+        yield day, entry
+
+
+def _manifest_record(class_slug: str, day: date, entry: EntryContent, files: List[str]) -> Dict:
+    return {
+        "class": class_slug,
+        "date": day.isoformat(),
+        "entry_id": entry.entry_id,
+        "created_at": entry.created_at.isoformat(),
+        "notes": entry.text.manual_text,
+        "transcript": entry.text.transcript_text,
+        "files": files,
+    }
+
+
+def iter_zip(
+    class_slug: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    entry_ids: Optional[Collection[str]] = None,
+) -> Iterator[bytes]:
+    """Yield a ZIP archive of the selected entries in bounded-size pieces."""
+
+    buffer = _StreamBuffer()
+    # Manifest records hold notes and transcripts, so they are spooled to disk, not kept in memory.
+    records = tempfile.TemporaryFile("w+", encoding="utf-8")
+    with records, zipfile.ZipFile(buffer, "w", allowZip64=True) as archive:
+        for day, entry in select_entries(class_slug, start, end, entry_ids):
+            files: List[str] = []
+            for path in entry_file_paths(entry):
+                arcname = f"{class_slug}/{day.isoformat()}/{entry.entry_id}/{path.name}"
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                info.compress_type = (
+                    zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                )
+                with path.open("rb") as source, archive.open(info, "w") as target:
+                    while chunk := source.read(READ_CHUNK_BYTES):
+                        target.write(chunk)
+                        yield buffer.drain()
+                yield buffer.drain()
+                files.append(arcname)
+            separator = ",\n" if records.tell() else "\n"
+            records.write(separator + json.dumps(_manifest_record(class_slug, day, entry, files)))
+        manifest = {
+            "exported_at": datetime.now().isoformat(),
+            "class": class_slug,
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+        }
+        info = zipfile.ZipInfo("manifest.json", datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        records.seek(0)
+        with archive.open(info, "w") as target:
+            target.write(json.dumps(manifest, indent=2)[:-2].encode("utf-8") + b',\n  "entries": [')
+            while chunk := records.read(READ_CHUNK_BYTES):
+                target.write(chunk.encode("utf-8"))
+                yield buffer.drain()
+            target.write(b"\n]\n}\n")
+    yield buffer.drain()
+
+
+def export_filename(class_slug: str, start: Optional[date] = None, end: Optional[date] = None) -> str:
+    span = "-".join(value.isoformat() for value in (start, end) if value) or "all"
+    return f"{class_slug}-{span}.zip"
+
+
+def export_query(
+    class_slug: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    entry_ids: Optional[Collection[str]] = None,
+) -> str:
+    """Build the sidecar path that streams the matching export."""
+
+    query = {"class": class_slug}
+    if start:
+        query["start"] = start.isoformat()
+    if end:
+        query["end"] = end.isoformat()
+    if entry_ids:
+        query["entries"] = ",".join(entry_ids)
+    return f"/export?{urlencode(query)}"
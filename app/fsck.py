@@ -0,0 +1,395 @@
+"""Integrity checker for the ``DATA_ROOT`` tree.
+
+Run ``python -m app.fsck`` to scan every class and report problems, or add
+``--repair`` to fix the ones that can be fixed safely. Date folders are
+scanned in parallel with ``os.scandir``, so a nightly run over tens of
+thousands of files takes seconds. The exit status is ``1`` while unrepaired
+problems remain.
+
+Checks:
+
+* ``bad-metadata`` – ``metadata.json`` missing, unreadable or naming the
+  wrong class, date or entry; repaired by rewriting it.
+* ``empty-entry`` – an entry folder with nothing but metadata and no
+  resumable upload in progress, usually from a crashed save; repaired by
+  deleting the entry.
+* ``zero-byte`` – an empty media file; repaired by removing it.
+* ``missing-transcript`` – a voice recording with no transcript; reported only.
+* ``orphan-segments`` – transcript timings without a transcript; removed.
+* ``orphan-thumbnail`` / ``orphan-rendition`` – a cached thumbnail or
+  WebP rendition whose photo is gone; removed.
+* ``missing-rendition`` – a BMP photo, or a HEIC one when ``pillow-heif`` is
+  installed, without its WebP rendition; created.
+* ``temp-file`` – a leftover ``.tmp``/``.ingest``/``.download`` file, including
+  an upload's half-written state file; removed.
+* ``stale-upload`` – a resumable upload untouched for ``--stale-upload-hours``; removed.
+* ``stray`` – a file or folder that is not a date or entry; reported only.
+* ``empty-date`` – a date folder with no entries; removed.
+* ``trash`` – leftovers in ``DATA_ROOT/.trash`` from interrupted deletes; removed.
+* ``usage-drift`` – usage counters that disagree with the files on disk; recounted.
+* ``index-drift`` – metadata index records with no files (S3 backend); dropped.
+
+Repairs that remove or rewrite counted files adjust the usage ledger, so
+they do not show up as usage drift on the next run.
+
+Folders and temp files changed in the last ``FSCK_GRACE_SECONDS`` (default
+one hour) are left alone, so the checker can run while the app is saving.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .backends import get_backend
+from .constants import CLASS_INFOS, MEDIA_EXTENSIONS
+from .entry_ids import entry_id_time
+from .storage import DATA_ROOT, SEGMENTS_FILE, TEXT_FILES, TRASH_ROOT, delete_entry
+from .renditions import RENDITION_DIR, make_rendition, needs_rendition, rendition_path
+from .thumbnails import THUMBNAIL_DIR
+from .uploads import UPLOAD_PREFIX
+from .usage import Counter, load_usage, rebuild_usage, record_usage
+
+
+FSCK_WORKERS = int(os.environ.get("FSCK_WORKERS", "8"))
+GRACE_SECONDS = int(os.environ.get("FSCK_GRACE_SECONDS", "3600"))
+STALE_UPLOAD_HOURS = 48
+TEMP_SUFFIXES = (".tmp", ".ingest", ".download")
+MEDIA_SUFFIXES = set().union(*MEDIA_EXTENSIONS.values())
+AUDIO_SUFFIXES = MEDIA_EXTENSIONS["audio"]
+REPORT_ONLY = {"missing-transcript", "stray"}
+CACHE_DIRS = {THUMBNAIL_DIR: ("orphan-thumbnail", ".jpg"), RENDITION_DIR: ("orphan-rendition", ".webp")}
+
+
+@dataclass
+class Issue:
+    kind: str
+    path: str
+    detail: str = ""
+    repaired: bool = False
+
+
+@dataclass
+class DateScan:
+    """Findings for one date folder, plus what it holds for the usage check."""
+
+    class_slug: str
+    day: str
+    issues: List[Issue] = field(default_factory=list)
+    entries: int = 0
+    usage: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class Report:
+    issues: List[Issue] = field(default_factory=list)
+    entries: int = 0
+    files: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def unresolved(self) -> List[Issue]:
+        return [issue for issue in self.issues if not issue.repaired]
+
+
+def _is_old(stat_result: os.stat_result, now: float, seconds: float = GRACE_SECONDS) -> bool:
+    return now - stat_result.st_mtime > seconds
+
+
+def _write_metadata(entry_dir: Path, metadata: Dict) -> None:
+    path = entry_dir / "metadata.json"
+    temp_path = path.with_name(f".{path.name}.fsck.tmp")
+    temp_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+def _check_metadata(entry_dir: Path, class_slug: str, day: str, names: List[str]) -> Optional[Tuple[str, Dict]]:
+    """Return ``(problem, repaired_metadata)`` when ``metadata.json`` needs rewriting."""
+
+    expected = {"class": class_slug, "date": day, "entry_id": entry_dir.name}
+    created_at = (entry_id_time(entry_dir.name) or datetime.fromtimestamp(entry_dir.stat().st_mtime)).isoformat()
+    if "metadata.json" not in names:
+        return "missing metadata.json", {**expected, "created_at": created_at}
+    try:
+        metadata = json.loads((entry_dir / "metadata.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return "unreadable metadata.json", {**expected, "created_at": created_at}
+    if not isinstance(metadata, dict):
+        return "metadata.json is not an object", {**expected, "created_at": created_at}
+    problems = [key for key, value in expected.items() if metadata.get(key) != value]
+    try:
+        datetime.fromisoformat(metadata.get("created_at") or "")
+    except (TypeError, ValueError):
+        problems.append("created_at")
+        metadata["created_at"] = created_at
+    if not problems:
+        return None
+    return f"wrong {', '.join(problems)}", {**metadata, **expected}
+
+
+def _render(source: Path) -> bool:
+    try:
+        return make_rendition(str(source))
+    except Exception:  # corrupt photo, or HEIC without pillow-heif
+        return False
+
+
+def _scan_entry(entry_dir: Path, scan: DateScan, repair: bool, now: float, stale_upload_seconds: float) -> None:
+    visible: List[str] = []
+    sizes: Dict[str, int] = {}
+    hidden: List[os.DirEntry] = []
+    with os.scandir(entry_dir) as listing:
+        for item in listing:
+            if item.name.startswith("."):
+                hidden.append(item)
+            elif item.is_file(follow_symlinks=False):
+                visible.append(item.name)
+                sizes[item.name] = item.stat().st_size
+            else:
+                scan.issues.append(Issue("stray", item.path, "unexpected folder inside an entry"))
+
+    def issue(kind: str, path: Path, detail: str, fix=None) -> bool:
+        finding = Issue(kind, str(path), detail)
+        if repair and fix is not None:
+            # A fix that returns False could not be applied.
+            finding.repaired = fix() is not False
+        scan.issues.append(finding)
+        return finding.repaired
+
+    def remove(name: str) -> None:
+        (entry_dir / name).unlink()
+        visible.remove(name)
+        record_usage(DATA_ROOT, scan.class_slug, scan.day, [(name, -1, -sizes.pop(name))])
+
+    content = [name for name in visible if name != "metadata.json"]
+    # A paused resumable upload keeps its entry; only the stale-upload rule may remove it.
+    has_upload = any(item.name.startswith(UPLOAD_PREFIX) and item.name.endswith(".json") for item in hidden)
+    if not content and not has_upload:
+        if _is_old(entry_dir.stat(), now) and issue(
+            "empty-entry",
+            entry_dir,
+            "no media, notes or transcript",
+            lambda: delete_entry(scan.class_slug, date.fromisoformat(scan.day), entry_dir.name),
+        ):
+            return
+        scan.usage.add(len(visible), sum(sizes.values()))
+        return
+
+    scan.entries += 1
+    problem = _check_metadata(entry_dir, scan.class_slug, scan.day, visible)
+    if problem is not None:
+        detail, metadata = problem
+        if issue("bad-metadata", entry_dir / "metadata.json", detail, lambda: _write_metadata(entry_dir, metadata)):
+            created = "metadata.json" not in visible
+            if created:
+                visible.append("metadata.json")
+            size = (entry_dir / "metadata.json").stat().st_size
+            change = size - sizes.get("metadata.json", 0)
+            sizes["metadata.json"] = size
+            record_usage(DATA_ROOT, scan.class_slug, scan.day, [("metadata.json", int(created), change)])
+
+    for name in content:
+        suffix = Path(name).suffix.lower()
+        if suffix in MEDIA_SUFFIXES and sizes[name] == 0:
+            issue("zero-byte", entry_dir / name, "empty media file", lambda name=name: remove(name))
+    has_audio = any(Path(name).suffix.lower() in AUDIO_SUFFIXES and sizes.get(name) for name in content)
+    if has_audio and "voice_transcript.txt" not in visible:
+        issue("missing-transcript", entry_dir, "voice recording without a transcript")
+    if SEGMENTS_FILE in visible and "voice_transcript.txt" not in visible:
+        issue("orphan-segments", entry_dir / SEGMENTS_FILE, "timings without a transcript", lambda: remove(SEGMENTS_FILE))
+    for name in content:
+        source = entry_dir / name
+        if needs_rendition(source) and sizes.get(name) and not rendition_path(source).exists():
+            issue("missing-rendition", source, "no web-friendly copy", lambda source=source: _render(source))
+    for name in content:
+        if name not in TEXT_FILES and name != SEGMENTS_FILE and Path(name).suffix.lower() not in MEDIA_SUFFIXES:
+            issue("stray", entry_dir / name, "unrecognised file type")
+
+    for item in hidden:
+        path = Path(item.path)
+        if item.name in CACHE_DIRS and item.is_dir():
+            kind, suffix = CACHE_DIRS[item.name]
+            for cached in os.scandir(path):
+                if cached.name.endswith(suffix) and cached.name[: -len(suffix)] not in visible:
+                    issue(kind, Path(cached.path), "photo no longer exists", Path(cached.path).unlink)
+        elif item.name.startswith(UPLOAD_PREFIX) and not item.name.endswith(TEMP_SUFFIXES):
+            if item.name.endswith(".json") and _is_old(item.stat(), now, stale_upload_seconds):
+                part = path.with_suffix(".part")
+
+                def _drop_upload(state=path, part=part) -> None:
+                    part.unlink(missing_ok=True)
+                    state.unlink(missing_ok=True)
+
+                issue("stale-upload", path, "resumable upload was never finished", _drop_upload)
+        elif item.name.endswith(TEMP_SUFFIXES) and _is_old(item.stat(), now):
+            issue("temp-file", path, "left behind by an interrupted write", path.unlink)
+
+    scan.usage.add(len(visible), sum(sizes.values()))
+
+
+def scan_date(date_dir: Path, class_slug: str, repair: bool, stale_upload_seconds: float) -> DateScan:
+    """Check every entry in one date folder."""
+
+    scan = DateScan(class_slug=class_slug, day=date_dir.name)
+    now = time.time()
+    with os.scandir(date_dir) as listing:
+        children = sorted(listing, key=lambda item: item.name)
+    for item in children:
+        if item.name.startswith("."):
+            continue
+        if not item.is_dir(follow_symlinks=False):
+            scan.issues.append(Issue("stray", item.path, "file directly inside a date folder"))
+            continue
+        _scan_entry(Path(item.path), scan, repair, now, stale_upload_seconds)
+    if date_dir.exists() and not any(date_dir.iterdir()) and _is_old(date_dir.stat(), now):
+        finding = Issue("empty-date", str(date_dir), "no entries")
+        if repair:
+            try:
+                date_dir.rmdir()
+                finding.repaired = True
+            except OSError:
+                pass
+        scan.issues.append(finding)
+    return scan
+
+
+def _date_folders(class_dir: Path, report: Report) -> List[Path]:
+    folders: List[Path] = []
+    with os.scandir(class_dir) as listing:
+        for item in listing:
+            if item.name.startswith("."):
+                continue
+            try:
+                date.fromisoformat(item.name)
+            except ValueError:
+                report.issues.append(Issue("stray", item.path, "not a date folder"))
+                continue
+            if item.is_dir(follow_symlinks=False):
+                folders.append(Path(item.path))
+            else:
+                report.issues.append(Issue("stray", item.path, "file named like a date folder"))
+    return folders
+
+
+def _check_usage(class_slug: str, scans: List[DateScan], report: Report, repair: bool) -> None:
+    on_disk = {date.fromisoformat(scan.day): scan.usage for scan in scans if scan.usage.files}
+    recorded = {day: counter for day, counter in load_usage(DATA_ROOT, class_slug).by_date.items() if counter.files}
+    if on_disk == recorded:
+        return
+    drifted = sorted(day.isoformat() for day in set(on_disk) | set(recorded) if on_disk.get(day) != recorded.get(day))
+    finding = Issue("usage-drift", str(DATA_ROOT / class_slug), f"counters differ on {', '.join(drifted[:5])}")
+    if repair:
+        rebuild_usage(DATA_ROOT, class_slug)
+        finding.repaired = True
+    report.issues.append(finding)
+
+
+def _check_index(class_slug: str, report: Report, repair: bool) -> None:
+    """Flag index records that point at no files and no text."""
+
+    for key, record in get_backend(DATA_ROOT).read_index(class_slug)["entries"].items():
+        report.entries += 1
+        if record.get("files") or any(record.get(field) for field in ("notes", "transcript")):
+            continue
+        finding = Issue("index-drift", f"{class_slug}/{key}", "index record without files")
+        if repair:
+            day, _, entry_id = key.partition("/")
+            finding.repaired = delete_entry(class_slug, date.fromisoformat(day), entry_id)
+        report.issues.append(finding)
+
+
+def _clean_trash(report: Report, repair: bool) -> None:
+    if not TRASH_ROOT.is_dir():
+        return
+    for item in os.scandir(TRASH_ROOT):
+        finding = Issue("trash", item.path, "left behind by an interrupted delete")
+        if repair:
+            if item.is_dir(follow_symlinks=False):
+                shutil.rmtree(item.path, ignore_errors=True)
+            else:
+                os.unlink(item.path)
+            finding.repaired = True
+        report.issues.append(finding)
+
+
+def run_fsck(
+    repair: bool = False,
+    class_slugs: Optional[List[str]] = None,
+    workers: int = FSCK_WORKERS,
+    stale_upload_hours: float = STALE_UPLOAD_HOURS,
+) -> Report:
+    """Scan (and optionally repair) the data tree; return every finding."""
+
+    started = time.perf_counter()
+    report = Report()
+    classes = [info.slug for info in CLASS_INFOS if class_slugs is None or info.slug in class_slugs]
+    if get_backend(DATA_ROOT).uses_index:
+        for class_slug in classes:
+            _check_index(class_slug, report, repair)
+    else:
+        jobs: List[Tuple[str, Path]] = []
+        for class_slug in classes:
+            class_dir = DATA_ROOT / class_slug
+            if class_dir.is_dir():
+                jobs.extend((class_slug, folder) for folder in _date_folders(class_dir, report))
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fsck") as executor:
+            scans = list(
+                executor.map(
+                    lambda job: scan_date(job[1], job[0], repair, stale_upload_hours * 3600),
+                    jobs,
+                )
+            )
+        for scan in scans:
+            report.issues.extend(scan.issues)
+            report.entries += scan.entries
+            report.files += scan.usage.files
+        for class_slug in classes:
+            _check_usage(class_slug, [scan for scan in scans if scan.class_slug == class_slug], report, repair)
+    _clean_trash(report, repair)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.fsck",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--repair", action="store_true", help="fix what can be fixed safely")
+    parser.add_argument("--class", dest="classes", action="append", help="limit to a class slug (repeatable)")
+    parser.add_argument("--workers", type=int, default=FSCK_WORKERS, help="date folders scanned in parallel")
+    parser.add_argument(
+        "--stale-upload-hours",
+        type=float,
+        default=STALE_UPLOAD_HOURS,
+        help="age after which unfinished resumable uploads count as stale",
+    )
+    parser.add_argument("--json", action="store_true", help="print findings as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_fsck(args.repair, args.classes, args.workers, args.stale_upload_hours)
+    if args.json:
+        print(json.dumps([asdict(issue) for issue in report.issues], indent=2))
+    else:
+        for issue in report.issues:
+            status = "repaired" if issue.repaired else ("noted" if issue.kind in REPORT_ONLY else "found")
+            print(f"{status:8} {issue.kind:18} {issue.path}" + (f" ({issue.detail})" if issue.detail else ""))
+        print(
+            f"Checked {report.entries} entries and {report.files} files in {report.elapsed:.2f}s: "
+            f"{len(report.issues)} finding(s), {len(report.unresolved)} unresolved."
+        )
+    return 1 if any(issue.kind not in REPORT_ONLY for issue in report.unresolved) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
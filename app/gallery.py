@@ -2,25 +2,48 @@
 
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Iterable, List, Tuple
+import heapq
+import html
+from datetime import date
+from itertools import groupby, islice
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import streamlit as st
 
-from .constants import CLASS_BY_SLUG, ClassInfo
-from .storage import DateBucket, EntryContent, load_gallery
+from .constants import CLASS_BY_SLUG, CLASS_INFOS, ClassInfo
+from .client_slideshow import render_client_slideshow
+from .export import export_query
+from .prefetch import WarmSlide, get_slide_cache
+from .sidecar import render_sidecar_link
+from .storage import (
+    MEDIA_TYPES,
+    DateBucket,
+    EntryContent,
+    EntryQuery,
+    iter_timeline,
+    list_entry_dates,
+    query_gallery,
+)
 from .styling import format_entry_time, inject_base_css
+from .renditions import rendition_for
+from .thumbnails import thumbnail_for
 
 
 MEDIA_EMOJIS = {"image": "🖼️", "video": "🎬", "audio": "🔊"}
+VIEW_MODES = ("Slideshow", "Grid", "Presenter")
+GRID_COLUMNS = 3
+GRID_PAGE_SIZE = 12
+TIMELINE_PAGE_SIZE = 20
+TIMELINE_PAGE_KEY = "timeline_page"
+SNIPPET_CHARS = 90
 
 
-def _render_media_grid(paths: Iterable[Path], media_type: str) -> None:
+def _render_media_grid(paths: Iterable, media_type: str) -> None:
     """Render media with beautiful layout."""
     if not paths:
         return
     if media_type == "image":
-        images = [str(path) for path in paths]
+        images = [path if isinstance(path, bytes) else str(path) for path in paths]
         # Display images in a grid with proper spacing
         if len(images) == 1:
             st.image(images[0], use_container_width=True)
@@ -44,8 +67,37 @@ def _render_media_grid(paths: Iterable[Path], media_type: str) -> None:
             st.audio(str(path))
 
 
-def _render_entry_content(entry) -> None:
-    """Render entry content for slideshow view."""
+def _format_offset(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def _seek_key(entry: EntryContent) -> str:
+    return f"seek-{entry.entry_id}"
+
+
+def _render_transcript_segments(entry: EntryContent, segments: Dict[str, list]) -> None:
+    """List transcript sentences as buttons that seek the voice clip."""
+
+    for position, (start, text) in enumerate(zip(segments["start"], segments["text"])):
+        label = f"{_format_offset(start)} · {text}"
+        if st.button(label, key=f"segment-{entry.entry_id}-{position}", use_container_width=True):
+            st.session_state[_seek_key(entry)] = int(start)
+
+
+def _render_audio(entry: EntryContent, slide: WarmSlide) -> None:
+    """Render audio clips, starting the recorded voice clip at the chosen segment."""
+
+    seek = st.session_state.get(_seek_key(entry), 0) if slide.segments else 0
+    for path in slide.media["audio"]:
+        if seek and path.name.startswith("audio-"):
+            st.audio(str(path), start_time=seek)
+        else:
+            st.audio(str(path))
+
+
+def _render_entry_content(entry: EntryContent, slide: WarmSlide) -> None:
+    """Render entry content for slideshow view from its warmed files."""
     # Entry metadata
     st.markdown(
         f"<div class='entry-meta'>{format_entry_time(entry.created_at)}</div>",
@@ -54,8 +106,8 @@ def _render_entry_content(entry) -> None:
 
     # Media type badges
     media_badges = []
-    for media_type in ("image", "video", "audio"):
-        if entry.media_files.get(media_type):
+    for media_type in MEDIA_TYPES:
+        if entry.media_count(media_type):
             emoji = MEDIA_EMOJIS.get(media_type, "")
             media_badges.append(f"<span class='media-badge'>{emoji}</span>")
     if entry.text.manual_text or entry.text.transcript_text:
@@ -75,15 +127,20 @@ def _render_entry_content(entry) -> None:
                 unsafe_allow_html=True,
             )
 
+    segments = slide.segments
     if entry.text.transcript_text:
         with st.container(key=f"voice-transcript-{id(entry)}"):
             st.markdown("<div class='section-header'><span class='section-icon'>🎙️</span> Voice Transcript</div>", unsafe_allow_html=True)
-            st.markdown(
-                f"<div class='entry-text'>{entry.text.transcript_text}</div>",
-                unsafe_allow_html=True,
-            )
-
-    if entry.media_files.get("audio") and not entry.text.transcript_text:
+            if segments:
+                st.caption("Click a sentence to play the recording from there.")
+                _render_transcript_segments(entry, segments)
+            else:
+                st.markdown(
+                    f"<div class='entry-text'>{entry.text.transcript_text}</div>",
+                    unsafe_allow_html=True,
+                )
+
+    if entry.media_count("audio") and not entry.text.transcript_text:
         st.markdown(
             "<div class='entry-warning'>Voice transcript unavailable for this clip."
             " Ensure Whisper is installed and configured if you need automatic transcription.</div>",
@@ -91,20 +148,20 @@ def _render_entry_content(entry) -> None:
         )
 
     # Media sections
-    if entry.media_files.get("image"):
+    if entry.media_count("image"):
         with st.container(key=f"images-{id(entry)}"):
             st.markdown("<div class='section-header'><span class='section-icon'>📸</span> Images</div>", unsafe_allow_html=True)
-            _render_media_grid(entry.media_files["image"], "image")
+            _render_media_grid(slide.images(), "image")
 
-    if entry.media_files.get("video"):
+    if entry.media_count("video"):
         with st.container(key=f"videos-{id(entry)}"):
             st.markdown("<div class='section-header'><span class='section-icon'>🎬</span> Videos</div>", unsafe_allow_html=True)
-            _render_media_grid(entry.media_files["video"], "video")
+            _render_media_grid(slide.media["video"], "video")
 
-    if entry.media_files.get("audio"):
+    if entry.media_count("audio"):
         with st.container(key=f"audio-{id(entry)}"):
             st.markdown("<div class='section-header'><span class='section-icon'>🔊</span> Audio</div>", unsafe_allow_html=True)
-            _render_media_grid(entry.media_files["audio"], "audio")
+            _render_audio(entry, slide)
 
 def _build_slides(buckets) -> List[Tuple[DateBucket, EntryContent]]:
     slides: List[Tuple[DateBucket, EntryContent]] = []
@@ -120,7 +177,7 @@ def _render_slideshow_view(buckets, class_slug: str) -> None:
     if not slides:
         return
 
-    index_key = f"{class_slug}_slide_index"
+    index_key = _slide_index_key(class_slug)
     if index_key not in st.session_state:
         st.session_state[index_key] = 0
 
@@ -174,9 +231,202 @@ def _render_slideshow_view(buckets, class_slug: str) -> None:
 
     # Entry content with homepage-style sections
     st.markdown("<div class='sections-container'>", unsafe_allow_html=True)
-    _render_entry_content(current_entry)
+    slide_cache = get_slide_cache(class_slug)
+    _render_entry_content(current_entry, slide_cache.load(current_entry))
     st.markdown("</div>", unsafe_allow_html=True)
 
+    # Warm the neighbours so the next arrow click renders from memory.
+    slide_cache.prefetch(
+        slides[index][1] for index in (current_index + 1, current_index - 1) if 0 <= index < total_slides
+    )
+
+
+def _slide_index_key(class_slug: str) -> str:
+    return f"{class_slug}_slide_index"
+
+
+def _view_key(class_slug: str) -> str:
+    return f"{class_slug}-view"
+
+
+def _grid_page_key(class_slug: str) -> str:
+    return f"{class_slug}_grid_page"
+
+
+def _open_slide(class_slug: str, index: int) -> None:
+    st.session_state[_slide_index_key(class_slug)] = index
+    st.session_state[_view_key(class_slug)] = "Slideshow"
+
+
+def _set_grid_page(class_slug: str, page: int) -> None:
+    st.session_state[_grid_page_key(class_slug)] = page
+
+
+def _entry_snippet(entry: EntryContent) -> str:
+    text = entry.text.manual_text or entry.text.transcript_text or ""
+    if len(text) > SNIPPET_CHARS:
+        text = text[: SNIPPET_CHARS - 1].rstrip() + "…"
+    return html.escape(text)
+
+
+def _render_card_summary(entry: EntryContent, label: str = "") -> None:
+    """Render a card's thumbnail, meta line and snippet; only the first photo is read."""
+    image_path = entry.first_media_path("image")
+    if image_path is not None:
+        st.image(str(thumbnail_for(rendition_for(image_path))), use_container_width=True)
+    else:
+        media_type = next((kind for kind in MEDIA_TYPES if entry.media_count(kind)), None)
+        emoji = MEDIA_EMOJIS.get(media_type, "📝")
+        st.markdown(f"<div class='grid-card-placeholder'>{emoji}</div>", unsafe_allow_html=True)
+    counts = " ".join(
+        f"{MEDIA_EMOJIS[kind]} {entry.media_count(kind)}" for kind in MEDIA_TYPES if entry.media_count(kind)
+    )
+    st.markdown(
+        f"<div class='entry-meta'>{label}{format_entry_time(entry.created_at)} {counts}</div>",
+        unsafe_allow_html=True,
+    )
+    snippet = _entry_snippet(entry)
+    if snippet:
+        st.markdown(f"<div class='grid-card-snippet'>{snippet}</div>", unsafe_allow_html=True)
+
+
+def _render_grid_card(entry: EntryContent, class_slug: str, index: int) -> None:
+    with st.container(border=True):
+        _render_card_summary(entry)
+        st.button(
+            "Open",
+            key=f"{class_slug}-open-{index}",
+            on_click=_open_slide,
+            args=(class_slug, index),
+            use_container_width=True,
+        )
+
+
+def _render_grid_view(buckets, class_slug: str) -> None:
+    """Render one page of thumbnail cards grouped by date.
+
+    Only the cards on the current page are built, so paging through a term
+    costs one rerun per ``GRID_PAGE_SIZE`` entries.
+    """
+    slides = _build_slides(buckets)
+    if not slides:
+        return
+
+    page_count = (len(slides) + GRID_PAGE_SIZE - 1) // GRID_PAGE_SIZE
+    page_key = _grid_page_key(class_slug)
+    page = max(0, min(st.session_state.get(page_key, 0), page_count - 1))
+    st.session_state[page_key] = page
+    start = page * GRID_PAGE_SIZE
+    window = list(enumerate(slides))[start : start + GRID_PAGE_SIZE]
+
+    position = 0
+    while position < len(window):
+        bucket = window[position][1][0]
+        group = []
+        while position < len(window) and window[position][1][0] is bucket:
+            group.append(window[position])
+            position += 1
+        st.markdown(
+            f"<div class='gallery-date'><span>{bucket.date_value.strftime('%A, %B %d, %Y')}</span></div>",
+            unsafe_allow_html=True,
+        )
+        for row_start in range(0, len(group), GRID_COLUMNS):
+            columns = st.columns(GRID_COLUMNS)
+            for column, (index, (_bucket, entry)) in zip(columns, group[row_start : row_start + GRID_COLUMNS]):
+                with column:
+                    _render_grid_card(entry, class_slug, index)
+
+    if page_count > 1:
+        left_col, center_col, right_col = st.columns([2, 3, 2], gap="small")
+        with left_col:
+            st.button(
+                "‹ Newer",
+                key=f"{class_slug}-grid-newer",
+                disabled=page == 0,
+                on_click=_set_grid_page,
+                args=(class_slug, page - 1),
+                use_container_width=True,
+            )
+        with center_col:
+            st.markdown(
+                f"<div class='slider-counter'>Page {page + 1} / {page_count}</div>",
+                unsafe_allow_html=True,
+            )
+        with right_col:
+            st.button(
+                "Older ›",
+                key=f"{class_slug}-grid-older",
+                disabled=page == page_count - 1,
+                on_click=_set_grid_page,
+                args=(class_slug, page + 1),
+                use_container_width=True,
+            )
+
+
+def _selected_range(selected, oldest: date, newest: date) -> Tuple[date, date]:
+    if isinstance(selected, (tuple, list)):
+        return (selected[0], selected[-1]) if selected else (oldest, newest)
+    return selected, selected
+
+
+def render_entry_filters(class_slug: str, key_prefix: str) -> EntryQuery:
+    """Render the shared entry filters and return the matching query.
+
+    Only the list of date folders is read here; entries are opened later, by
+    the query, and only for the days in range.
+    """
+    return _render_filter_widgets(list_entry_dates(class_slug), key_prefix)
+
+
+def _render_filter_widgets(dates: List[date], key_prefix: str) -> EntryQuery:
+    start: Optional[date] = None
+    end: Optional[date] = None
+    if dates:
+        oldest, newest = dates[-1], dates[0]
+        selected = st.date_input(
+            "Dates",
+            value=(oldest, newest),
+            min_value=oldest,
+            max_value=newest,
+            key=f"{key_prefix}-filter-dates",
+        )
+        start, end = _selected_range(selected, oldest, newest)
+        if (start, end) == (oldest, newest):
+            start = end = None
+    media_types = st.multiselect(
+        "Media",
+        MEDIA_TYPES,
+        format_func=lambda media_type: f"{MEDIA_EMOJIS[media_type]} {media_type.title()}",
+        key=f"{key_prefix}-filter-media",
+        placeholder="Any media",
+    )
+    transcript_only = st.checkbox("Only entries with a voice transcript", key=f"{key_prefix}-filter-transcript")
+    text = st.text_input("Search notes and transcripts", key=f"{key_prefix}-filter-text")
+    return EntryQuery(
+        start=start,
+        end=end,
+        media_types=tuple(media_types),
+        has_transcript=True if transcript_only else None,
+        text=text.strip() or None,
+    )
+
+
+def _render_export_controls(buckets: List[DateBucket], class_slug: str) -> None:
+    """Sidebar controls that stream a ZIP of the class for a date range."""
+    newest = buckets[0].date_value
+    oldest = buckets[-1].date_value
+    with st.sidebar:
+        st.markdown("<div class='field-label'>Export</div>", unsafe_allow_html=True)
+        selected = st.date_input(
+            "Export date range",
+            value=(oldest, newest),
+            min_value=oldest,
+            max_value=newest,
+            key=f"{class_slug}-export-range",
+        )
+        start, end = _selected_range(selected, oldest, newest)
+        render_sidecar_link(export_query(class_slug, start, end), "⬇️ Download ZIP")
+
 
 def render_gallery_page(class_slug: str) -> None:
     class_info: ClassInfo = CLASS_BY_SLUG[class_slug]
@@ -198,16 +448,137 @@ def render_gallery_page(class_slug: str) -> None:
         unsafe_allow_html=True,
     )
 
-    buckets = load_gallery(class_slug)
+    with st.sidebar:
+        st.markdown("<div class='field-label'>Filters</div>", unsafe_allow_html=True)
+        query = render_entry_filters(class_slug, class_slug)
+    buckets = query_gallery(class_slug, query)
 
     if not buckets:
-        st.markdown(
-            "<div class='empty-state'>\n"
-            "<strong>No entries found.</strong> Add new entries from the recorder.\n"
-            "</div>",
-            unsafe_allow_html=True,
+        message = (
+            "<strong>No entries match these filters.</strong> Widen the dates or clear the search."
+            if query != EntryQuery()
+            else "<strong>No entries found.</strong> Add new entries from the recorder."
         )
+        st.markdown(f"<div class='empty-state'>\n{message}\n</div>", unsafe_allow_html=True)
         return
 
-    # Render slideshow
-    _render_slideshow_view(buckets, class_slug)
+    _render_export_controls(buckets, class_slug)
+
+    view = st.radio(
+        "View",
+        VIEW_MODES,
+        horizontal=True,
+        key=_view_key(class_slug),
+        label_visibility="collapsed",
+    )
+    if view == "Grid":
+        _render_grid_view(buckets, class_slug)
+    elif view == "Presenter":
+        # Navigates in the browser: arrow keys and swipes cost no reruns.
+        render_client_slideshow(class_slug, st.session_state.get(_slide_index_key(class_slug), 0), query)
+    else:
+        _render_slideshow_view(buckets, class_slug)
+
+
+def _set_timeline_page(page: int) -> None:
+    st.session_state[TIMELINE_PAGE_KEY] = page
+
+
+def _timeline_dates(class_slugs: List[str]) -> List[date]:
+    merged = heapq.merge(*(list_entry_dates(slug) for slug in class_slugs), reverse=True)
+    return [value for value, _group in groupby(merged)]
+
+
+def _render_timeline_pager(page: int, has_older: bool) -> None:
+    left_col, center_col, right_col = st.columns([2, 3, 2], gap="small")
+    with left_col:
+        st.button(
+            "‹ Newer",
+            key="timeline-newer",
+            disabled=page == 0,
+            on_click=_set_timeline_page,
+            args=(page - 1,),
+            use_container_width=True,
+        )
+    with center_col:
+        st.markdown(f"<div class='slider-counter'>Page {page + 1}</div>", unsafe_allow_html=True)
+    with right_col:
+        st.button(
+            "Older ›",
+            key="timeline-older",
+            disabled=not has_older,
+            on_click=_set_timeline_page,
+            args=(page + 1,),
+            use_container_width=True,
+        )
+
+
+def render_timeline_page() -> None:
+    """Render every class's entries on one page, newest first.
+
+    Entries come from :func:`iter_timeline`, a merge of the per-class
+    streams. Only the current page is read from storage, plus one entry to
+    tell whether an older page exists.
+    """
+    st.set_page_config(
+        page_title="Timeline",
+        page_icon="🗓️",
+        layout="centered",
+        initial_sidebar_state="expanded",
+    )
+    inject_base_css()
+
+    st.markdown("<div class='app-title'>Timeline</div>", unsafe_allow_html=True)
+    st.markdown(
+        "<div class='app-subtitle'>Everything captured across all classes, newest first.</div>",
+        unsafe_allow_html=True,
+    )
+
+    all_slugs = [info.slug for info in CLASS_INFOS]
+    with st.sidebar:
+        st.markdown("<div class='field-label'>Filters</div>", unsafe_allow_html=True)
+        class_slugs = st.multiselect(
+            "Classes",
+            all_slugs,
+            format_func=lambda slug: CLASS_BY_SLUG[slug].name,
+            key="timeline-filter-classes",
+            placeholder="All classes",
+        ) or all_slugs
+        query = _render_filter_widgets(_timeline_dates(class_slugs), "timeline")
+
+    page = max(0, st.session_state.get(TIMELINE_PAGE_KEY, 0))
+    window = list(
+        islice(iter_timeline(query, class_slugs), page * TIMELINE_PAGE_SIZE, (page + 1) * TIMELINE_PAGE_SIZE + 1)
+    )
+    if not window and page:
+        # The filters changed while a later page was open; start again from the newest.
+        page = 0
+        st.session_state[TIMELINE_PAGE_KEY] = 0
+        window = list(islice(iter_timeline(query, class_slugs), TIMELINE_PAGE_SIZE + 1))
+    if not window:
+        message = (
+            "<strong>No entries match these filters.</strong> Widen the dates or clear the search."
+            if query != EntryQuery() or class_slugs != all_slugs
+            else "<strong>No entries found.</strong> Add new entries from the recorder."
+        )
+        st.markdown(f"<div class='empty-state'>\n{message}\n</div>", unsafe_allow_html=True)
+        return
+
+    has_older = len(window) > TIMELINE_PAGE_SIZE
+    current_date: Optional[date] = None
+    for class_info, entry_date, entry in window[:TIMELINE_PAGE_SIZE]:
+        if entry_date != current_date:
+            current_date = entry_date
+            st.markdown(
+                f"<div class='gallery-date'><span>{entry_date.strftime('%A, %B %d, %Y')}</span></div>",
+                unsafe_allow_html=True,
+            )
+        with st.container(border=True):
+            label = (
+                f"<span class='timeline-class' style='color: {class_info.accent_color}'>"
+                f"{html.escape(class_info.name)}</span> · "
+            )
+            _render_card_summary(entry, label)
+
+    if page or has_older:
+        _render_timeline_pager(page, has_older)
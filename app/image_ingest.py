@@ -0,0 +1,144 @@
+"""Normalise uploaded photos before they are stored.
+
+Phone photos arrive rotated through an EXIF tag, carry GPS coordinates and
+are often 12-48 MP. Each photo is processed once at save time: the EXIF
+orientation is applied to the pixels, location data is removed and the long
+edge is capped at ``IMAGE_MAX_EDGE``. Photos that need none of that are left
+byte-for-byte untouched. Multi-photo saves are spread over a process pool,
+since decoding and resampling are CPU-bound.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+
+IMAGE_INGEST_ENABLED = os.environ.get("IMAGE_INGEST", "1").lower() in {"1", "true", "yes"}
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", "2560"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "88"))
+IMAGE_INGEST_WORKERS = int(os.environ.get("IMAGE_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Animated GIFs and formats Pillow cannot write back are stored as uploaded.
+INGEST_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+# Written back through pillow-heif, so only processed when it is installed.
+HEIF_SUFFIXES = {".heic", ".heif"}
+EXIF_ORIENTATION = 0x0112
+EXIF_GPS_IFD = 0x8825
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def heif_available() -> bool:
+    """Return whether ``pillow-heif`` is installed, without importing it."""
+
+    return importlib.util.find_spec("pillow_heif") is not None
+
+
+@lru_cache(maxsize=None)
+def register_heif() -> bool:
+    """Teach Pillow to read and write HEIC in this process, if ``pillow-heif`` is installed."""
+
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:  # pragma: no cover - optional dependency
+        return False
+    register_heif_opener()
+    return True
+
+
+def process_image(path: str) -> bool:
+    """Rotate, strip GPS from and downscale the image at ``path`` in place.
+
+    Returns whether the file was rewritten. Runs in a worker process, so it
+    takes and returns only picklable values.
+    """
+
+    from PIL import Image, ImageOps
+
+    register_heif()
+    source = Path(path)
+    with Image.open(source) as image:
+        image_format = image.format
+        icc_profile = image.info.get("icc_profile")
+        exif = image.getexif()
+        rotated = exif.get(EXIF_ORIENTATION, 1) != 1
+        has_location = EXIF_GPS_IFD in exif
+        oversized = max(image.size) > IMAGE_MAX_EDGE
+        if not (rotated or has_location or oversized):
+            return False
+        output = ImageOps.exif_transpose(image) if rotated else image.copy()
+    if oversized:
+        output.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+    exif.pop(EXIF_ORIENTATION, None)
+    exif.pop(EXIF_GPS_IFD, None)
+
+    options = {"exif": exif.tobytes()}
+    if icc_profile:
+        # Without the profile, wide-gamut phone photos render washed out.
+        options["icc_profile"] = icc_profile
+    if image_format in {"JPEG", "WEBP", "HEIF"}:
+        options["quality"] = IMAGE_JPEG_QUALITY
+    temp_path = source.with_name(f".{source.name}.ingest")
+    output.save(temp_path, format=image_format, **options)
+    os.replace(temp_path, source)
+    return True
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers avoid forking a process that is running Streamlit's threads.
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, IMAGE_INGEST_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_executor() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def ingest_images(files: Sequence[Tuple[str, Path]]) -> int:
+    """Process the images among ``(original_name, path)`` pairs; return how many changed.
+
+    A photo that fails to process is kept as uploaded rather than failing the save.
+    """
+
+    if not IMAGE_INGEST_ENABLED:
+        return 0
+    suffixes = INGEST_SUFFIXES | HEIF_SUFFIXES if heif_available() else INGEST_SUFFIXES
+    paths: List[str] = [str(path) for name, path in files if Path(name).suffix.lower() in suffixes]
+    if not paths:
+        return 0
+    if len(paths) == 1:
+        outcomes = [_process_safely(paths[0])]
+    else:
+        try:
+            outcomes = list(_executor().map(_process_safely, paths))
+        except BrokenProcessPool:  # pragma: no cover - a worker died; finish in-process
+            _reset_executor()
+            outcomes = [_process_safely(path) for path in paths]
+    return sum(outcomes)
+
+
+def _process_safely(path: str) -> bool:
+    try:
+        return process_image(path)
+    except Exception:  # pragma: no cover - corrupt or unsupported images
+        Path(path).with_name(f".{Path(path).name}.ingest").unlink(missing_ok=True)
+        return False
@@ -0,0 +1,103 @@
+"""Report module import cost using Python's ``-X importtime`` output.
+
+Fly stops idle machines, so the first visit after a scale-to-zero pays for
+every import the page triggers. Run this to see where that time goes::
+
+    python -m app.importtime                      # gallery, manage and recorder modules
+    python -m app.importtime app.gallery --top 15
+    python -m app.importtime app.gallery --budget-ms 1500
+
+Each target is imported in a fresh interpreter so results are not skewed by
+modules that are already loaded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+
+DEFAULT_TARGETS = ("app.gallery", "app.storage", "app.transcription", "app.save_pipeline")
+# Modules that should only load once a recording is transcribed or a file is saved.
+DEFERRED_MODULES = ("faster_whisper", "ctranslate2", "tokenizers", "onnxruntime", "av", "numpy", "pydub", "slugify")
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure(target: str) -> List[ImportRecord]:
+    """Import ``target`` in a fresh interpreter and parse its importtime log."""
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        message = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown error"
+        raise RuntimeError(f"Importing {target} failed: {message}")
+    records: List[ImportRecord] = []
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def total_ms(records: Iterable[ImportRecord]) -> float:
+    """Wall time spent importing, counting only top-level imports."""
+
+    return sum(record.cumulative_us for record in records if record.depth == 0) / 1000
+
+
+def report(target: str, records: List[ImportRecord], top: int) -> str:
+    lines = [f"{target}: {total_ms(records):.1f} ms across {len(records)} modules"]
+    lines.append(f"  {'self ms':>9} {'cumul ms':>9}  module")
+    for record in sorted(records, key=lambda item: item.self_us, reverse=True)[:top]:
+        lines.append(f"  {record.self_us / 1000:9.1f} {record.cumulative_us / 1000:9.1f}  {record.module}")
+    loaded = {record.module.split(".")[0] for record in records}
+    eager = sorted(name for name in DEFERRED_MODULES if name in loaded)
+    if eager:
+        lines.append(f"  loaded eagerly (should be deferred): {', '.join(eager)}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS), help="modules to import")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list per target")
+    parser.add_argument("--budget-ms", type=float, help="exit non-zero when a target exceeds this")
+    args = parser.parse_args(argv)
+
+    over_budget = False
+    for target in args.targets:
+        try:
+            records = measure(target)
+        except RuntimeError as exc:
+            print(exc, file=sys.stderr)
+            return 2
+        print(report(target, records, args.top))
+        print()
+        if args.budget_ms is not None and total_ms(records) > args.budget_ms:
+            print(f"{target} exceeds the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+            over_budget = True
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""In-process counters and timings for runtime instrumentation."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Summary:
+    """Running summary of one metric."""
+
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+    last: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+_series: Dict[str, Summary] = {}
+_lock = threading.Lock()
+
+
+def observe(name: str, value: float) -> None:
+    """Record one sample for ``name`` (seconds for timings, units for counters)."""
+
+    with _lock:
+        summary = _series.setdefault(name, Summary())
+        summary.count += 1
+        summary.total += value
+        summary.maximum = max(summary.maximum, value)
+        summary.last = value
+    logger.debug("%s=%.4f", name, value)
+
+
+def snapshot() -> Dict[str, Summary]:
+    """Return a copy of every metric recorded in this process."""
+
+    with _lock:
+        return {name: replace(summary) for name, summary in sorted(_series.items())}
@@ -0,0 +1,134 @@
+"""Warm neighbouring slideshow entries in the background.
+
+Every arrow click in the slideshow is a full rerun that would otherwise read
+the next entry's files from disk (or fetch them from the storage backend).
+After a slide renders, the entries on either side are loaded into a small
+per-class LRU: media paths are materialised, photos are read into memory and
+transcript segments are parsed, so the next click renders from RAM.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import streamlit as st
+
+from .renditions import awaiting_rendition, rendition_for
+from .storage import MEDIA_TYPES, EntryContent, load_segments
+
+
+SLIDE_CACHE_BYTES = int(os.environ.get("SLIDE_CACHE_BYTES", str(96 * 1024 * 1024)))
+# Photos above this size are materialised but not held in memory.
+MAX_CACHED_IMAGE_BYTES = 12 * 1024 * 1024
+
+SlideKey = Tuple[str, Tuple[str, ...], Optional[str]]
+
+
+@dataclass
+class WarmSlide:
+    """Everything the slideshow needs to render one entry without touching storage."""
+
+    media: Dict[str, List[Path]]
+    segments: Optional[Dict[str, list]]
+    image_data: Dict[Path, bytes] = field(default_factory=dict)
+    # Set while a photo is shown as stored because its rendition is still queued.
+    awaiting_renditions: bool = False
+
+    @property
+    def size(self) -> int:
+        return sum(len(data) for data in self.image_data.values())
+
+    def images(self) -> List[object]:
+        """Image sources for ``st.image``: cached bytes where held, paths otherwise."""
+
+        return [self.image_data.get(path, str(path)) for path in self.media["image"]]
+
+
+def _slide_key(entry: EntryContent) -> SlideKey:
+    # The transcript is part of the key so a background upgrade refreshes segments.
+    return (str(entry.directory), entry.filenames, entry.text.transcript_text)
+
+
+def warm_slide(entry: EntryContent) -> WarmSlide:
+    media = {media_type: entry.media_paths(media_type) for media_type in MEDIA_TYPES}
+    originals = media["image"]
+    media["image"] = [rendition_for(path) for path in originals]
+    slide = WarmSlide(
+        media=media,
+        segments=load_segments(entry) if entry.text.transcript_text else None,
+        awaiting_renditions=any(map(awaiting_rendition, originals, media["image"])),
+    )
+    for path in media["image"]:
+        try:
+            if path.stat().st_size <= MAX_CACHED_IMAGE_BYTES:
+                slide.image_data[path] = path.read_bytes()
+        except OSError:
+            continue
+    return slide
+
+
+class SlideCache:
+    """Byte-bounded LRU of warmed slides with a single background loader."""
+
+    def __init__(self, max_bytes: int = SLIDE_CACHE_BYTES) -> None:
+        self._max_bytes = max_bytes
+        self._slides: "OrderedDict[SlideKey, WarmSlide]" = OrderedDict()
+        self._pending: Set[SlideKey] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slide-prefetch")
+
+    def load(self, entry: EntryContent) -> WarmSlide:
+        """Return the warmed slide for ``entry``, loading it now on a miss."""
+
+        key = _slide_key(entry)
+        with self._lock:
+            slide = self._slides.get(key)
+            # A slide warmed before its renditions were ready is reloaded to pick them up.
+            if slide is not None and not slide.awaiting_renditions:
+                self._slides.move_to_end(key)
+                return slide
+        slide = warm_slide(entry)
+        self._store(key, slide)
+        return slide
+
+    def prefetch(self, entries: Iterable[EntryContent]) -> None:
+        """Queue background loads for entries that are neither cached nor queued."""
+
+        for entry in entries:
+            key = _slide_key(entry)
+            with self._lock:
+                if key in self._slides or key in self._pending:
+                    continue
+                self._pending.add(key)
+            self._executor.submit(self._prefetch_one, key, entry)
+
+    def _prefetch_one(self, key: SlideKey, entry: EntryContent) -> None:
+        try:
+            self._store(key, warm_slide(entry))
+        except Exception:  # pragma: no cover - the next render loads it synchronously
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _store(self, key: SlideKey, slide: WarmSlide) -> None:
+        with self._lock:
+            self._slides[key] = slide
+            self._slides.move_to_end(key)
+            total = sum(cached.size for cached in self._slides.values())
+            while total > self._max_bytes and len(self._slides) > 1:
+                _evicted_key, evicted = self._slides.popitem(last=False)
+                total -= evicted.size
+
+
+@st.cache_resource(show_spinner=False)
+def get_slide_cache(class_slug: str) -> SlideCache:
+    """Return the shared slide cache for one class."""
+
+    return SlideCache()
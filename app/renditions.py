@@ -0,0 +1,183 @@
+"""Web-friendly renditions of photos that browsers cannot show.
+
+HEIC photos from iPhones cannot be decoded by most browsers, and BMPs are
+uncompressed. Each such photo gets a WebP rendition in a hidden
+``.renditions`` folder inside its entry. The rendition is rotated upright
+and capped at ``IMAGE_MAX_EDGE``, and the gallery, thumbnails and sidecar
+serve it in place of the original. Exports and backups keep the original.
+
+Renditions are made as soon as an entry is saved, on a small process pool
+of ``RENDITION_WORKERS`` low-priority workers, so conversions cannot
+crowd out interactive requests. Photos saved before renditions existed are
+queued on first view and served as stored until their rendition is ready;
+views never wait for a conversion. HEIC is decoded by ``pillow-heif``, which
+ships in ``requirements.txt``; an install without it serves HEIC photos as
+stored and makes no rendition.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from .image_ingest import IMAGE_MAX_EDGE, heif_available, register_heif
+
+
+RENDITION_DIR = ".renditions"
+RENDITION_SUFFIXES = {".heic", ".bmp"}
+RENDITION_QUALITY = int(os.environ.get("RENDITION_QUALITY", "82"))
+RENDITION_WORKERS = int(os.environ.get("RENDITION_WORKERS", "1"))
+RENDITION_NICENESS = 10
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending: Dict[Path, Future] = {}
+# Photos that could not be converted, with the mtime that failed, so views don't retry them.
+_failed: Dict[Path, float] = {}
+_lock = threading.Lock()
+
+
+def needs_rendition(path: Path) -> bool:
+    """Return whether ``path`` is a photo that should be served as a rendition.
+
+    HEIC only counts when ``pillow-heif`` is installed, since it cannot be
+    converted otherwise.
+    """
+
+    suffix = path.suffix.lower()
+    if suffix == ".heic" and not heif_available():
+        return False
+    return suffix in RENDITION_SUFFIXES
+
+
+def rendition_path(image_path: Path) -> Path:
+    return image_path.parent / RENDITION_DIR / f"{image_path.name}.webp"
+
+
+def make_rendition(source: str) -> bool:
+    """Write the WebP rendition of ``source``; return whether one was written.
+
+    Runs in a worker process, so it takes and returns only picklable values.
+    """
+
+    from PIL import Image, ImageOps
+
+    register_heif()
+    source_path = Path(source)
+    target = rendition_path(source_path)
+    with Image.open(source_path) as image:
+        output = ImageOps.exif_transpose(image)
+        output.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+    if output.mode not in {"RGB", "RGBA"}:
+        output = output.convert("RGBA" if "A" in output.getbands() else "RGB")
+    target.parent.mkdir(exist_ok=True)
+    temp_path = target.with_name(f".{target.name}.tmp")
+    output.save(temp_path, format="WEBP", quality=RENDITION_QUALITY, method=4)
+    os.replace(temp_path, target)
+    return True
+
+
+def _make_safely(source: str) -> bool:
+    try:
+        return make_rendition(source)
+    except Exception:  # pragma: no cover - corrupt images or missing pillow-heif
+        target = rendition_path(Path(source))
+        target.with_name(f".{target.name}.tmp").unlink(missing_ok=True)
+        return False
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned, niced workers: conversions yield the CPU to page renders.
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, RENDITION_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=os.nice if hasattr(os, "nice") else None,
+            initargs=(RENDITION_NICENESS,) if hasattr(os, "nice") else (),
+        )
+    return _pool
+
+
+def _submit(path: Path, mtime: float) -> Future:
+    """Queue one conversion, reusing the future of an identical pending one."""
+
+    global _pool
+    with _lock:
+        future = _pending.get(path)
+        if future is not None:
+            return future
+        try:
+            future = _executor().submit(_make_safely, str(path))
+        except BrokenProcessPool:  # pragma: no cover - a worker died; start a new pool
+            _pool = None
+            future = _executor().submit(_make_safely, str(path))
+        _pending[path] = future
+    future.add_done_callback(lambda done: _finish(path, mtime, done))
+    return future
+
+
+def _finish(path: Path, mtime: float, future: Future) -> None:
+    # A crashed worker is not the photo's fault, so only a clean False counts as failed.
+    converted = future.exception() is not None or future.result()
+    with _lock:
+        _pending.pop(path, None)
+        if not converted:
+            _failed[path] = mtime
+
+
+def _queue(path: Path) -> None:
+    """Queue a conversion unless one is pending or this version already failed."""
+
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return
+    with _lock:
+        if _failed.get(path) == mtime or path in _pending:
+            return
+    _submit(path, mtime)
+
+
+def _is_fresh(path: Path) -> bool:
+    try:
+        return rendition_path(path).stat().st_mtime >= path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def schedule_renditions(paths: Iterable[Path]) -> None:
+    """Queue renditions for the photos among ``paths`` without waiting."""
+
+    for path in paths:
+        if needs_rendition(path) and not _is_fresh(path):
+            _queue(path)
+
+
+def rendition_for(image_path: Path) -> Path:
+    """Return the path to show for ``image_path`` without waiting for a conversion.
+
+    Photos browsers can show are returned unchanged. Until the rendition is
+    ready, or if its conversion failed, the original path is returned and a
+    conversion is queued in the background.
+    """
+
+    if not needs_rendition(image_path):
+        return image_path
+    if _is_fresh(image_path):
+        return rendition_path(image_path)
+    _queue(image_path)
+    return image_path
+
+
+def awaiting_rendition(image_path: Path, served: Path) -> bool:
+    """Return whether ``served`` is a stand-in for a rendition still being made."""
+
+    if served != image_path or not needs_rendition(image_path):
+        return False
+    with _lock:
+        return image_path in _pending
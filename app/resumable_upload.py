@@ -0,0 +1,130 @@
+"""Browser-side resumable uploader that talks to the sidecar upload endpoint."""
+
+from __future__ import annotations
+
+import json
+from datetime import date
+
+import streamlit.components.v1 as components
+
+from .sidecar import SIDECAR_PORT, issue_token, sidecar_base_url
+from .uploads import MAX_CHUNK_BYTES
+
+
+CHUNK_BYTES = min(8 * 1024 * 1024, MAX_CHUNK_BYTES)
+
+UPLOADER_HTML = """
+<div class="ru">
+  <input type="file" id="ru-files" multiple accept="video/*,image/*">
+  <button id="ru-start">Upload</button>
+  <div id="ru-status"></div>
+</div>
+<style>
+.ru { font-family: sans-serif; font-size: 0.9rem; }
+.ru button { margin-left: 0.4rem; padding: 0.3rem 0.9rem; border-radius: 8px; border: 1px solid #0ea5e9;
+  background: #0ea5e9; color: #fff; cursor: pointer; }
+.ru progress { width: 100%; }
+#ru-status div { margin-top: 0.35rem; }
+</style>
+<script>
+const CONFIG = __CONFIG__;
+const host = window.parent.location;  // component iframes are same-origin srcdoc documents
+const base = CONFIG.baseUrl || `${host.protocol}//${host.hostname}:${CONFIG.port}`;
+const auth = { Authorization: `Bearer ${CONFIG.token}` };
+const statusBox = document.getElementById("ru-status");
+const b64 = (text) => btoa(unescape(encodeURIComponent(text)));
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function digest(buffer) {
+  const hash = await crypto.subtle.digest("SHA-256", buffer);
+  return btoa(String.fromCharCode(...new Uint8Array(hash)));
+}
+
+async function withRetry(task) {
+  for (let attempt = 0; ; attempt++) {
+    try { return await task(); } catch (err) {
+      if (attempt >= 8) throw err;
+      await sleep(Math.min(30000, 1000 * 2 ** attempt));
+    }
+  }
+}
+
+async function uploadFile(file, entryId, row) {
+  const key = `ru:${CONFIG.className}:${CONFIG.date}:${file.name}:${file.size}:${file.lastModified}`;
+  let location = localStorage.getItem(key);
+  let offset = 0;
+  if (location) {
+    const head = await withRetry(() => fetch(base + location, { method: "HEAD", headers: auth }));
+    if (head.ok) { offset = parseInt(head.headers.get("Upload-Offset"), 10); entryId = head.headers.get("Upload-Entry"); }
+    else { location = null; }
+  }
+  if (!location) {
+    const meta = [["class", CONFIG.className], ["date", CONFIG.date], ["filename", file.name]];
+    if (entryId) meta.push(["entry", entryId]);
+    const created = await withRetry(() => fetch(base + "/uploads", {
+      method: "POST",
+      headers: { ...auth, "Upload-Length": String(file.size), "Upload-Metadata": meta.map(([k, v]) => `${k} ${b64(v)}`).join(",") },
+    }));
+    if (!created.ok) throw new Error(await created.text());
+    location = created.headers.get("Location");
+    entryId = created.headers.get("Upload-Entry");
+    localStorage.setItem(key, location);
+  }
+  const bar = row.querySelector("progress");
+  while (offset < file.size) {
+    const chunk = await file.slice(offset, offset + CONFIG.chunkBytes).arrayBuffer();
+    const checksum = await digest(chunk);
+    const response = await withRetry(async () => {
+      const res = await fetch(base + location, {
+        method: "PATCH",
+        headers: { ...auth, "Content-Type": "application/offset+octet-stream", "Upload-Offset": String(offset), "Upload-Checksum": `sha256 ${checksum}` },
+        body: chunk,
+      });
+      if (res.status >= 500) throw new Error(`HTTP ${res.status}`);
+      return res;
+    });
+    if (response.status === 409 || response.status === 460) {
+      const head = await withRetry(() => fetch(base + location, { method: "HEAD", headers: auth }));
+      offset = parseInt(head.headers.get("Upload-Offset"), 10);
+      continue;
+    }
+    if (!response.ok) throw new Error(await response.text());
+    offset = parseInt(response.headers.get("Upload-Offset"), 10);
+    bar.value = offset / file.size;
+  }
+  localStorage.removeItem(key);
+  return entryId;
+}
+
+document.getElementById("ru-start").addEventListener("click", async () => {
+  const files = Array.from(document.getElementById("ru-files").files);
+  let entryId = null;
+  for (const file of files) {
+    const row = document.createElement("div");
+    row.innerHTML = `<span></span><progress max="1" value="0"></progress>`;
+    row.querySelector("span").textContent = file.name;
+    statusBox.appendChild(row);
+    try {
+      entryId = await uploadFile(file, entryId, row);
+      row.querySelector("span").textContent = `✅ ${file.name}`;
+    } catch (err) {
+      row.querySelector("span").textContent = `❌ ${file.name}: ${err.message}. Pick the same file again to resume.`;
+    }
+  }
+});
+</script>
+"""
+
+
+def render_resumable_uploader(class_name: str, day: date) -> None:
+    """Render the chunked uploader targeting a new entry for ``class_name``/``day``."""
+
+    config = {
+        "baseUrl": sidecar_base_url(),
+        "port": SIDECAR_PORT,
+        "token": issue_token(),
+        "className": class_name,
+        "date": day.isoformat(),
+        "chunkBytes": CHUNK_BYTES,
+    }
+    components.html(UPLOADER_HTML.replace("__CONFIG__", json.dumps(config)), height=190, scrolling=True)
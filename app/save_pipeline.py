@@ -0,0 +1,374 @@
+"""Background save pipeline so the recorder can acknowledge saves instantly.
+
+Each save is snapshotted into its own folder under ``DATA_ROOT/.staging``
+and written into its entry by a worker thread. A process claims a job with
+an advisory lock on ``claim.lock`` in the job's folder before touching it,
+so app processes sharing the volume never commit the same job twice.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, List, Optional
+from uuid import uuid4
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - advisory locks are POSIX-only
+    fcntl = None  # type: ignore
+
+import streamlit as st
+
+from .constants import CLASS_BY_NAME
+from .image_ingest import ingest_images
+from .renditions import schedule_renditions
+from .storage import (
+    DATA_ROOT,
+    batched_index_updates,
+    delete_entry,
+    ensure_entry_dir,
+    save_audio,
+    save_segments,
+    save_staged_files,
+    save_text,
+)
+from .transcription import schedule_transcript_upgrade
+from .usage import QuotaExceededError, enforce_quota
+
+
+STAGING_ROOT = DATA_ROOT / ".staging"
+JOB_FILE = "job.json"
+CLAIM_FILE = "claim.lock"
+MAX_TRACKED_TICKETS = 200
+# Transient failures are retried in-process after these delays, then left for the next start.
+RETRY_DELAYS = (5, 30, 120)
+# Errors that no retry can fix; the save is discarded.
+FINAL_ERRORS = (QuotaExceededError,)
+
+
+@dataclass
+class SaveTicket:
+    """Status handle returned to the UI as soon as a save is staged."""
+
+    ticket_id: str
+    class_name: str
+    day: date
+    summary: str
+    submitted_at: datetime = field(default_factory=datetime.now)
+    status: str = "pending"
+    entry_dir: Optional[Path] = None
+    error: Optional[str] = None
+
+    @property
+    def target(self) -> str:
+        return f"{CLASS_BY_NAME[self.class_name].slug}/{self.day.isoformat()}"
+
+
+@dataclass
+class _StagedSave:
+    ticket: SaveTicket
+    staging_dir: Path
+    upload_names: List[str]
+    audio_file: Optional[str]
+    transcript_text: Optional[str]
+    notes_text: Optional[str]
+    segments: Optional[Dict[str, list]] = None
+    keep_originals: bool = False
+    # Recorded once the entry exists, so a commit cut short by a restart resumes into it.
+    entry_id: Optional[str] = None
+    # Open lock file held while this process owns the job; never serialised.
+    claim: Optional[IO] = None
+    attempts: int = 0
+
+
+def _summarise(upload_count: int, has_audio: bool, has_notes: bool) -> str:
+    parts: List[str] = []
+    if upload_count:
+        parts.append(f"{upload_count} upload{'s' if upload_count != 1 else ''}")
+    if has_audio:
+        parts.append("audio clip")
+    if has_notes:
+        parts.append("typed notes")
+    return ", ".join(parts)
+
+
+class SavePipeline:
+    """Stage recorder inputs quickly and finish the durable writes in a worker."""
+
+    def __init__(self, staging_root: Path = STAGING_ROOT, max_workers: int = 1) -> None:
+        self._staging_root = staging_root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="save-pipeline")
+        self._tickets: "OrderedDict[str, SaveTicket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._recover_staged()
+
+    def submit(
+        self,
+        class_name: str,
+        day: date,
+        uploads: Iterable,
+        audio_bytes: Optional[bytes],
+        transcript_text: Optional[str],
+        notes_text: Optional[str],
+        segments: Optional[Dict[str, list]] = None,
+        audio_suffix: str = ".wav",
+        keep_originals: bool = False,
+        on_complete: Optional[Callable[[], None]] = None,
+    ) -> SaveTicket:
+        """Snapshot the inputs into staging and queue the entry for writing.
+
+        Photos are rotated, stripped of location data and downscaled unless
+        ``keep_originals`` is set. ``on_complete`` runs once the write has
+        finished or failed.
+        """
+
+        uploads = [file for file in uploads if file]
+        notes_text = notes_text if notes_text and notes_text.strip() else None
+        ticket = SaveTicket(
+            ticket_id=uuid4().hex,
+            class_name=class_name,
+            day=day,
+            summary=_summarise(len(uploads), bool(audio_bytes), bool(notes_text)),
+        )
+        staging_dir = self._staging_root / ticket.ticket_id
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        # Claimed before anything is written, so recovery elsewhere never removes a half-written job.
+        claim = _claim(staging_dir)
+
+        upload_names: List[str] = []
+        for position, file in enumerate(uploads):
+            with (staging_dir / f"upload-{position:02d}").open("wb") as output:
+                output.write(file.getbuffer())
+            upload_names.append(file.name)
+
+        audio_file: Optional[str] = None
+        if audio_bytes:
+            audio_file = f"audio{audio_suffix}"
+            (staging_dir / audio_file).write_bytes(audio_bytes)
+
+        staged = _StagedSave(
+            ticket=ticket,
+            staging_dir=staging_dir,
+            upload_names=upload_names,
+            audio_file=audio_file,
+            transcript_text=transcript_text if audio_bytes else None,
+            notes_text=notes_text,
+            segments=segments if audio_bytes and transcript_text else None,
+            keep_originals=keep_originals,
+            claim=claim,
+        )
+        # The job file is written last; its presence marks a complete snapshot.
+        _write_job(staged)
+
+        self._track(ticket)
+        future = self._executor.submit(self._commit, staged)
+        if on_complete is not None:
+            future.add_done_callback(lambda _done: on_complete())
+        return ticket
+
+    def get(self, ticket_id: str) -> Optional[SaveTicket]:
+        with self._lock:
+            return self._tickets.get(ticket_id)
+
+    def _track(self, ticket: SaveTicket) -> None:
+        with self._lock:
+            self._tickets[ticket.ticket_id] = ticket
+            while len(self._tickets) > MAX_TRACKED_TICKETS:
+                self._tickets.popitem(last=False)
+
+    def _commit(self, staged: _StagedSave) -> None:
+        """Write a staged save into a new entry.
+
+        Staged files are removed as they are saved, so a commit interrupted by
+        a restart or a transient error resumes into the entry it recorded.
+        Only a save rejected outright (see ``FINAL_ERRORS``) is discarded
+        along with its partly written entry.
+        """
+
+        ticket = staged.ticket
+        class_slug = CLASS_BY_NAME[ticket.class_name].slug
+        entry_dir: Optional[Path] = None
+        try:
+            # Uploads already moved by an interrupted attempt are no longer staged.
+            staged_files = []
+            for position, name in enumerate(staged.upload_names):
+                path = staged.staging_dir / f"upload-{position:02d}"
+                if path.exists():
+                    staged_files.append((name, path))
+            if not staged.keep_originals:
+                ingest_images(staged_files)
+            # One index update for the whole entry, written before the error handling below.
+            with batched_index_updates():
+                if staged.entry_id is not None:
+                    entry_dir = DATA_ROOT / class_slug / ticket.day.isoformat() / staged.entry_id
+                if entry_dir is None or not entry_dir.is_dir():
+                    # Checked before the entry exists, so a rejected save leaves nothing behind.
+                    # The staged files already sit on the data volume, so they need no new free space.
+                    incoming = _staged_bytes(staged)
+                    enforce_quota(DATA_ROOT, class_slug, incoming, staged_bytes=incoming)
+                    entry_dir = ensure_entry_dir(ticket.class_name, ticket.day)
+                    staged.entry_id = entry_dir.name
+                    _write_job(staged)
+                schedule_renditions(save_staged_files(entry_dir, staged_files))
+                saved_audio: Optional[Path] = None
+                audio_path = staged.staging_dir / staged.audio_file if staged.audio_file else None
+                if audio_path is not None and audio_path.exists():
+                    saved_audio = save_audio(entry_dir, audio_path.read_bytes(), suffix=audio_path.suffix)
+                    audio_path.unlink()
+                if staged.transcript_text:
+                    save_text(entry_dir, "voice_transcript.txt", staged.transcript_text)
+                    if staged.segments:
+                        save_segments(entry_dir, staged.segments)
+                if staged.notes_text:
+                    save_text(entry_dir, "notes.txt", staged.notes_text)
+        except FINAL_ERRORS as exc:
+            ticket.status = "failed"
+            ticket.error = str(exc) or exc.__class__.__name__
+            if entry_dir is not None:
+                delete_entry(class_slug, ticket.day, entry_dir.name)
+            shutil.rmtree(staged.staging_dir, ignore_errors=True)
+            _release(staged)
+            return
+        except Exception as exc:  # pragma: no cover - relies on runtime environment
+            # Staged files and the partial entry are kept so the commit can resume.
+            ticket.error = str(exc) or exc.__class__.__name__
+            self._retry_later(staged)
+            return
+        ticket.entry_dir = entry_dir
+        ticket.status = "complete"
+        ticket.error = None
+        shutil.rmtree(staged.staging_dir, ignore_errors=True)
+        _release(staged)
+        if saved_audio is not None:
+            schedule_transcript_upgrade(entry_dir, saved_audio)
+
+    def _retry_later(self, staged: _StagedSave) -> None:
+        ticket = staged.ticket
+        if staged.attempts >= len(RETRY_DELAYS):
+            # Give the job up for now; the next process start recovers it.
+            ticket.status = "failed"
+            _release(staged)
+            return
+        ticket.status = "retrying"
+        delay = RETRY_DELAYS[staged.attempts]
+        staged.attempts += 1
+        timer = threading.Timer(delay, self._executor.submit, args=(self._commit, staged))
+        timer.daemon = True
+        timer.start()
+
+    def _recover_staged(self) -> None:
+        """Requeue unclaimed snapshots left behind by a crash or a failed commit, and drop partial ones."""
+
+        if not self._staging_root.exists():
+            return
+        for staging_dir in sorted(self._staging_root.iterdir()):
+            if not staging_dir.is_dir():
+                continue
+            claim = _claim(staging_dir)
+            if claim is None:
+                # Another process is writing or committing this job.
+                continue
+            staged = _load_job(staging_dir)
+            if staged is None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                claim.close()
+                continue
+            staged.claim = claim
+            self._track(staged.ticket)
+            self._executor.submit(self._commit, staged)
+
+
+def _claim(staging_dir: Path) -> Optional[IO]:
+    """Lock a job for this process; ``None`` if another process holds it or it is gone."""
+
+    try:
+        handle = (staging_dir / CLAIM_FILE).open("a")
+    except FileNotFoundError:
+        return None
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+    return handle
+
+
+def _release(staged: _StagedSave) -> None:
+    if staged.claim is not None:
+        staged.claim.close()
+        staged.claim = None
+
+
+def _staged_bytes(staged: _StagedSave) -> int:
+    names = [f"upload-{position:02d}" for position in range(len(staged.upload_names))]
+    if staged.audio_file:
+        names.append(staged.audio_file)
+    paths = [staged.staging_dir / name for name in names]
+    return sum(path.stat().st_size for path in paths if path.exists())
+
+
+def _write_job(staged: _StagedSave) -> None:
+    job_path = staged.staging_dir / JOB_FILE
+    temp_path = job_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(_job_payload(staged), indent=2), encoding="utf-8")
+    temp_path.replace(job_path)
+
+
+def _job_payload(staged: _StagedSave) -> dict:
+    ticket = staged.ticket
+    return {
+        "ticket_id": ticket.ticket_id,
+        "class_name": ticket.class_name,
+        "date": ticket.day.isoformat(),
+        "summary": ticket.summary,
+        "submitted_at": ticket.submitted_at.isoformat(),
+        "upload_names": staged.upload_names,
+        "audio_file": staged.audio_file,
+        "transcript_text": staged.transcript_text,
+        "notes_text": staged.notes_text,
+        "segments": staged.segments,
+        "keep_originals": staged.keep_originals,
+        "entry_id": staged.entry_id,
+    }
+
+
+def _load_job(staging_dir: Path) -> Optional[_StagedSave]:
+    try:
+        payload = json.loads((staging_dir / JOB_FILE).read_text(encoding="utf-8"))
+        ticket = SaveTicket(
+            ticket_id=payload["ticket_id"],
+            class_name=payload["class_name"],
+            day=date.fromisoformat(payload["date"]),
+            summary=payload.get("summary", ""),
+            submitted_at=datetime.fromisoformat(payload["submitted_at"]),
+        )
+    except (OSError, json.JSONDecodeError, KeyError, ValueError):
+        return None
+    if ticket.class_name not in CLASS_BY_NAME:
+        return None
+    return _StagedSave(
+        ticket=ticket,
+        staging_dir=staging_dir,
+        upload_names=list(payload.get("upload_names") or []),
+        audio_file=payload.get("audio_file"),
+        transcript_text=payload.get("transcript_text"),
+        notes_text=payload.get("notes_text"),
+        segments=payload.get("segments"),
+        keep_originals=bool(payload.get("keep_originals")),
+        entry_id=payload.get("entry_id"),
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_save_pipeline() -> SavePipeline:
+    """Return the process-wide save pipeline shared by all sessions."""
+
+    return SavePipeline()
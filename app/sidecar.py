@@ -0,0 +1,400 @@
+"""Small HTTP server run next to Streamlit for endpoints Streamlit cannot serve.
+
+Every request needs a signed, expiring token that a Streamlit page issued
+to its session (see :func:`issue_token`). Browsers send it as an
+``Authorization: Bearer`` header, or as a ``token`` query parameter where
+they cannot set headers (links, ``<img>`` and ``<video>`` sources). CORS
+responses are limited to the app's origin.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from .constants import CLASS_BY_SLUG
+from .export import READ_CHUNK_BYTES, export_filename, iter_zip
+from .slides import media_type_for, parse_query, resolve_media, slide_window
+from .uploads import MAX_CHUNK_BYTES, MAX_UPLOAD_BYTES, UploadError, create_upload, get_upload, write_chunk
+
+
+SIDECAR_HOST = os.environ.get("SIDECAR_HOST", "127.0.0.1")
+SIDECAR_PORT = int(os.environ.get("SIDECAR_PORT", "8081"))
+SIDECAR_PUBLIC_URL = os.environ.get("SIDECAR_PUBLIC_URL", "")
+# Shared by every app process that issues tokens; a random per-process secret otherwise.
+SIDECAR_SECRET = (os.environ.get("SIDECAR_SECRET") or secrets.token_hex(32)).encode("utf-8")
+SIDECAR_TOKEN_TTL = int(os.environ.get("SIDECAR_TOKEN_TTL", str(4 * 3600)))
+# Comma-separated origins allowed to call the sidecar; by default the app host on any port.
+SIDECAR_ALLOWED_ORIGINS = {
+    origin.strip().rstrip("/") for origin in os.environ.get("SIDECAR_ALLOWED_ORIGINS", "").split(",") if origin.strip()
+}
+TUS_VERSION = "1.0.0"
+CORS_EXPOSE = (
+    "Location, Upload-Offset, Upload-Length, Upload-Entry, Tus-Resumable, Content-Range, Accept-Ranges"
+)
+CORS_ALLOW = (
+    "Authorization, Content-Type, Range, Upload-Offset, Upload-Length, Upload-Metadata, Upload-Checksum, "
+    "Tus-Resumable"
+)
+
+RouteHandler = Callable[["SidecarHandler", List[str]], None]
+
+
+def _sign(payload: str) -> str:
+    return hmac.new(SIDECAR_SECRET, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def issue_token(session_id: Optional[str] = None) -> str:
+    """Return a token that lets the current browser session call the sidecar."""
+
+    from .admission import current_session_id
+
+    payload = f"{int(time.time()) + SIDECAR_TOKEN_TTL}.{session_id or current_session_id()}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token: str) -> bool:
+    payload, _, signature = token.rpartition(".")
+    expires, _, _session = payload.partition(".")
+    if not payload or not hmac.compare_digest(signature, _sign(payload)):
+        return False
+    try:
+        return int(expires) >= time.time()
+    except ValueError:
+        return False
+
+
+def with_token(path: str, token: str) -> str:
+    """Append ``token`` to a sidecar path for use where headers cannot be set."""
+
+    return f"{path}{'&' if '?' in path else '?'}token={token}"
+
+
+def _parse_metadata(header: str) -> Dict[str, str]:
+    """Decode a tus ``Upload-Metadata`` header (``key base64,key base64``)."""
+
+    metadata: Dict[str, str] = {}
+    for pair in filter(None, (item.strip() for item in header.split(","))):
+        key, _, encoded = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(encoded).decode("utf-8") if encoded else ""
+        except (ValueError, UnicodeDecodeError):
+            continue
+    return metadata
+
+
+def _create_upload(handler: "SidecarHandler", parts: List[str]) -> None:
+    metadata = _parse_metadata(handler.headers.get("Upload-Metadata", ""))
+    try:
+        length = int(handler.headers.get("Upload-Length", "0"))
+        day = date.fromisoformat(metadata.get("date", ""))
+    except ValueError:
+        handler.send_plain(400, "Upload-Length and a valid date are required.")
+        return
+    state = create_upload(
+        metadata.get("class", ""),
+        day,
+        metadata.get("filename", ""),
+        length,
+        entry_id=metadata.get("entry") or None,
+    )
+    handler.send_response(201)
+    handler.send_header("Location", f"/uploads/{state.location}")
+    handler.send_header("Upload-Entry", state.entry_id)
+    handler.send_header("Content-Length", "0")
+    handler.end_headers()
+
+
+def _upload_status(handler: "SidecarHandler", parts: List[str]) -> None:
+    state = get_upload("/".join(parts))
+    handler.send_response(200)
+    handler.send_header("Upload-Offset", str(state.offset))
+    handler.send_header("Upload-Length", str(state.length))
+    handler.send_header("Upload-Entry", state.entry_id)
+    handler.send_header("Cache-Control", "no-store")
+    handler.send_header("Content-Length", "0")
+    handler.end_headers()
+
+
+def _upload_chunk(handler: "SidecarHandler", parts: List[str]) -> None:
+    try:
+        offset = int(handler.headers.get("Upload-Offset", ""))
+        size = int(handler.headers.get("Content-Length", "0"))
+    except ValueError:
+        handler.send_plain(400, "Upload-Offset and Content-Length are required.")
+        return
+    if size < 0:
+        handler.send_plain(400, "Content-Length must not be negative.")
+        return
+    if size > MAX_CHUNK_BYTES:
+        # The body is never read, so the connection cannot be reused.
+        handler.close_connection = True
+        handler.send_plain(413, "Chunk exceeds the configured maximum size.")
+        return
+    data = bytearray()
+    while len(data) < size:
+        piece = handler.rfile.read(min(READ_CHUNK_BYTES, size - len(data)))
+        if not piece:
+            handler.send_plain(400, "Request body ended before Content-Length.")
+            return
+        data += piece
+    state = write_chunk("/".join(parts), offset, bytes(data), handler.headers.get("Upload-Checksum"))
+    handler.send_response(204)
+    handler.send_header("Upload-Offset", str(state.offset))
+    handler.send_header("Content-Length", "0")
+    handler.end_headers()
+
+
+def _query_date(query: Dict[str, List[str]], key: str) -> Optional[date]:
+    raw = (query.get(key) or [""])[0]
+    return date.fromisoformat(raw) if raw else None
+
+
+def _export_zip(handler: "SidecarHandler", parts: List[str]) -> None:
+    query = parse_qs(urlsplit(handler.path).query)
+    class_slug = (query.get("class") or [""])[0]
+    if class_slug not in CLASS_BY_SLUG:
+        handler.send_plain(404, "Unknown class.")
+        return
+    try:
+        start = _query_date(query, "start")
+        end = _query_date(query, "end")
+    except ValueError:
+        handler.send_plain(400, "Dates must be YYYY-MM-DD.")
+        return
+    entry_ids = {value for value in (query.get("entries") or [""])[0].split(",") if value}
+    handler.send_response(200)
+    handler.send_header("Content-Type", "application/zip")
+    handler.send_header(
+        "Content-Disposition", f'attachment; filename="{export_filename(class_slug, start, end)}"'
+    )
+    handler.send_header("Transfer-Encoding", "chunked")
+    handler.end_headers()
+    handler.write_chunks(iter_zip(class_slug, start, end, entry_ids or None))
+
+
+def _slides(handler: "SidecarHandler", parts: List[str]) -> None:
+    query = parse_qs(urlsplit(handler.path).query)
+    class_slug = (query.get("class") or [""])[0]
+    if class_slug not in CLASS_BY_SLUG:
+        handler.send_plain(404, "Unknown class.")
+        return
+    try:
+        offset = int((query.get("offset") or ["0"])[0])
+        limit = int((query.get("limit") or ["10"])[0])
+        filters = parse_query(query)
+    except ValueError:
+        handler.send_plain(400, "offset and limit must be integers and dates YYYY-MM-DD.")
+        return
+    body = json.dumps(slide_window(class_slug, offset, limit, filters)).encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Cache-Control", "no-store")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def _byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=start-end`` range; ``None`` means the whole file."""
+
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes=") :].partition("-")
+    try:
+        if not start_text:
+            start, end = max(0, size - int(end_text)), size - 1
+        else:
+            start, end = int(start_text), int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    return (start, min(end, size - 1)) if start <= end and start < size else None
+
+
+def _media(handler: "SidecarHandler", parts: List[str]) -> None:
+    if len(parts) != 4:
+        handler.send_plain(404, "Not found.")
+        return
+    path = resolve_media(*(unquote(part) for part in parts))
+    if path is None:
+        handler.send_plain(404, "Not found.")
+        return
+    size = path.stat().st_size
+    byte_range = _byte_range(handler.headers.get("Range"), size)
+    start, end = byte_range or (0, size - 1)
+    handler.send_response(206 if byte_range else 200)
+    handler.send_header("Content-Type", media_type_for(path))
+    handler.send_header("Accept-Ranges", "bytes")
+    handler.send_header("Cache-Control", "private, max-age=86400")
+    if byte_range:
+        handler.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+    handler.send_header("Content-Length", str(end - start + 1))
+    handler.end_headers()
+    with path.open("rb") as source:
+        source.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = source.read(min(READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            handler.wfile.write(chunk)
+            remaining -= len(chunk)
+
+
+ROUTES: Dict[Tuple[str, str], RouteHandler] = {
+    ("GET", "export"): _export_zip,
+    ("GET", "slides"): _slides,
+    ("GET", "media"): _media,
+    ("POST", "uploads"): _create_upload,
+    ("HEAD", "uploads"): _upload_status,
+    ("PATCH", "uploads"): _upload_chunk,
+}
+
+
+class SidecarHandler(BaseHTTPRequestHandler):
+    """Dispatch ``/<route>/<parts...>`` requests to the handlers in ``ROUTES``."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "ArtifactSidecar/1.0"
+
+    def end_headers(self) -> None:
+        origin = self.headers.get("Origin")
+        if origin and self._origin_allowed(origin):
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Access-Control-Expose-Headers", CORS_EXPOSE)
+        self.send_header("Vary", "Origin")
+        self.send_header("Tus-Resumable", TUS_VERSION)
+        super().end_headers()
+        self._headers_sent = True
+
+    def _origin_allowed(self, origin: str) -> bool:
+        if SIDECAR_ALLOWED_ORIGINS:
+            return origin.rstrip("/") in SIDECAR_ALLOWED_ORIGINS
+        # The app and the sidecar share a host name and differ only in port.
+        host = urlsplit(f"//{self.headers.get('Host', '')}").hostname
+        return bool(host) and urlsplit(origin).hostname == host
+
+    def _authorized(self) -> bool:
+        header = self.headers.get("Authorization", "")
+        if header.startswith("Bearer "):
+            token = header[len("Bearer ") :].strip()
+        else:
+            token = (parse_qs(urlsplit(self.path).query).get("token") or [""])[0]
+        return bool(token) and verify_token(token)
+
+    def send_plain(self, status: int, message: str) -> None:
+        body = message.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def write_chunks(self, pieces) -> None:
+        """Send an iterable of byte strings using chunked transfer encoding."""
+
+        for piece in pieces:
+            if piece:
+                self.wfile.write(f"{len(piece):X}\r\n".encode("ascii") + piece + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _dispatch(self) -> None:
+        self._headers_sent = False
+        path = self.path.split("?", 1)[0]
+        route, *parts = path.strip("/").split("/")
+        handler = ROUTES.get((self.command, route))
+        if handler is None:
+            self.send_plain(404, "Not found.")
+            return
+        if not self._authorized():
+            self.send_plain(401, "A valid sidecar token is required; reload the page.")
+            return
+        try:
+            handler(self, parts)
+        except UploadError as exc:
+            self.send_plain(exc.status, str(exc))
+        except Exception:  # pragma: no cover - relies on runtime environment
+            if self._headers_sent:
+                # Part of the response is already out; all that is left is to drop the connection.
+                self.close_connection = True
+            else:
+                self.send_plain(500, "The sidecar hit an unexpected error.")
+
+    def do_OPTIONS(self) -> None:  # noqa: N802 - http.server naming
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, POST, PATCH, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", CORS_ALLOW)
+        self.send_header("Tus-Version", TUS_VERSION)
+        self.send_header("Tus-Extension", "creation,checksum")
+        self.send_header("Tus-Max-Size", str(MAX_UPLOAD_BYTES))
+        self.send_header("Tus-Checksum-Algorithm", "sha256")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_HEAD = do_POST = do_PATCH = _dispatch
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - stdlib signature
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def start_sidecar() -> Optional[ThreadingHTTPServer]:
+    """Start the sidecar once per process; ``None`` if the port is unavailable."""
+
+    try:
+        server = ThreadingHTTPServer((SIDECAR_HOST, SIDECAR_PORT), SidecarHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="sidecar", daemon=True).start()
+    return server
+
+
+def sidecar_base_url() -> str:
+    """Return the public sidecar URL, or an empty string to derive it in the browser."""
+
+    return SIDECAR_PUBLIC_URL.rstrip("/")
+
+
+SIDECAR_LINK_HTML = """
+<a id="sidecar-link" class="sidecar-link" target="_blank" rel="noopener"></a>
+<style>
+.sidecar-link { display: block; text-align: center; padding: 0.55rem 0.9rem; border-radius: 10px;
+  background: #0ea5e9; color: #fff; text-decoration: none; font-family: sans-serif; font-size: 0.92rem; }
+</style>
+<script>
+const CONFIG = __CONFIG__;
+const host = window.parent.location;  // component iframes are same-origin srcdoc documents
+const base = CONFIG.baseUrl || `${host.protocol}//${host.hostname}:${CONFIG.port}`;
+const link = document.getElementById("sidecar-link");
+link.textContent = CONFIG.label;
+link.href = base + CONFIG.path;  // the path carries the session's token
+</script>
+"""
+
+
+def render_sidecar_link(path: str, label: str) -> None:
+    """Render a button-style link to a sidecar path such as an export."""
+
+    start_sidecar()
+    config = {
+        "baseUrl": sidecar_base_url(),
+        "port": SIDECAR_PORT,
+        "path": with_token(path, issue_token()),
+        "label": label,
+    }
+    components.html(SIDECAR_LINK_HTML.replace("__CONFIG__", json.dumps(config)), height=52)
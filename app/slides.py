@@ -0,0 +1,127 @@
+"""Slide manifests and media lookup for the browser-side slideshow.
+
+The sidecar serves both: ``/slides`` returns a window of manifests and
+``/media/<class>/<date>/<entry>/<file>`` streams the files they reference.
+"""
+
+from __future__ import annotations
+
+import itertools
+import mimetypes
+from datetime import date
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Sequence
+from urllib.parse import quote
+
+from .renditions import rendition_for
+from .storage import (
+    ALL_ENTRIES,
+    MEDIA_TYPES,
+    EntryContent,
+    EntryQuery,
+    iter_entries,
+    load_segments,
+    media_file_path,
+)
+from .styling import format_entry_time
+
+
+MAX_WINDOW = 50
+
+
+def media_url(class_slug: str, entry_date: date, entry: EntryContent, name: str) -> str:
+    return "/media/" + "/".join(quote(part) for part in (class_slug, entry_date.isoformat(), entry.entry_id, name))
+
+
+def slide_record(class_slug: str, index: int, entry_date: date, entry: EntryContent) -> Dict:
+    """Describe one entry with everything the client needs to render it."""
+
+    segments = load_segments(entry) if entry.text.transcript_text else None
+    record = {
+        "index": index,
+        "entry_id": entry.entry_id,
+        "date": entry_date.isoformat(),
+        "date_label": entry_date.strftime("%A, %B %d, %Y"),
+        "time": format_entry_time(entry.created_at),
+        "notes": entry.text.manual_text,
+        "transcript": entry.text.transcript_text,
+        "segments": {"start": segments["start"], "text": segments["text"]} if segments else None,
+    }
+    for media_type in MEDIA_TYPES:
+        record[media_type] = [
+            media_url(class_slug, entry_date, entry, name) for name in entry.media_names(media_type)
+        ]
+    return record
+
+
+def query_params(query: EntryQuery) -> Dict[str, str]:
+    """Encode an entry query as URL parameters understood by :func:`parse_query`."""
+
+    params: Dict[str, str] = {}
+    if query.start:
+        params["start"] = query.start.isoformat()
+    if query.end:
+        params["end"] = query.end.isoformat()
+    if query.media_types:
+        params["media"] = ",".join(query.media_types)
+    if query.has_transcript is not None:
+        params["transcript"] = "1" if query.has_transcript else "0"
+    if query.text:
+        params["q"] = query.text
+    return params
+
+
+def parse_query(params: Mapping[str, Sequence[str]]) -> EntryQuery:
+    """Build an entry query from ``parse_qs`` output; raises ``ValueError`` on bad dates."""
+
+    def first(key: str) -> str:
+        return (params.get(key) or [""])[0]
+
+    transcript = first("transcript")
+    return EntryQuery(
+        start=date.fromisoformat(first("start")) if first("start") else None,
+        end=date.fromisoformat(first("end")) if first("end") else None,
+        media_types=tuple(kind for kind in first("media").split(",") if kind in MEDIA_TYPES),
+        has_transcript=(transcript == "1") if transcript else None,
+        text=first("q") or None,
+    )
+
+
+def slide_window(class_slug: str, offset: int, limit: int, query: EntryQuery = ALL_ENTRIES) -> Dict:
+    """Return ``limit`` matching slides starting at ``offset``, newest first, plus the total.
+
+    Only the window's entries are held; the rest of the stream is just counted.
+    """
+
+    limit = max(1, min(limit, MAX_WINDOW))
+    entries = iter_entries(class_slug, query)
+    # An offset past the end is clamped to the total, giving an empty window.
+    offset = sum(1 for _ in itertools.islice(entries, max(0, offset)))
+    window = list(itertools.islice(entries, limit))
+    total = offset + len(window) + sum(1 for _ in entries)
+    return {
+        "total": total,
+        "offset": offset,
+        "slides": [
+            slide_record(class_slug, offset + position, entry_date, entry)
+            for position, (entry_date, entry) in enumerate(window)
+        ],
+    }
+
+
+def resolve_media(class_slug: str, day: str, entry_id: str, name: str) -> Optional[Path]:
+    """Return the local path to serve for a stored media file, or ``None`` if it is not one."""
+
+    try:
+        entry_date = date.fromisoformat(day)
+    except ValueError:
+        return None
+    path = media_file_path(class_slug, entry_date, entry_id, name)
+    if path is None or not path.is_file():
+        return None
+    # HEIC and BMP photos are served as their WebP rendition.
+    return rendition_for(path)
+
+
+def media_type_for(path: Path) -> str:
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
@@ -2,186 +2,748 @@
 
 from __future__ import annotations
 
+import heapq
 import json
 import os
+import sys
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
 import shutil
 
-from slugify import slugify
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - advisory locks are POSIX-only
+    fcntl = None  # type: ignore
 
-from .constants import CLASS_BY_NAME, CLASS_BY_SLUG, ClassInfo
+from .backends import IndexMutator, StorageBackend, StorageBackendError, get_backend
+from .constants import CLASS_BY_NAME, CLASS_BY_SLUG, CLASS_INFOS, MEDIA_EXTENSIONS, MEDIA_TYPES, ClassInfo
+from .entry_ids import entry_id_at, entry_id_time, entry_sort_key, is_time_sortable, new_entry_id
+from .usage import UsageChange, enforce_quota, record_usage
 
 
 DATA_ROOT = Path(os.environ.get("DATA_ROOT", "data"))
-MEDIA_EXTENSIONS = {
-    "image": {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".heic"},
-    "video": {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm"},
-    "audio": {".wav", ".mp3", ".m4a", ".aac", ".ogg"},
-}
+LOCK_ROOT = DATA_ROOT / ".locks"
+TRASH_ROOT = DATA_ROOT / ".trash"
+MKDIR_RETRIES = 5
 TEXT_FILES = {"notes.txt", "voice_transcript.txt"}
+SEGMENTS_FILE = "voice_segments.json"
+# Index records written before text was kept out of the index carry it under these fields.
+INDEX_TEXT_FIELDS = {"notes.txt": "notes", "voice_transcript.txt": "transcript"}
 
-@dataclass
+_index_batch = threading.local()
+
+
+@dataclass(slots=True)
 class EntryText:
     manual_text: Optional[str] = None
     transcript_text: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class EntryContent:
-    """Represents a single saved entry in the gallery."""
+    """Represents a single saved entry in the gallery.
+
+    Media is kept as one tuple of interned filenames ordered by ``MEDIA_TYPES``;
+    ``media_bounds`` holds the end offset of each type. Absolute paths are only
+    built when a page asks for them, so cached galleries stay small.
+    """
 
     entry_id: str
     created_at: datetime
-    media_files: Dict[str, List[Path]]
+    filenames: Tuple[str, ...]
+    media_bounds: Tuple[int, ...]
     text: EntryText
-    directory: Path
+    parent: Path
+
+    @property
+    def directory(self) -> Path:
+        return self.parent / self.entry_id
+
+    def media_names(self, media_type: str) -> Tuple[str, ...]:
+        position = MEDIA_TYPES.index(media_type)
+        start = self.media_bounds[position - 1] if position else 0
+        return self.filenames[start : self.media_bounds[position]]
+
+    def media_count(self, media_type: str) -> int:
+        return len(self.media_names(media_type))
+
+    def media_paths(self, media_type: str) -> List[Path]:
+        directory = self.directory
+        backend = _backend()
+        return [backend.materialize(directory / name) for name in self.media_names(media_type)]
+
+    def first_media_path(self, media_type: str) -> Optional[Path]:
+        names = self.media_names(media_type)
+        return _backend().materialize(self.directory / names[0]) if names else None
 
+    @property
+    def media_files(self) -> Dict[str, List[Path]]:
+        return {media_type: self.media_paths(media_type) for media_type in MEDIA_TYPES}
 
-@dataclass
+
+@dataclass(slots=True)
 class DateBucket:
     date_value: date
     entries: List[EntryContent]
 
 
+def _backend() -> StorageBackend:
+    return get_backend(DATA_ROOT)
+
+
+def _index_location(entry_dir: Path) -> Tuple[str, str]:
+    """Return ``(class_slug, "date/entry_id")`` for an entry directory."""
+
+    return entry_dir.parent.parent.name, f"{entry_dir.parent.name}/{entry_dir.name}"
+
+
+def _file_size(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def batched_index_updates() -> Iterator[None]:
+    """Defer this thread's index changes and write them in one update per class on exit.
+
+    A save commits metadata, media, audio and text one after another; on an
+    index backend each commit would otherwise read and rewrite the whole class
+    index. The changes are written even when the body raises, so the index
+    always lists what was uploaded.
+    """
+
+    if getattr(_index_batch, "pending", None) is not None:
+        yield
+        return
+    _index_batch.pending = {}
+    try:
+        yield
+    finally:
+        pending: Dict[str, List[IndexMutator]] = _index_batch.pending
+        _index_batch.pending = None
+        for class_slug, mutators in pending.items():
+            _backend().update_index(class_slug, _apply_all(mutators))
+
+
+def _apply_all(mutators: List[IndexMutator]) -> IndexMutator:
+    def mutate(index: Dict) -> None:
+        for apply in mutators:
+            apply(index)
+
+    return mutate
+
+
+def _update_index(class_slug: str, mutate: IndexMutator) -> None:
+    pending = getattr(_index_batch, "pending", None)
+    if pending is None:
+        _backend().update_index(class_slug, mutate)
+    else:
+        pending.setdefault(class_slug, []).append(mutate)
+
+
+def _commit_files(entry_dir: Path, paths: List[Path], replaced: Optional[Dict[Path, int]] = None) -> None:
+    """Persist freshly written files, count them in the usage ledger and index them.
+
+    ``replaced`` maps overwritten paths to their previous size, so rewriting a
+    transcript only adds the difference. The index records file names and
+    sizes only; notes and transcripts are read from their files.
+    """
+
+    backend = _backend()
+    replaced = replaced or {}
+    sizes = {path: path.stat().st_size for path in paths}
+    for path in paths:
+        backend.commit(path)
+    class_slug, key = _index_location(entry_dir)
+    record_usage(
+        DATA_ROOT,
+        class_slug,
+        entry_dir.parent.name,
+        [
+            (path.name, 0 if path in replaced else 1, size - replaced.get(path, 0))
+            for path, size in sizes.items()
+        ],
+    )
+    if not backend.uses_index or not paths:
+        return
+    created_at = None
+    names = []
+    for path in paths:
+        if path.name == "metadata.json":
+            created_at = json.loads(path.read_text(encoding="utf-8"))["created_at"]
+        else:
+            names.append(path.name)
+
+    def _add(index: Dict) -> None:
+        record = index["entries"].setdefault(key, {"created_at": None, "files": []})
+        record.setdefault("sizes", {}).update({path.name: size for path, size in sizes.items()})
+        for name, field in INDEX_TEXT_FIELDS.items():
+            if record.pop(field, None) is not None and name not in record["files"]:
+                record["files"].append(name)
+        if created_at is not None:
+            record["created_at"] = created_at
+        record["files"].extend(name for name in names if name not in record["files"])
+
+    _update_index(class_slug, _add)
+
+
+def _atomic_write(destination: Path, data) -> None:
+    """Write ``data`` to a hidden temp file, fsync it, then rename it into place."""
+
+    temp_path = destination.with_name(f".{destination.name}.{uuid4().hex[:8]}.tmp")
+    try:
+        with temp_path.open("wb") as output:
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temp_path, destination)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def _date_lock(class_slug: str, day_value: str) -> Iterator[None]:
+    """Hold an exclusive advisory lock on one class/date directory.
+
+    The lock file lives outside the date directory so that removing an
+    empty date directory never races with creating an entry inside it.
+    """
+
+    lock_path = LOCK_ROOT / class_slug / f"{day_value}.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
 def _safe_filename(original_name: str) -> str:
+    from slugify import slugify  # deferred: only uploads need it, gallery pages do not
+
     stem = slugify(Path(original_name).stem, lowercase=False) or "file"
     suffix = Path(original_name).suffix.lower()
     return f"{stem}{suffix}"
 
 
 def ensure_entry_dir(class_name: str, day: date) -> Path:
-    """Create and return a directory for a new entry."""
+    """Create and return a directory for a new entry.
+
+    The entry id is time-sortable (see :mod:`app.entry_ids`), so the folder
+    name alone orders the entry and records when it was created.
+    """
 
     class_info = CLASS_BY_NAME[class_name]
     date_dir = DATA_ROOT / class_info.slug / day.isoformat()
-    entry_id = f"{datetime.now().strftime('%H%M%S')}-{uuid4().hex[:8]}"
-    entry_dir = date_dir / entry_id
-    entry_dir.mkdir(parents=True, exist_ok=True)
-    metadata = {
-        "class": class_info.slug,
-        "date": day.isoformat(),
-        "entry_id": entry_id,
-        "created_at": datetime.now().isoformat(),
-    }
-    (entry_dir / "metadata.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    with _date_lock(class_info.slug, day.isoformat()):
+        for attempt in range(MKDIR_RETRIES):
+            entry_id = new_entry_id()
+            entry_dir = date_dir / entry_id
+            try:
+                date_dir.mkdir(parents=True, exist_ok=True)
+                entry_dir.mkdir()
+                break
+            except (FileNotFoundError, FileExistsError):
+                # A concurrent delete removed an empty class directory, or the
+                # id collided; either way pick a fresh id and try again.
+                if attempt == MKDIR_RETRIES - 1:
+                    raise
+        metadata = {
+            "class": class_info.slug,
+            "date": day.isoformat(),
+            "entry_id": entry_id,
+            "created_at": entry_id_time(entry_id).isoformat(),
+        }
+        metadata_path = entry_dir / "metadata.json"
+        _atomic_write(metadata_path, json.dumps(metadata, indent=2).encode("utf-8"))
+    _commit_files(entry_dir, [metadata_path])
     return entry_dir
 
 
+def _upload_filename(timestamp_prefix: str, position: int, original_name: str) -> str:
+    return f"{timestamp_prefix}-{position:02d}-{_safe_filename(original_name)}"
+
+
 def save_uploaded_files(entry_dir: Path, uploaded_files: Iterable) -> List[Path]:
+    uploaded_files = list(uploaded_files)
+    enforce_quota(DATA_ROOT, entry_dir.parent.parent.name, sum(len(file.getbuffer()) for file in uploaded_files if file))
     saved_paths: List[Path] = []
     timestamp_prefix = datetime.now().strftime("%H%M%S")
     for position, file in enumerate(uploaded_files):
         if not file:
             continue
-        filename = _safe_filename(file.name)
-        unique_name = f"{timestamp_prefix}-{position:02d}-{filename}"
-        destination = entry_dir / unique_name
-        with destination.open("wb") as output:
-            output.write(file.getbuffer())
+        destination = entry_dir / _upload_filename(timestamp_prefix, position, file.name)
+        _atomic_write(destination, file.getbuffer())
         saved_paths.append(destination)
+    _commit_files(entry_dir, saved_paths)
+    return saved_paths
+
+
+def save_staged_files(entry_dir: Path, staged_files: Iterable[Tuple[str, Path]]) -> List[Path]:
+    """Move already-written ``(original_name, path)`` pairs into an entry.
+
+    Files are renamed rather than copied, so staging must live on the same
+    volume as ``DATA_ROOT``.
+    """
+
+    saved_paths: List[Path] = []
+    timestamp_prefix = datetime.now().strftime("%H%M%S")
+    for position, (original_name, source) in enumerate(staged_files):
+        destination = entry_dir / _upload_filename(timestamp_prefix, position, original_name)
+        shutil.move(str(source), destination)
+        saved_paths.append(destination)
+    _commit_files(entry_dir, saved_paths)
     return saved_paths
 
 
 def save_audio(entry_dir: Path, audio_bytes: bytes, suffix: str = ".wav") -> Path:
     filename = f"audio-{datetime.now().strftime('%H%M%S')}{suffix}"
     destination = entry_dir / filename
-    with destination.open("wb") as output:
-        output.write(audio_bytes)
+    _atomic_write(destination, audio_bytes)
+    _commit_files(entry_dir, [destination])
     return destination
 
 
 def save_text(entry_dir: Path, name: str, content: str) -> Path:
     destination = entry_dir / name
-    destination.write_text(content.strip() + "\n", encoding="utf-8")
+    previous = _file_size(destination)
+    _atomic_write(destination, (content.strip() + "\n").encode("utf-8"))
+    _commit_files(entry_dir, [destination], {destination: previous} if previous is not None else None)
     return destination
 
 
-def load_gallery(class_slug: str) -> List[DateBucket]:
+def save_segments(entry_dir: Path, segments: Dict[str, object]) -> Path:
+    """Store transcript segment timings as a compact columnar JSON sidecar.
+
+    The payload holds parallel ``start``/``end``/``text`` lists and, when word
+    timestamps were requested, a ``words`` table of the same shape with a
+    ``segment`` column pointing back into the segment lists.
+    """
+
+    destination = entry_dir / SEGMENTS_FILE
+    previous = _file_size(destination)
+    _atomic_write(destination, json.dumps(segments, separators=(",", ":")).encode("utf-8"))
+    _commit_files(entry_dir, [destination], {destination: previous} if previous is not None else None)
+    return destination
+
+
+def load_segments(entry: EntryContent) -> Optional[Dict[str, list]]:
+    """Return an entry's transcript segments, or ``None`` when there are none."""
+
+    try:
+        path = _backend().materialize(entry.directory / SEGMENTS_FILE)
+        segments = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(segments, dict) or not segments.get("start"):
+        return None
+    return segments
+
+
+def _build_entry(
+    entry_id: str,
+    created_at: datetime,
+    names: Iterable[str],
+    text: EntryText,
+    parent: Path,
+) -> EntryContent:
+    media: Dict[str, List[str]] = {media_type: [] for media_type in MEDIA_TYPES}
+    for name in names:
+        suffix = Path(name).suffix.lower()
+        for media_type, extensions in MEDIA_EXTENSIONS.items():
+            if suffix in extensions:
+                media[media_type].append(sys.intern(name))
+                break
+    filenames: List[str] = []
+    bounds: List[int] = []
+    for media_type in MEDIA_TYPES:
+        filenames.extend(media[media_type])
+        bounds.append(len(filenames))
+    return EntryContent(
+        entry_id=sys.intern(entry_id),
+        created_at=created_at,
+        filenames=tuple(filenames),
+        media_bounds=tuple(bounds),
+        text=text,
+        parent=parent,
+    )
+
+
+def media_file_path(class_slug: str, entry_date: date, entry_id: str, name: str) -> Optional[Path]:
+    """Return a readable path for one stored media file, or ``None`` if there is none.
+
+    Only plain names with a media extension are accepted, so callers can pass
+    request path segments straight through.
+    """
+
+    class_info = CLASS_BY_SLUG.get(class_slug)
+    for part in (entry_id, name):
+        if not part or part.startswith(".") or "/" in part or "\\" in part:
+            return None
+    if class_info is None or not any(Path(name).suffix.lower() in exts for exts in MEDIA_EXTENSIONS.values()):
+        return None
+    try:
+        return _backend().materialize(DATA_ROOT / class_info.slug / entry_date.isoformat() / entry_id / name)
+    except FileNotFoundError:
+        return None
+
+
+def entry_file_paths(entry: EntryContent) -> List[Path]:
+    """Return local paths for every stored file of an entry, fetching if needed."""
+
+    directory = entry.directory
+    backend = _backend()
+    if not backend.uses_index:
+        return sorted(path for path in directory.iterdir() if path.is_file() and not path.name.startswith("."))
+    names = ["metadata.json", *entry.filenames]
+    if load_segments(entry) is not None:
+        names.append(SEGMENTS_FILE)
+    if entry.text.manual_text is not None:
+        names.append("notes.txt")
+    if entry.text.transcript_text is not None:
+        names.append("voice_transcript.txt")
+    return [backend.materialize(directory / name) for name in sorted(names)]
+
+
+@dataclass(frozen=True)
+class EntryQuery:
+    """Filters for :func:`iter_entries`. Unset fields do not constrain results.
+
+    ``media_types`` matches entries holding at least one of the listed types;
+    ``text`` is a case-insensitive substring of the notes or transcript.
+    """
+
+    start: Optional[date] = None
+    end: Optional[date] = None
+    media_types: Tuple[str, ...] = ()
+    has_transcript: Optional[bool] = None
+    text: Optional[str] = None
+
+    def includes_date(self, value: date) -> bool:
+        return (self.start is None or value >= self.start) and (self.end is None or value <= self.end)
+
+    def matches_names(self, names: Iterable[str]) -> bool:
+        """Checks that only need file names, run before any file is read."""
+
+        names = list(names)
+        if self.has_transcript is not None and ("voice_transcript.txt" in names) != self.has_transcript:
+            return False
+        if self.media_types:
+            suffixes = {Path(name).suffix.lower() for name in names}
+            if not any(suffixes & MEDIA_EXTENSIONS[media_type] for media_type in self.media_types):
+                return False
+        return True
+
+    def matches_text(self, text: EntryText) -> bool:
+        if not self.text:
+            return True
+        needle = self.text.casefold()
+        return any(needle in value.casefold() for value in (text.manual_text, text.transcript_text) if value)
+
+
+ALL_ENTRIES = EntryQuery()
+
+
+def _date_names(names: Iterable[str], query: EntryQuery) -> Iterator[Tuple[date, str]]:
+    """Yield ``(date, name)`` for date-named folders in range, newest first."""
+
+    for name in sorted(names, reverse=True):
+        try:
+            value = date.fromisoformat(name)
+        except ValueError:
+            continue
+        if query.includes_date(value):
+            yield value, name
+
+
+def _read_entry(entry_dir: Path, date_dir: Path, query: EntryQuery) -> Optional[EntryContent]:
+    """Load one entry folder, skipping file reads when its names already rule it out."""
+
+    listing = sorted(path.name for path in entry_dir.iterdir() if not path.name.startswith("."))
+    if not query.matches_names(listing):
+        return None
+    text = EntryText()
+    if "notes.txt" in listing:
+        text.manual_text = (entry_dir / "notes.txt").read_text(encoding="utf-8").strip()
+    if "voice_transcript.txt" in listing:
+        text.transcript_text = (entry_dir / "voice_transcript.txt").read_text(encoding="utf-8").strip()
+    if not query.matches_text(text):
+        return None
+    created_at = entry_id_time(entry_dir.name)
+    if created_at is None:
+        created_at = _legacy_created_at(entry_dir, listing)
+    names = [name for name in listing if name not in TEXT_FILES]
+    return _build_entry(entry_dir.name, created_at, names, text, date_dir)
+
+
+def _legacy_created_at(entry_dir: Path, listing: List[str]) -> datetime:
+    """Creation time of an entry whose id does not encode it."""
+
+    created_at = datetime.fromtimestamp(entry_dir.stat().st_mtime)
+    if "metadata.json" in listing:
+        try:
+            metadata = json.loads((entry_dir / "metadata.json").read_text())
+            created_raw = metadata.get("created_at")
+            if created_raw:
+                created_at = datetime.fromisoformat(created_raw)
+        except (json.JSONDecodeError, ValueError):
+            pass
+    return created_at
+
+
+def _indexed_text(entry_dir: Path, names: List[str], record: Dict) -> EntryText:
+    """Read an indexed entry's notes and transcript, which stay cached locally."""
+
+    values: Dict[str, Optional[str]] = {}
+    for name, field in INDEX_TEXT_FIELDS.items():
+        values[field] = record.get(field)
+        if values[field] is None and name in names:
+            try:
+                values[field] = _backend().materialize(entry_dir / name).read_text(encoding="utf-8").strip()
+            except FileNotFoundError:
+                pass
+    return EntryText(manual_text=values["notes"], transcript_text=values["transcript"])
+
+
+def _iter_index_entries(class_slug: str, query: EntryQuery) -> Iterator[Tuple[date, EntryContent]]:
+    """Yield entries from the metadata index without listing the object store."""
+
+    by_date: Dict[str, List[Tuple[str, Dict]]] = {}
+    for key, record in _backend().read_index(class_slug)["entries"].items():
+        date_value, _, entry_id = key.partition("/")
+        by_date.setdefault(date_value, []).append((entry_id, record))
+
+    for bucket_date, date_value in _date_names(by_date, query):
+        parent = DATA_ROOT / class_slug / date_value
+        for entry_id, record in sorted(by_date[date_value], key=lambda item: entry_sort_key(item[0]), reverse=True):
+            names = sorted(record.get("files", []))
+            names.extend(name for name, field in INDEX_TEXT_FIELDS.items() if record.get(field) is not None)
+            if not query.matches_names(names):
+                continue
+            text = _indexed_text(parent / entry_id, names, record)
+            if not query.matches_text(text):
+                continue
+            try:
+                created_at = datetime.fromisoformat(record.get("created_at") or "")
+            except ValueError:
+                created_at = datetime.combine(bucket_date, datetime.min.time())
+            media_names = [name for name in names if name not in TEXT_FILES]
+            yield bucket_date, _build_entry(entry_id, created_at, media_names, text, parent)
+
+
+def iter_entries(class_slug: str, query: EntryQuery = ALL_ENTRIES) -> Iterator[Tuple[date, EntryContent]]:
+    """Lazily yield ``(date, entry)`` pairs matching ``query``, newest first.
+
+    Date folders outside the range are skipped by name, so only entries on
+    matching days are opened.
+    """
+
     class_info: ClassInfo = CLASS_BY_SLUG[class_slug]
+    if _backend().uses_index:
+        yield from _iter_index_entries(class_info.slug, query)
+        return
     class_dir = DATA_ROOT / class_info.slug
     if not class_dir.exists():
-        return []
-
-    buckets: List[DateBucket] = []
-    for date_dir in sorted(class_dir.iterdir(), reverse=True):
+        return
+    for bucket_date, name in _date_names((path.name for path in class_dir.iterdir()), query):
+        date_dir = class_dir / name
         if not date_dir.is_dir():
             continue
-        try:
-            bucket_date = date.fromisoformat(date_dir.name)
-        except ValueError:
-            continue
-        entries: List[EntryContent] = []
-        for entry_dir in sorted(date_dir.iterdir(), reverse=True):
-            if not entry_dir.is_dir():
+        for entry_dir in sorted(date_dir.iterdir(), key=lambda path: entry_sort_key(path.name), reverse=True):
+            if not entry_dir.is_dir() or entry_dir.name.startswith("."):
                 continue
-            metadata_path = entry_dir / "metadata.json"
-            created_at = datetime.fromtimestamp(entry_dir.stat().st_mtime)
-            if metadata_path.exists():
-                try:
-                    metadata = json.loads(metadata_path.read_text())
-                    created_raw = metadata.get("created_at")
-                    if created_raw:
-                        created_at = datetime.fromisoformat(created_raw)
-                except (json.JSONDecodeError, ValueError):
-                    pass
-            media: Dict[str, List[Path]] = {"image": [], "video": [], "audio": []}
-            text = EntryText()
-            for path in sorted(entry_dir.iterdir()):
-                if path.name in TEXT_FILES:
-                    content = path.read_text(encoding="utf-8").strip()
-                    if path.name == "notes.txt":
-                        text.manual_text = content
-                    elif path.name == "voice_transcript.txt":
-                        text.transcript_text = content
-                    continue
-                suffix = path.suffix.lower()
-                for media_type, extensions in MEDIA_EXTENSIONS.items():
-                    if suffix in extensions:
-                        media[media_type].append(path)
-                        break
-            entries.append(
-                EntryContent(
-                    entry_id=entry_dir.name,
-                    created_at=created_at,
-                    media_files=media,
-                    text=text,
-                    directory=entry_dir,
-                )
-            )
-        if entries:
-            buckets.append(DateBucket(date_value=bucket_date, entries=entries))
-    return buckets
+            entry = _read_entry(entry_dir, date_dir, query)
+            if entry is not None:
+                yield bucket_date, entry
 
 
-def delete_entry(class_slug: str, entry_date: date, entry_id: str) -> bool:
-    """Delete a saved entry directory and clean up empty parents."""
+def _timeline_stream(class_info: ClassInfo, query: EntryQuery) -> Iterator[Tuple[ClassInfo, date, EntryContent]]:
+    for bucket_date, entry in iter_entries(class_info.slug, query):
+        yield class_info, bucket_date, entry
+
+
+def iter_timeline(
+    query: EntryQuery = ALL_ENTRIES, class_slugs: Optional[Iterable[str]] = None
+) -> Iterator[Tuple[ClassInfo, date, EntryContent]]:
+    """Lazily yield ``(class, date, entry)`` across classes, newest first.
+
+    Each class's :func:`iter_entries` stream is already ordered by date folder
+    and :func:`entry_sort_key`, so the streams are k-way merged on that same key instead of
+    being collected and sorted. Taking the first ``n`` items reads only about
+    ``n`` entries from each class.
+    """
+
+    slugs = set(class_slugs) if class_slugs is not None else None
+    streams = [
+        _timeline_stream(class_info, query)
+        for class_info in CLASS_INFOS
+        if slugs is None or class_info.slug in slugs
+    ]
+    yield from heapq.merge(*streams, key=lambda item: (item[1], entry_sort_key(item[2].entry_id)), reverse=True)
+
+
+def list_entry_dates(class_slug: str) -> List[date]:
+    """Return the dates that have a folder (or index records) for a class, newest first."""
 
     class_info: ClassInfo = CLASS_BY_SLUG[class_slug]
-    entry_dir = DATA_ROOT / class_info.slug / entry_date.isoformat() / entry_id
-    if not entry_dir.exists() or not entry_dir.is_dir():
-        return False
+    if _backend().uses_index:
+        names: Iterable[str] = {key.partition("/")[0] for key in _backend().read_index(class_info.slug)["entries"]}
+    else:
+        class_dir = DATA_ROOT / class_info.slug
+        names = [path.name for path in class_dir.iterdir()] if class_dir.exists() else []
+    return [value for value, _name in _date_names(names, ALL_ENTRIES)]
 
-    try:
-        shutil.rmtree(entry_dir)
-    except OSError:
+
+def query_gallery(class_slug: str, query: EntryQuery = ALL_ENTRIES) -> List[DateBucket]:
+    """Group the entries matching ``query`` into date buckets, newest first."""
+
+    buckets: List[DateBucket] = []
+    for bucket_date, entry in iter_entries(class_slug, query):
+        if not buckets or buckets[-1].date_value != bucket_date:
+            buckets.append(DateBucket(date_value=bucket_date, entries=[]))
+        buckets[-1].entries.append(entry)
+    return buckets
+
+
+def load_gallery(class_slug: str) -> List[DateBucket]:
+    return query_gallery(class_slug)
+
+
+def migrate_entry_ids(class_slug: str, dry_run: bool = False) -> Iterator[Tuple[Path, Path]]:
+    """Rename legacy ``HHMMSS-<hex>`` entry folders to time-sortable ids.
+
+    Each new id encodes the entry's recorded creation time, so existing
+    entries keep their order. Entries with an unfinished resumable upload are
+    skipped, because the upload refers to the old name. Yields
+    ``(old_path, new_path)`` for every rename.
+    """
+
+    if _backend().uses_index:
+        raise StorageBackendError("Entry ids can only be migrated on the local backend.")
+    class_dir = DATA_ROOT / CLASS_BY_SLUG[class_slug].slug
+    names = [path.name for path in class_dir.iterdir()] if class_dir.is_dir() else []
+    for _bucket_date, name in _date_names(names, ALL_ENTRIES):
+        date_dir = class_dir / name
+        with _date_lock(class_slug, name):
+            legacy: List[Tuple[datetime, str, Path]] = []
+            for entry_dir in date_dir.iterdir():
+                if not entry_dir.is_dir() or entry_dir.name.startswith(".") or is_time_sortable(entry_dir.name):
+                    continue
+                listing = [path.name for path in entry_dir.iterdir()]
+                if any(item.startswith(".upload-") for item in listing):
+                    continue
+                legacy.append((_legacy_created_at(entry_dir, listing), entry_dir.name, entry_dir))
+            previous_id: Optional[str] = None
+            for created_at, _name, entry_dir in sorted(legacy):
+                previous_id = entry_id_at(created_at, after=previous_id)
+                target = date_dir / previous_id
+                if not dry_run:
+                    os.rename(entry_dir, target)
+                    metadata = {
+                        "class": class_slug,
+                        "date": name,
+                        "entry_id": target.name,
+                        "created_at": created_at.isoformat(),
+                    }
+                    metadata_path = target / "metadata.json"
+                    previous = _file_size(metadata_path)
+                    _atomic_write(metadata_path, json.dumps(metadata, indent=2).encode("utf-8"))
+                    _commit_files(target, [metadata_path], {metadata_path: previous} if previous is not None else None)
+                yield entry_dir, target
+
+
+def _delete_indexed_entry(backend: StorageBackend, entry_dir: Path) -> bool:
+    class_slug, key = _index_location(entry_dir)
+    removed: Dict[str, Dict] = {}
+
+    def _remove(index: Dict) -> None:
+        record = index["entries"].pop(key, None)
+        if record is not None:
+            removed["record"] = record
+
+    backend.update_index(class_slug, _remove)
+    record = removed.get("record")
+    if record is None:
         return False
+    names = ["metadata.json", *record.get("files", [])]
+    names.extend(name for name, field in INDEX_TEXT_FIELDS.items() if record.get(field) is not None)
+    sizes = record.get("sizes", {})
+    names = sorted({*names, *sizes})
+    backend.remove_entry(entry_dir, names)
+    record_usage(DATA_ROOT, class_slug, entry_dir.parent.name, [(name, -1, -sizes.get(name, 0)) for name in names])
+    if entry_dir.is_dir():
+        _remove_entry_tree(entry_dir)
+    return True
+
+
+def _entry_usage(entry_dir: Path) -> List[UsageChange]:
+    """Negative usage changes for every file in a local entry directory."""
+
+    changes: List[UsageChange] = []
+    for path in entry_dir.iterdir():
+        if path.is_file() and not path.name.startswith("."):
+            changes.append((path.name, -1, -path.stat().st_size))
+    return changes
+
+
+def _remove_entry_tree(entry_dir: Path) -> bool:
+    """Remove an entry directory, then prune its date and class parents if empty.
+
+    The entry is first renamed into ``.trash`` so it disappears from listings
+    atomically; a crash afterwards only leaves garbage in ``.trash``. Parent
+    pruning happens under the date lock and relies on ``rmdir`` refusing to
+    remove non-empty directories, so it is safe to repeat.
+    """
+
     date_dir = entry_dir.parent
+    class_dir = date_dir.parent
+    TRASH_ROOT.mkdir(parents=True, exist_ok=True)
+    trash_dir = TRASH_ROOT / f"{class_dir.name}-{date_dir.name}-{entry_dir.name}-{uuid4().hex[:8]}"
     try:
-        if date_dir.exists() and not any(date_dir.iterdir()):
-            date_dir.rmdir()
+        os.replace(entry_dir, trash_dir)
+    except FileNotFoundError:
+        return False
     except OSError:
-        pass
-
-    class_dir = DATA_ROOT / class_info.slug
+        trash_dir = entry_dir
     try:
-        if class_dir.exists() and not any(class_dir.iterdir()):
-            class_dir.rmdir()
+        shutil.rmtree(trash_dir)
     except OSError:
-        pass
+        if trash_dir == entry_dir:
+            return False
+
+    with _date_lock(class_dir.name, date_dir.name):
+        for directory in (date_dir, class_dir):
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+    return True
 
+
+def delete_entry(class_slug: str, entry_date: date, entry_id: str) -> bool:
+    """Delete a saved entry directory and clean up empty parents."""
+
+    class_info: ClassInfo = CLASS_BY_SLUG[class_slug]
+    entry_dir = DATA_ROOT / class_info.slug / entry_date.isoformat() / entry_id
+    backend = _backend()
+    if backend.uses_index:
+        return _delete_indexed_entry(backend, entry_dir)
+    if not entry_dir.exists() or not entry_dir.is_dir():
+        return False
+    changes = _entry_usage(entry_dir)
+    if not _remove_entry_tree(entry_dir):
+        return False
+    record_usage(DATA_ROOT, class_info.slug, entry_date.isoformat(), changes)
     return True
@@ -384,6 +384,33 @@ header[data-testid="stHeader"] div[data-testid="stToolbar"] {
 }
 
 
+/* Gallery grid cards */
+.grid-card-placeholder {
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    aspect-ratio: 4 / 3;
+    border-radius: 12px;
+    background: linear-gradient(145deg, rgba(14, 165, 233, 0.12), rgba(99, 102, 241, 0.12));
+    font-size: 2.2rem;
+}
+
+.grid-card-snippet {
+    font-size: 0.8rem;
+    line-height: 1.35;
+    color: rgba(15, 23, 42, 0.72);
+    margin: 0.35rem 0 0.5rem;
+    overflow: hidden;
+    display: -webkit-box;
+    -webkit-line-clamp: 2;
+    -webkit-box-orient: vertical;
+}
+
+.timeline-class {
+    font-weight: 700;
+}
+
+
 /* Improved empty state with animation */
 .empty-state {
     margin-top: 3rem;
@@ -0,0 +1,48 @@
+"""Small JPEG thumbnails for gallery cards, cached next to each entry."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from uuid import uuid4
+
+from .image_ingest import register_heif
+
+
+THUMBNAIL_DIR = ".thumbs"
+THUMBNAIL_EDGE = int(os.environ.get("GALLERY_THUMBNAIL_EDGE", "360"))
+THUMBNAIL_QUALITY = 80
+
+
+def thumbnail_path(image_path: Path) -> Path:
+    return image_path.parent / THUMBNAIL_DIR / f"{image_path.name}.jpg"
+
+
+def thumbnail_for(image_path: Path) -> Path:
+    """Return a cached thumbnail of ``image_path``, creating it on first use.
+
+    Thumbnails live in a hidden directory inside the entry, which listings,
+    exports and backups skip. If Pillow cannot read the image the original
+    path is returned so the card still shows something.
+    """
+
+    target = thumbnail_path(image_path)
+    try:
+        if target.stat().st_mtime >= image_path.stat().st_mtime:
+            return target
+    except FileNotFoundError:
+        pass
+    try:
+        from PIL import Image, ImageOps
+
+        register_heif()
+        with Image.open(image_path) as image:
+            preview = ImageOps.exif_transpose(image).convert("RGB")
+        preview.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE))
+        target.parent.mkdir(exist_ok=True)
+        temp_path = target.with_name(f".{target.name}.{uuid4().hex[:8]}.tmp")
+        preview.save(temp_path, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+        os.replace(temp_path, target)
+    except Exception:  # pragma: no cover - missing Pillow or unreadable image
+        return image_path
+    return target
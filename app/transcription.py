@@ -5,67 +5,410 @@ from __future__ import annotations
 import hashlib
 import os
 import tempfile
-from typing import Optional
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
 
 import streamlit as st
 
-try:
+from .audio_ingest import IngestedAudio, cached_pcm, ingest_audio
+from .constants import CLASS_BY_SLUG
+from .metrics import Summary, observe
+from .storage import batched_index_updates, save_segments, save_text
+from .whisper_weights import WeightsError, resolve_model
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import numpy as np
     from faster_whisper import WhisperModel
-except ImportError:  # pragma: no cover - handled at runtime when dependency missing
-    WhisperModel = None  # type: ignore
+
+# A file path, or 16 kHz mono float32 samples that skip decoding entirely.
+AudioInput = Union[str, "np.ndarray"]
 
 
 class TranscriptionRuntimeError(RuntimeError):
     """Raised when Whisper cannot transcribe audio for any reason."""
 
 
+@dataclass(frozen=True)
+class DecodingProfile:
+    """Model choice and decoding settings for one kind of transcription request."""
+
+    name: str
+    model_size: str
+    compute_type: str
+    beam_size: int
+    best_of: int
+    temperature: Tuple[float, ...]
+    condition_on_previous_text: bool
+
+    def transcribe_options(self) -> Dict[str, object]:
+        return {
+            "beam_size": self.beam_size,
+            "best_of": self.best_of,
+            "temperature": list(self.temperature),
+            "condition_on_previous_text": self.condition_on_previous_text,
+        }
+
+
+DECODING_PROFILES: Dict[str, DecodingProfile] = {
+    # Greedy decoding without temperature fallback: an instant draft in the recorder.
+    "fast": DecodingProfile(
+        name="fast",
+        model_size=os.environ.get("WHISPER_MODEL_SIZE", "tiny"),
+        compute_type=os.environ.get("WHISPER_COMPUTE_TYPE", "int8"),
+        beam_size=1,
+        best_of=1,
+        temperature=(0.0,),
+        condition_on_previous_text=False,
+    ),
+    # Beam search on a larger model with the standard fallback schedule.
+    "accurate": DecodingProfile(
+        name="accurate",
+        model_size=os.environ.get("WHISPER_ACCURATE_MODEL_SIZE", "small"),
+        compute_type=os.environ.get("WHISPER_ACCURATE_COMPUTE_TYPE", "int8"),
+        beam_size=5,
+        best_of=5,
+        temperature=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        condition_on_previous_text=True,
+    ),
+}
+WHISPER_LANGUAGE = os.environ.get("WHISPER_LANGUAGE", "").strip() or None
+# Seconds one language detection takes, used for the time-saved metric until one has been timed.
+DETECTION_ESTIMATE_SECONDS = float(os.environ.get("WHISPER_DETECTION_ESTIMATE_SECONDS", "0") or 0) or None
+# Only reuse a detected language when Whisper was reasonably sure about it.
+LANGUAGE_CACHE_MIN_PROBABILITY = 0.8
+WORD_TIMESTAMPS_ENABLED = os.environ.get("WHISPER_WORD_TIMESTAMPS", "0").lower() in {"1", "true", "yes"}
+TRANSCRIPT_UPGRADES_ENABLED = os.environ.get("WHISPER_UPGRADE_TRANSCRIPTS", "0").lower() in {"1", "true", "yes"}
+
+
+@dataclass
+class Transcript:
+    """Joined transcript text plus the columnar segment payload for the sidecar."""
+
+    text: str
+    segments: Dict[str, list]
+
+
+def _segments_payload(segments: List, with_words: bool) -> Dict[str, list]:
+    payload: Dict[str, list] = {"start": [], "end": [], "text": []}
+    words: Dict[str, list] = {"segment": [], "start": [], "end": [], "word": []}
+    for segment in segments:
+        text = (segment.text or "").strip()
+        if not text:
+            continue
+        position = len(payload["text"])
+        payload["start"].append(round(segment.start, 2))
+        payload["end"].append(round(segment.end, 2))
+        payload["text"].append(text)
+        for word in (getattr(segment, "words", None) or []) if with_words else []:
+            words["segment"].append(position)
+            words["start"].append(round(word.start, 2))
+            words["end"].append(round(word.end, 2))
+            words["word"].append(word.word.strip())
+    if words["word"]:
+        payload["words"] = words
+    return payload
+
+
 def _hash_audio(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
-@st.cache_resource(show_spinner=False)
-def load_whisper_model() -> Optional[WhisperModel]:
-    """Load the configured Whisper model or raise a descriptive error."""
+def _available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - non-Linux platforms
+        return os.cpu_count() or 1
+
+
+def pool_settings(profile_name: str = "fast") -> Tuple[int, int]:
+    """Return ``(pool_size, cpu_threads)`` sized against the cores available at startup.
 
-    if WhisperModel is None:
+    ``WHISPER_POOL_SIZE`` may be a number or ``auto`` (cores divided by the
+    per-instance thread count). ``WHISPER_CPU_THREADS`` defaults to an even
+    share of the cores across the pool. The accurate profile runs in the
+    background and uses ``WHISPER_ACCURATE_POOL_SIZE`` (default ``1``).
+    """
+
+    cores = _available_cores()
+    threads = int(os.environ.get("WHISPER_CPU_THREADS", "0") or 0)
+    if profile_name == "accurate":
+        size_setting = os.environ.get("WHISPER_ACCURATE_POOL_SIZE", "1").strip().lower()
+    else:
+        size_setting = os.environ.get("WHISPER_POOL_SIZE", "auto").strip().lower()
+    if size_setting == "auto":
+        size = max(1, cores // (threads or 2))
+    else:
+        size = max(1, int(size_setting))
+    if not threads:
+        threads = max(1, cores // size)
+    return size, threads
+
+
+def _create_whisper_model(profile: DecodingProfile, cpu_threads: int) -> WhisperModel:
+    """Load one instance of the profile's Whisper model or raise a descriptive error."""
+
+    # Imported on first use: faster_whisper pulls in CTranslate2 and tokenizers,
+    # which would otherwise slow down every cold start, recording or not.
+    try:
+        from faster_whisper import WhisperModel
+    except ImportError as exc:  # pragma: no cover - handled at runtime when dependency missing
         raise TranscriptionRuntimeError(
             "Whisper is unavailable. Install the 'faster-whisper' package or include it in your deployment image."
-        )
+        ) from exc
+
+    try:
+        model = resolve_model(profile.model_size)
+    except WeightsError as exc:
+        raise TranscriptionRuntimeError(f"Whisper weights are unavailable: {exc}") from exc
 
-    model_size = os.environ.get("WHISPER_MODEL_SIZE", "tiny")
-    compute_type = os.environ.get("WHISPER_COMPUTE_TYPE", "int8")
     device = os.environ.get("WHISPER_DEVICE", "cpu")
+    num_workers = int(os.environ.get("WHISPER_NUM_WORKERS", "1"))
 
     try:
-        return WhisperModel(model_size, device=device, compute_type=compute_type)
+        return WhisperModel(
+            model,
+            device=device,
+            compute_type=profile.compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+        )
     except Exception as exc:  # pragma: no cover - relies on runtime environment
         raise TranscriptionRuntimeError(
             "Failed to load the Whisper model. Check that the model weights are available and the machine has sufficient resources."
         ) from exc
 
 
-def transcribe_audio(audio_bytes: bytes) -> Optional[str]:
-    """Transcribe raw audio bytes with the configured Whisper model."""
+@dataclass
+class PoolStats:
+    size: int
+    loaded: int
+    idle: int
+    waiting: int
+
+
+class ModelPool:
+    """Fixed-size pool of Whisper models handed out in FIFO order.
+
+    Each checkout gets exclusive use of one model, so CTranslate2 never sees
+    concurrent calls on the same instance. Models are loaded lazily up to
+    ``size``; waiters are served strictly in arrival order and the time spent
+    queueing is recorded as ``whisper.<name>.pool_wait_seconds``.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], WhisperModel], size: int) -> None:
+        self.name = name
+        self.size = size
+        self._factory = factory
+        self._idle: List[WhisperModel] = []
+        self._loaded = 0
+        self._queue: Deque[object] = deque()
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def checkout(self) -> Iterator[WhisperModel]:
+        started = time.perf_counter()
+        turn = object()
+        with self._condition:
+            self._queue.append(turn)
+            while self._queue[0] is not turn or (not self._idle and self._loaded >= self.size):
+                self._condition.wait()
+            self._queue.popleft()
+            model = self._idle.pop() if self._idle else None
+            if model is None:
+                self._loaded += 1
+            self._condition.notify_all()
+        observe(f"whisper.{self.name}.pool_wait_seconds", time.perf_counter() - started)
+
+        if model is None:
+            try:
+                model = self._factory()
+            except BaseException:
+                with self._condition:
+                    self._loaded -= 1
+                    self._condition.notify_all()
+                raise
+        try:
+            yield model
+        finally:
+            with self._condition:
+                self._idle.append(model)
+                self._condition.notify_all()
+
+    def stats(self) -> PoolStats:
+        with self._condition:
+            return PoolStats(self.size, self._loaded, len(self._idle), len(self._queue))
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_pool(profile_name: str = "fast") -> ModelPool:
+    """Return the process-wide model pool for a decoding profile."""
+
+    profile = DECODING_PROFILES[profile_name]
+    size, cpu_threads = pool_settings(profile_name)
+    return ModelPool(profile_name, lambda: _create_whisper_model(profile, cpu_threads), size)
+
+
+_detected_languages: Dict[str, str] = {}
+_detection_cost = Summary()
+_language_lock = threading.Lock()
 
-    model = load_whisper_model()
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-        temp_audio.write(audio_bytes)
-        temp_audio_path = temp_audio.name
 
+def pinned_language(class_slug: Optional[str]) -> Optional[str]:
+    """Return the language pinned for a class, else the global ``WHISPER_LANGUAGE``."""
+
+    class_info = CLASS_BY_SLUG.get(class_slug or "")
+    if class_info and class_info.language:
+        return class_info.language
+    return WHISPER_LANGUAGE
+
+
+def _language_cache_key(class_slug: Optional[str]) -> str:
+    return class_slug or "*"
+
+
+def _record_detection_skipped() -> None:
+    """Count a skipped detection and, once its cost is known, the time it saved."""
+
+    with _language_lock:
+        saved = _detection_cost.mean if _detection_cost.count else DETECTION_ESTIMATE_SECONDS
+    observe("whisper.language_detection_skipped", 1)
+    if saved is not None:
+        observe("whisper.language_detection_saved_seconds", saved)
+
+
+def _remember_language(class_slug: Optional[str], language: Optional[str], probability: float) -> None:
+    if language and probability >= LANGUAGE_CACHE_MIN_PROBABILITY:
+        with _language_lock:
+            _detected_languages[_language_cache_key(class_slug)] = language
+
+
+def _detect_language(model: WhisperModel, samples: "np.ndarray", class_slug: Optional[str]) -> Optional[str]:
+    """Run language detection on decoded samples so its cost can be measured and cached."""
+
+    if not hasattr(model, "detect_language"):
+        return None
+    started = time.perf_counter()
+    language, probability, _all = model.detect_language(samples)
+    elapsed = time.perf_counter() - started
+    with _language_lock:
+        _detection_cost.count += 1
+        _detection_cost.total += elapsed
+    observe("whisper.language_detection_seconds", elapsed)
+    _remember_language(class_slug, language, probability)
+    return language
+
+
+def _transcribe_file(audio: AudioInput, profile_name: str, class_slug: Optional[str] = None) -> Optional[Transcript]:
+    profile = DECODING_PROFILES[profile_name]
+    language = pinned_language(class_slug)
+    if language is None:
+        with _language_lock:
+            language = _detected_languages.get(_language_cache_key(class_slug))
+    detected = False
     try:
-        segments, _info = model.transcribe(temp_audio_path)
+        if language is None and isinstance(audio, str):
+            from faster_whisper import decode_audio
+
+            # Decoded once, before a model is checked out, and shared by detection and transcription.
+            audio = decode_audio(audio)
+        with get_model_pool(profile_name).checkout() as model:
+            if language is None:
+                language = _detect_language(model, audio, class_slug)
+                detected = True
+            else:
+                _record_detection_skipped()
+            started = time.perf_counter()
+            segments, info = model.transcribe(
+                audio,
+                language=language,
+                word_timestamps=WORD_TIMESTAMPS_ENABLED,
+                **profile.transcribe_options(),
+            )
+            # Decoding is lazy; consume the generator while the model is ours.
+            segments = list(segments)
+            observe(f"whisper.{profile_name}.transcribe_seconds", time.perf_counter() - started)
+    except TranscriptionRuntimeError:
+        raise
     except Exception as exc:  # pragma: no cover - relies on runtime environment
         raise TranscriptionRuntimeError(
             "Transcription failed while processing the audio clip. Review the server logs for more details."
         ) from exc
+    if detected and language is None:
+        _remember_language(class_slug, info.language, info.language_probability)
+    payload = _segments_payload(segments, WORD_TIMESTAMPS_ENABLED)
+    transcript = " ".join(payload["text"]).strip()
+    return Transcript(text=transcript, segments=payload) if transcript else None
+
+
+def transcribe_audio_detailed(
+    audio_bytes: bytes,
+    profile: str = "fast",
+    class_slug: Optional[str] = None,
+) -> Optional[Transcript]:
+    """Transcribe raw audio bytes with a model from the profile's pool.
+
+    ``class_slug`` selects the pinned or previously detected language so
+    Whisper can skip its own detection pass.
+    """
+
+    samples = cached_pcm(audio_bytes)
+    if samples is not None:
+        observe("audio.pcm_cache_hits", 1)
+        return _transcribe_file(samples, profile, class_slug)
+
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
+        temp_audio.write(audio_bytes)
+        temp_audio_path = temp_audio.name
+
+    try:
+        return _transcribe_file(temp_audio_path, profile, class_slug)
     finally:
         try:
             os.remove(temp_audio_path)
         except OSError:
             pass
-    text_fragments = [segment.text.strip() for segment in segments if segment.text]
-    transcript = " ".join(text_fragments).strip()
-    return transcript or None
+
+
+def transcribe_audio(
+    audio_bytes: bytes,
+    profile: str = "fast",
+    class_slug: Optional[str] = None,
+) -> Optional[str]:
+    """Return only the transcript text of :func:`transcribe_audio_detailed`."""
+
+    transcript = transcribe_audio_detailed(audio_bytes, profile, class_slug)
+    return transcript.text if transcript else None
+
+
+_upgrade_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcript-upgrade")
+
+
+def _upgrade_transcript(entry_dir: Path, audio_path: Path) -> None:
+    try:
+        samples = cached_pcm(audio_path.read_bytes())
+        audio = samples if samples is not None else str(audio_path)
+        transcript = _transcribe_file(audio, "accurate", entry_dir.parent.parent.name)
+    except TranscriptionRuntimeError:
+        return
+    if transcript and entry_dir.is_dir():
+        with batched_index_updates():
+            save_text(entry_dir, "voice_transcript.txt", transcript.text)
+            save_segments(entry_dir, transcript.segments)
+
+
+def schedule_transcript_upgrade(entry_dir: Path, audio_path: Path) -> bool:
+    """Queue a background pass that rewrites the transcript with the accurate profile."""
+
+    if not TRANSCRIPT_UPGRADES_ENABLED:
+        return False
+    _upgrade_executor.submit(_upgrade_transcript, entry_dir, audio_path)
+    return True
 
 
 class AudioState:
@@ -74,12 +417,28 @@ class AudioState:
     state_key_bytes = "audio_bytes"
     state_key_hash = "audio_hash"
     state_key_transcript = "audio_transcript"
+    state_key_segments = "audio_segments"
+    state_key_suffix = "audio_suffix"
+
+    @classmethod
+    def set_recording(cls, recorded_bytes: bytes) -> IngestedAudio:
+        """Ingest a new recording and reset its transcript.
+
+        The hash is taken from the recorder's bytes so ``needs_update`` keeps
+        recognising the same clip after it has been re-encoded.
+        """
+
+        ingested = ingest_audio(recorded_bytes)
+        st.session_state[cls.state_key_bytes] = ingested.data
+        st.session_state[cls.state_key_suffix] = ingested.suffix
+        st.session_state[cls.state_key_hash] = _hash_audio(recorded_bytes)
+        cls.set_transcript(None)
+        return ingested
 
     @classmethod
-    def set_audio(cls, audio_bytes: bytes, transcript: Optional[str]) -> None:
-        st.session_state[cls.state_key_bytes] = audio_bytes
-        st.session_state[cls.state_key_hash] = _hash_audio(audio_bytes)
+    def set_transcript(cls, transcript: Optional[str], segments: Optional[Dict[str, list]] = None) -> None:
         st.session_state[cls.state_key_transcript] = transcript
+        st.session_state[cls.state_key_segments] = segments
 
     @classmethod
     def needs_update(cls, audio_bytes: bytes) -> bool:
@@ -89,17 +448,31 @@ class AudioState:
 
     @classmethod
     def clear(cls) -> None:
-        for key in (cls.state_key_bytes, cls.state_key_hash, cls.state_key_transcript):
+        for key in (
+            cls.state_key_bytes,
+            cls.state_key_hash,
+            cls.state_key_transcript,
+            cls.state_key_segments,
+            cls.state_key_suffix,
+        ):
             st.session_state.pop(key, None)
 
     @classmethod
     def get_audio(cls) -> Optional[bytes]:
         return st.session_state.get(cls.state_key_bytes)
 
+    @classmethod
+    def get_suffix(cls) -> str:
+        return st.session_state.get(cls.state_key_suffix, ".wav")
+
     @classmethod
     def get_transcript(cls) -> Optional[str]:
         return st.session_state.get(cls.state_key_transcript)
 
+    @classmethod
+    def get_segments(cls) -> Optional[Dict[str, list]]:
+        return st.session_state.get(cls.state_key_segments)
+
     @classmethod
     def get_hash(cls) -> Optional[str]:
         return st.session_state.get(cls.state_key_hash)
@@ -0,0 +1,199 @@
+"""Resumable, chunked uploads written straight into entry directories."""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional
+from uuid import uuid4
+
+from .constants import CLASS_BY_NAME, CLASS_BY_SLUG
+from .renditions import schedule_renditions
+from .storage import DATA_ROOT, MEDIA_EXTENSIONS, ensure_entry_dir, save_staged_files
+from .usage import QuotaExceededError, enforce_quota
+
+
+UPLOAD_PREFIX = ".upload-"
+MAX_CHUNK_BYTES = int(os.environ.get("UPLOAD_MAX_CHUNK_BYTES", str(16 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+UPLOAD_EXTENSIONS = MEDIA_EXTENSIONS["image"] | MEDIA_EXTENSIONS["video"]
+_ID_PATTERN = re.compile(r"^[0-9A-Za-z-]+$")
+
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be honoured."""
+
+    status = 400
+
+
+class UploadNotFound(UploadError):
+    status = 404
+
+
+class OffsetConflict(UploadError):
+    status = 409
+
+
+class ChecksumMismatch(UploadError):
+    status = 460
+
+
+class QuotaRejected(UploadError):
+    status = 507
+
+
+@dataclass
+class UploadState:
+    """Progress of one resumable upload, persisted next to its part file."""
+
+    upload_id: str
+    class_slug: str
+    date_value: str
+    entry_id: str
+    filename: str
+    length: int
+    offset: int = 0
+    completed_name: Optional[str] = None
+
+    @property
+    def location(self) -> str:
+        return f"{self.class_slug}/{self.date_value}/{self.entry_id}/{self.upload_id}"
+
+    @property
+    def entry_dir(self) -> Path:
+        return DATA_ROOT / self.class_slug / self.date_value / self.entry_id
+
+    @property
+    def part_path(self) -> Path:
+        return self.entry_dir / f"{UPLOAD_PREFIX}{self.upload_id}.part"
+
+    @property
+    def state_path(self) -> Path:
+        return self.entry_dir / f"{UPLOAD_PREFIX}{self.upload_id}.json"
+
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _upload_lock(upload_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _write_state(state: UploadState) -> None:
+    temp_path = state.state_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(asdict(state)), encoding="utf-8")
+    temp_path.replace(state.state_path)
+
+
+def create_upload(
+    class_name: str,
+    day: date,
+    filename: str,
+    length: int,
+    entry_id: Optional[str] = None,
+) -> UploadState:
+    """Register a new upload, creating a fresh entry unless one is given."""
+
+    if class_name not in CLASS_BY_NAME:
+        raise UploadError(f"Unknown class: {class_name}")
+    if Path(filename).suffix.lower() not in UPLOAD_EXTENSIONS:
+        raise UploadError("Only photo and video files can be uploaded.")
+    if length <= 0 or length > MAX_UPLOAD_BYTES:
+        raise UploadError("Upload size is missing or exceeds the configured limit.")
+
+    class_slug = CLASS_BY_NAME[class_name].slug
+    try:
+        enforce_quota(DATA_ROOT, class_slug, length)
+    except QuotaExceededError as exc:
+        raise QuotaRejected(str(exc)) from exc
+    if entry_id:
+        if not _ID_PATTERN.match(entry_id):
+            raise UploadError("Invalid entry id.")
+        entry_dir = DATA_ROOT / class_slug / day.isoformat() / entry_id
+        if not entry_dir.is_dir():
+            raise UploadNotFound("The target entry no longer exists.")
+    else:
+        entry_dir = ensure_entry_dir(class_name, day)
+
+    state = UploadState(
+        upload_id=uuid4().hex,
+        class_slug=class_slug,
+        date_value=day.isoformat(),
+        entry_id=entry_dir.name,
+        filename=filename,
+        length=length,
+    )
+    state.part_path.touch()
+    _write_state(state)
+    return state
+
+
+def get_upload(location: str) -> UploadState:
+    """Load upload state from a ``class/date/entry/upload`` location."""
+
+    parts = location.strip("/").split("/")
+    if len(parts) != 4:
+        raise UploadNotFound("Unknown upload.")
+    class_slug, date_value, entry_id, upload_id = parts
+    if class_slug not in CLASS_BY_SLUG or not all(
+        _ID_PATTERN.match(part) for part in (date_value, entry_id, upload_id)
+    ):
+        raise UploadNotFound("Unknown upload.")
+    state_path = DATA_ROOT / class_slug / date_value / entry_id / f"{UPLOAD_PREFIX}{upload_id}.json"
+    try:
+        return UploadState(**json.loads(state_path.read_text(encoding="utf-8")))
+    except (OSError, json.JSONDecodeError, TypeError) as exc:
+        raise UploadNotFound("Unknown upload.") from exc
+
+
+def verify_checksum(data: bytes, checksum: Optional[str]) -> None:
+    """Check a tus-style ``sha256 <base64 digest>`` header against a chunk."""
+
+    if not checksum:
+        return
+    algorithm, _, encoded = checksum.partition(" ")
+    if algorithm.lower() != "sha256":
+        raise UploadError("Only sha256 chunk checksums are supported.")
+    if base64.b64encode(hashlib.sha256(data).digest()).decode("ascii") != encoded.strip():
+        raise ChecksumMismatch("Chunk checksum mismatch; resend the chunk.")
+
+
+def write_chunk(location: str, offset: int, data: bytes, checksum: Optional[str]) -> UploadState:
+    """Append one verified chunk and finish the upload once it is complete."""
+
+    if len(data) > MAX_CHUNK_BYTES:
+        raise UploadError("Chunk exceeds the configured maximum size.")
+    verify_checksum(data, checksum)
+    state = get_upload(location)
+    with _upload_lock(state.upload_id):
+        state = get_upload(location)
+        if state.completed_name:
+            raise OffsetConflict("Upload already completed.")
+        if offset != state.offset:
+            raise OffsetConflict(f"Expected offset {state.offset}.")
+        if offset + len(data) > state.length:
+            raise UploadError("Chunk extends past the declared upload length.")
+        with state.part_path.open("r+b") as output:
+            output.seek(offset)
+            output.write(data)
+            output.truncate()
+            output.flush()
+            os.fsync(output.fileno())
+        state.offset = offset + len(data)
+        if state.offset == state.length:
+            (saved,) = save_staged_files(state.entry_dir, [(state.filename, state.part_path)])
+            state.completed_name = saved.name
+            schedule_renditions([saved])
+        # Completed state is kept so a client retrying a lost final response
+        # sees offset == length instead of restarting from zero.
+        _write_state(state)
+    return state
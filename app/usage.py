@@ -0,0 +1,270 @@
+"""Per-class storage usage counters and upload quotas.
+
+Each class keeps a small ledger at ``DATA_ROOT/.usage/<class>.json`` holding
+file and byte counts per date and media type. The storage layer adjusts it
+whenever it saves or deletes files, so reading usage never walks the volume.
+Run ``python -m app.usage --rebuild`` to recount from disk after files were
+changed by hand; with the S3 backend it recounts from the metadata index.
+
+Quotas are read from the environment, in megabytes:
+
+* ``USAGE_SOFT_QUOTA_MB`` – per-class size that triggers a warning on save.
+* ``USAGE_HARD_QUOTA_MB`` – per-class size beyond which saves are rejected.
+* ``USAGE_MIN_FREE_MB`` – free space the volume must keep after a save
+  (default ``256``).
+
+``0`` disables a limit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - advisory locks are POSIX-only
+    fcntl = None  # type: ignore
+
+from .constants import CLASS_INFOS, MEDIA_EXTENSIONS, MEDIA_TYPES
+
+
+def _megabytes(name: str, default: str = "0") -> int:
+    return int(float(os.environ.get(name, default)) * 1024 * 1024)
+
+
+USAGE_DIR = ".usage"
+SOFT_QUOTA_BYTES = _megabytes("USAGE_SOFT_QUOTA_MB")
+HARD_QUOTA_BYTES = _megabytes("USAGE_HARD_QUOTA_MB")
+MIN_FREE_BYTES = _megabytes("USAGE_MIN_FREE_MB", "256")
+USAGE_KINDS = (*MEDIA_TYPES, "other")
+
+# One change to the ledger: (file name, file count delta, byte delta).
+UsageChange = Tuple[str, int, int]
+
+
+class QuotaExceededError(RuntimeError):
+    """Raised when a save would take a class or the volume past its hard limit."""
+
+
+@dataclass
+class Counter:
+    files: int = 0
+    bytes: int = 0
+
+    def add(self, files: int, size: int) -> None:
+        self.files += files
+        self.bytes += size
+
+
+@dataclass
+class ClassUsage:
+    """Usage of one class, aggregated from its per-date, per-type ledger."""
+
+    total: Counter = field(default_factory=Counter)
+    by_date: Dict[date, Counter] = field(default_factory=dict)
+    by_media: Dict[str, Counter] = field(default_factory=lambda: {kind: Counter() for kind in USAGE_KINDS})
+
+
+def usage_kind(name: str) -> str:
+    """Return the media type a file counts under; text and sidecar files are "other"."""
+
+    suffix = Path(name).suffix.lower()
+    for kind, extensions in MEDIA_EXTENSIONS.items():
+        if suffix in extensions:
+            return kind
+    return "other"
+
+
+def _ledger_path(root: Path, class_slug: str) -> Path:
+    return root / USAGE_DIR / f"{class_slug}.json"
+
+
+@contextmanager
+def _ledger_lock(root: Path, class_slug: str) -> Iterator[None]:
+    lock_path = root / USAGE_DIR / f"{class_slug}.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _read_ledger(root: Path, class_slug: str) -> Dict[str, Dict[str, List[int]]]:
+    try:
+        ledger = json.loads(_ledger_path(root, class_slug).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return ledger.get("dates", {}) if isinstance(ledger, dict) else {}
+
+
+def _write_ledger(root: Path, class_slug: str, dates: Dict[str, Dict[str, List[int]]]) -> None:
+    path = _ledger_path(root, class_slug)
+    temp_path = path.with_name(f".{path.name}.{uuid4().hex[:8]}.tmp")
+    temp_path.write_text(json.dumps({"dates": dates}, sort_keys=True), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+def record_usage(root: Path, class_slug: str, day: str, changes: Iterable[UsageChange]) -> None:
+    """Apply file and byte deltas for one class and date to the ledger."""
+
+    changes = list(changes)
+    if not changes:
+        return
+    with _ledger_lock(root, class_slug):
+        dates = _read_ledger(root, class_slug)
+        kinds = dates.setdefault(day, {})
+        for name, files, size in changes:
+            counts = kinds.setdefault(usage_kind(name), [0, 0])
+            counts[0] = max(0, counts[0] + files)
+            counts[1] = max(0, counts[1] + size)
+        if not any(files for files, _size in kinds.values()):
+            dates.pop(day)
+        _write_ledger(root, class_slug, dates)
+
+
+def load_usage(root: Path, class_slug: str) -> ClassUsage:
+    usage = ClassUsage()
+    for day, kinds in _read_ledger(root, class_slug).items():
+        try:
+            day_value = date.fromisoformat(day)
+        except ValueError:
+            continue
+        day_counter = usage.by_date.setdefault(day_value, Counter())
+        for kind, (files, size) in kinds.items():
+            day_counter.add(files, size)
+            usage.by_media.setdefault(kind, Counter()).add(files, size)
+            usage.total.add(files, size)
+    usage.by_date = dict(sorted(usage.by_date.items(), reverse=True))
+    return usage
+
+
+def _indexed_usage(index: Dict) -> Dict[str, Dict[str, List[int]]]:
+    """Count files from a backend metadata index, using the sizes stored with each record."""
+
+    dates: Dict[str, Dict[str, List[int]]] = {}
+    for key, record in index.get("entries", {}).items():
+        day = key.partition("/")[0]
+        sizes = record.get("sizes", {})
+        # Records written before sizes were indexed count their files at zero bytes.
+        for name in {*record.get("files", []), *sizes}:
+            counts = dates.setdefault(day, {}).setdefault(usage_kind(name), [0, 0])
+            counts[0] += 1
+            counts[1] += sizes.get(name, 0)
+    return dates
+
+
+def rebuild_usage(root: Path, class_slug: str) -> ClassUsage:
+    """Recount a class from disk, or from the metadata index on an index backend, and replace its ledger."""
+
+    from .backends import get_backend
+
+    dates: Dict[str, Dict[str, List[int]]] = {}
+    class_dir = root / class_slug
+    backend = get_backend(root)
+    if backend.uses_index:
+        # The local root is only a read-through cache; the index knows every stored file.
+        dates = _indexed_usage(backend.read_index(class_slug))
+        with _ledger_lock(root, class_slug):
+            _write_ledger(root, class_slug, dates)
+        return load_usage(root, class_slug)
+    with _ledger_lock(root, class_slug):
+        for date_dir in sorted(class_dir.iterdir()) if class_dir.is_dir() else []:
+            if not date_dir.is_dir() or date_dir.name.startswith("."):
+                continue
+            kinds: Dict[str, List[int]] = {}
+            for entry_dir in date_dir.iterdir():
+                if not entry_dir.is_dir() or entry_dir.name.startswith("."):
+                    continue
+                for path in entry_dir.iterdir():
+                    if path.name.startswith(".") or not path.is_file():
+                        continue
+                    counts = kinds.setdefault(usage_kind(path.name), [0, 0])
+                    counts[0] += 1
+                    counts[1] += path.stat().st_size
+            if kinds:
+                dates[date_dir.name] = kinds
+        _write_ledger(root, class_slug, dates)
+    return load_usage(root, class_slug)
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def quota_status(
+    root: Path, class_slug: str, incoming_bytes: int = 0, staged_bytes: int = 0
+) -> Optional[Tuple[str, str]]:
+    """Return ``("warning"|"error", message)`` when a save of ``incoming_bytes`` hits a limit.
+
+    ``staged_bytes`` is the part of ``incoming_bytes`` already on the volume,
+    such as staged files that will be moved into place; it counts towards
+    the class quota but not against free space. Only the class ledger and
+    one ``statvfs`` call are read.
+    """
+
+    used = load_usage(root, class_slug).total.bytes + incoming_bytes
+    if HARD_QUOTA_BYTES and used > HARD_QUOTA_BYTES:
+        return "error", (
+            f"This class would use {format_bytes(used)}, over its {format_bytes(HARD_QUOTA_BYTES)} limit. "
+            "Delete or export older entries first."
+        )
+    if MIN_FREE_BYTES:
+        try:
+            free = shutil.disk_usage(root if root.exists() else root.parent).free
+        except OSError:
+            free = None
+        if free is not None and free - (incoming_bytes - staged_bytes) < MIN_FREE_BYTES:
+            return "error", (
+                f"The storage volume has only {format_bytes(free)} free. "
+                "Delete older entries before saving more media."
+            )
+    if SOFT_QUOTA_BYTES and used > SOFT_QUOTA_BYTES:
+        return "warning", (
+            f"This class now uses {format_bytes(used)}, past its {format_bytes(SOFT_QUOTA_BYTES)} soft limit."
+        )
+    return None
+
+
+def enforce_quota(root: Path, class_slug: str, incoming_bytes: int, staged_bytes: int = 0) -> None:
+    status = quota_status(root, class_slug, incoming_bytes, staged_bytes)
+    if status is not None and status[0] == "error":
+        raise QuotaExceededError(status[1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .storage import DATA_ROOT
+
+    parser = argparse.ArgumentParser(prog="python -m app.usage", description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="recount every class from disk first")
+    args = parser.parse_args(argv)
+    for class_info in CLASS_INFOS:
+        usage = rebuild_usage(DATA_ROOT, class_info.slug) if args.rebuild else load_usage(DATA_ROOT, class_info.slug)
+        media = ", ".join(
+            f"{kind} {counter.files} / {format_bytes(counter.bytes)}"
+            for kind, counter in usage.by_media.items()
+            if counter.files
+        )
+        print(f"{class_info.slug}: {usage.total.files} files, {format_bytes(usage.total.bytes)}" + (f" ({media})" if media else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
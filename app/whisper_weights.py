@@ -0,0 +1,158 @@
+"""Prefetch, pin and verify Whisper model weights on local disk.
+
+Without this, ``WhisperModel("tiny")`` downloads weights from the Hugging Face
+hub into an ephemeral cache on every cold machine. Prefetch them at build
+time (or onto the data volume) instead::
+
+    python -m app.whisper_weights prefetch            # every configured profile
+    python -m app.whisper_weights prefetch tiny small
+    python -m app.whisper_weights verify
+
+Each model lands in ``WHISPER_MODEL_DIR/<size>/`` next to a ``manifest.json``
+recording the revision and a SHA-256 per file. At runtime a local copy is
+verified once per process and loaded from disk. With ``WHISPER_OFFLINE=1``
+a missing or corrupt local copy is an error rather than a download.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+WHISPER_MODEL_DIR = Path(os.environ.get("WHISPER_MODEL_DIR", "models"))
+WHISPER_MODEL_REVISION = os.environ.get("WHISPER_MODEL_REVISION") or None
+WHISPER_OFFLINE = os.environ.get("WHISPER_OFFLINE", "0").lower() in {"1", "true", "yes"}
+MANIFEST_FILE = "manifest.json"
+HASH_CHUNK_BYTES = 4 * 1024 * 1024
+
+_verified: Dict[Path, bool] = {}
+_verify_lock = threading.Lock()
+
+
+class WeightsError(RuntimeError):
+    """Raised when local weights are missing, incomplete or fail verification."""
+
+
+def model_path(model_size: str, root: Path = WHISPER_MODEL_DIR) -> Path:
+    return root / model_size
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prefetch(model_size: str, root: Path = WHISPER_MODEL_DIR, revision: Optional[str] = WHISPER_MODEL_REVISION) -> Path:
+    """Download ``model_size`` into ``root`` and write its checksum manifest."""
+
+    try:
+        from faster_whisper.utils import download_model
+    except ImportError as exc:  # pragma: no cover - optional at import time
+        raise WeightsError("Prefetching needs the 'faster-whisper' package.") from exc
+
+    target = model_path(model_size, root)
+    target.mkdir(parents=True, exist_ok=True)
+    download_model(model_size, output_dir=str(target), revision=revision)
+    files = {
+        path.relative_to(target).as_posix(): _sha256(path)
+        for path in sorted(target.rglob("*"))
+        if path.is_file() and path.name != MANIFEST_FILE and ".cache" not in path.relative_to(target).parts
+    }
+    manifest = {
+        "model": model_size,
+        "revision": revision,
+        "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "files": files,
+    }
+    temp_path = target / f".{MANIFEST_FILE}.tmp"
+    temp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    temp_path.replace(target / MANIFEST_FILE)
+    return target
+
+
+def verify(target: Path) -> None:
+    """Check every file listed in ``target``'s manifest against its checksum."""
+
+    try:
+        manifest = json.loads((target / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        raise WeightsError(f"No readable {MANIFEST_FILE} in {target}.") from exc
+    for name, expected in manifest.get("files", {}).items():
+        path = target / name
+        if not path.is_file():
+            raise WeightsError(f"{path} is missing.")
+        if _sha256(path) != expected:
+            raise WeightsError(f"{path} does not match its recorded checksum.")
+
+
+def resolve_model(model_size: str, root: Path = WHISPER_MODEL_DIR) -> str:
+    """Return what to pass to ``WhisperModel``: a verified local path or the hub name.
+
+    Verification runs once per directory per process. In offline mode the
+    hub fallback is disabled and any problem with the local copy raises.
+    """
+
+    target = model_path(model_size, root)
+    if not (target / MANIFEST_FILE).exists():
+        if WHISPER_OFFLINE:
+            raise WeightsError(
+                f"WHISPER_OFFLINE is set but {target} has no prefetched weights. "
+                f"Run 'python -m app.whisper_weights prefetch {model_size}'."
+            )
+        return model_size
+    with _verify_lock:
+        if not _verified.get(target):
+            verify(target)
+            _verified[target] = True
+    return str(target)
+
+
+def _configured_sizes() -> List[str]:
+    from .transcription import DECODING_PROFILES
+
+    return sorted({profile.model_size for profile in DECODING_PROFILES.values()})
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, default=WHISPER_MODEL_DIR, help="model directory (WHISPER_MODEL_DIR)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prefetch_parser = subparsers.add_parser("prefetch", help="download weights and record checksums")
+    prefetch_parser.add_argument("sizes", nargs="*", help="model sizes (default: every decoding profile)")
+    verify_parser = subparsers.add_parser("verify", help="check prefetched weights against their manifests")
+    verify_parser.add_argument("sizes", nargs="*", help="model sizes (default: everything under --dir)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "prefetch":
+            for size in args.sizes or _configured_sizes():
+                print(f"{size}: {prefetch(size, args.dir)}")
+            return 0
+        sizes = args.sizes
+        if not sizes and args.dir.is_dir():
+            sizes = sorted(path.name for path in args.dir.iterdir() if (path / MANIFEST_FILE).exists())
+        if not sizes:
+            print(f"No prefetched models under {args.dir}.", file=sys.stderr)
+            return 1
+        for size in sizes:
+            verify(model_path(size, args.dir))
+            print(f"{size}: ok")
+    except WeightsError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,10 +8,15 @@ from typing import List, Optional, Tuple
 
 import streamlit as st
 
+from app.admission import AdmissionRejected, admit
 from app.constants import CLASS_BY_NAME, CLASS_OPTIONS
-from app.gallery import MEDIA_EMOJIS
-from app.storage import delete_entry, load_gallery
+from app.export import export_query
+from app.gallery import MEDIA_EMOJIS, render_entry_filters
+from app.metrics import snapshot as metrics_snapshot
+from app.sidecar import render_sidecar_link
+from app.storage import DATA_ROOT, MEDIA_TYPES, EntryQuery, delete_entry, iter_entries
 from app.styling import format_entry_time, inject_base_css
+from app.usage import HARD_QUOTA_BYTES, SOFT_QUOTA_BYTES, format_bytes, load_usage, quota_status, rebuild_usage
 
 
 @dataclass
@@ -25,46 +30,46 @@ class EntryOption:
     media_counts: Tuple[Tuple[str, int], ...]
 
 
-def _build_entry_options(class_slug: str) -> List[EntryOption]:
+def _build_entry_options(class_slug: str, query: EntryQuery) -> List[EntryOption]:
     options: List[EntryOption] = []
-    for bucket in load_gallery(class_slug):
-        for entry in bucket.entries:
-            snippet_source = entry.text.manual_text or entry.text.transcript_text
-            snippet: Optional[str] = None
-            if snippet_source:
-                snippet = snippet_source.strip()
-                if len(snippet) > 70:
-                    snippet = snippet[:67].strip() + "…"
-
-            counts: List[Tuple[str, int]] = []
-            for media_type, paths in entry.media_files.items():
-                if paths:
-                    counts.append((media_type, len(paths)))
-
-            label_parts: List[str] = [
-                bucket.date_value.strftime("%b %d, %Y"),
-                format_entry_time(entry.created_at),
-            ]
-            if counts:
-                readable = ", ".join(
-                    f"{count} {media_type}{'s' if count > 1 else ''}"
-                    for media_type, count in counts
-                )
-                label_parts.append(readable)
-            if snippet:
-                label_parts.append(f'"{snippet}"')
-
-            options.append(
-                EntryOption(
-                    label=" · ".join(label_parts),
-                    date_value=bucket.date_value,
-                    entry_id=entry.entry_id,
-                    created_at=entry.created_at,
-                    manual_text=entry.text.manual_text,
-                    transcript_text=entry.text.transcript_text,
-                    media_counts=tuple(counts),
-                )
+    for entry_date, entry in iter_entries(class_slug, query):
+        snippet_source = entry.text.manual_text or entry.text.transcript_text
+        snippet: Optional[str] = None
+        if snippet_source:
+            snippet = snippet_source.strip()
+            if len(snippet) > 70:
+                snippet = snippet[:67].strip() + "…"
+
+        counts: List[Tuple[str, int]] = []
+        for media_type in MEDIA_TYPES:
+            count = entry.media_count(media_type)
+            if count:
+                counts.append((media_type, count))
+
+        label_parts: List[str] = [
+            entry_date.strftime("%b %d, %Y"),
+            format_entry_time(entry.created_at),
+        ]
+        if counts:
+            readable = ", ".join(
+                f"{count} {media_type}{'s' if count > 1 else ''}"
+                for media_type, count in counts
             )
+            label_parts.append(readable)
+        if snippet:
+            label_parts.append(f'"{snippet}"')
+
+        options.append(
+            EntryOption(
+                label=" · ".join(label_parts),
+                date_value=entry_date,
+                entry_id=entry.entry_id,
+                created_at=entry.created_at,
+                manual_text=entry.text.manual_text,
+                transcript_text=entry.text.transcript_text,
+                media_counts=tuple(counts),
+            )
+        )
     return options
 
 
@@ -101,6 +106,109 @@ def _render_entry_details(selected_option: EntryOption) -> None:
         )
 
 
+def _render_export_section(class_slug: str, options: List[EntryOption]) -> None:
+    with st.expander("Export entries as ZIP"):
+        scope = st.radio(
+            "Export scope",
+            ("Whole class", "Date range", "Selected entries"),
+            horizontal=True,
+            key="export_scope",
+            label_visibility="collapsed",
+        )
+        start: Optional[date] = None
+        end: Optional[date] = None
+        entry_ids: List[str] = []
+        if scope == "Date range":
+            newest = options[0].date_value
+            oldest = options[-1].date_value
+            selected = st.date_input(
+                "Date range",
+                value=(oldest, newest),
+                min_value=oldest,
+                max_value=newest,
+                key="export_range",
+            )
+            if isinstance(selected, (tuple, list)):
+                start, end = (selected[0], selected[-1]) if selected else (oldest, newest)
+            else:
+                start = end = selected
+        elif scope == "Selected entries":
+            chosen = st.multiselect(
+                "Entries to export",
+                options,
+                format_func=lambda option: option.label,
+                key="export_entries",
+            )
+            if not chosen:
+                st.caption("Pick one or more entries to export.")
+                return
+            entry_ids = [option.entry_id for option in chosen]
+            if len({option.date_value for option in chosen}) == 1:
+                start = end = chosen[0].date_value
+        render_sidecar_link(export_query(class_slug, start, end, entry_ids), "⬇️ Download ZIP")
+
+
+def _render_usage(class_slug: str) -> None:
+    usage = load_usage(DATA_ROOT, class_slug)
+    limit = HARD_QUOTA_BYTES or SOFT_QUOTA_BYTES
+    title = f"Storage usage · {format_bytes(usage.total.bytes)}"
+    if limit:
+        title += f" of {format_bytes(limit)}"
+    with st.expander(title):
+        status = quota_status(DATA_ROOT, class_slug)
+        if status is not None:
+            (st.error if status[0] == "error" else st.warning)(status[1])
+        if limit:
+            st.progress(min(1.0, usage.total.bytes / limit))
+        st.dataframe(
+            [
+                {
+                    "type": f"{MEDIA_EMOJIS.get(kind, '📝')} {kind}",
+                    "files": counter.files,
+                    "size": format_bytes(counter.bytes),
+                }
+                for kind, counter in usage.by_media.items()
+                if counter.files
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+        if usage.by_date:
+            st.dataframe(
+                [
+                    {"date": day.isoformat(), "files": counter.files, "size": format_bytes(counter.bytes)}
+                    for day, counter in usage.by_date.items()
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+        st.caption("Counters update on every save and delete. Recount if files were changed by hand.")
+        if st.button("Recount from disk", key=f"usage-rebuild-{class_slug}"):
+            rebuild_usage(DATA_ROOT, class_slug)
+            st.rerun()
+
+
+def _render_diagnostics() -> None:
+    metrics = metrics_snapshot()
+    if not metrics:
+        return
+    with st.expander("Diagnostics"):
+        st.dataframe(
+            [
+                {
+                    "metric": name,
+                    "count": summary.count,
+                    "mean": round(summary.mean, 4),
+                    "max": round(summary.maximum, 4),
+                    "last": round(summary.last, 4),
+                }
+                for name, summary in metrics.items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
 def main() -> None:
     st.set_page_config(
         page_title="Manage entries",
@@ -136,12 +244,20 @@ def main() -> None:
     )
     class_info = CLASS_BY_NAME[class_name]
 
-    options = _build_entry_options(class_info.slug)
+    _render_usage(class_info.slug)
+    _render_diagnostics()
+
+    with st.expander("Filter entries"):
+        query = render_entry_filters(class_info.slug, f"manage-{class_info.slug}")
+
+    options = _build_entry_options(class_info.slug, query)
     if not options:
-        st.markdown(
-            "<div class='empty-state'>No entries to delete for this class yet.</div>",
-            unsafe_allow_html=True,
+        message = (
+            "No entries match these filters."
+            if query != EntryQuery()
+            else "No entries to delete for this class yet."
         )
+        st.markdown(f"<div class='empty-state'>{message}</div>", unsafe_allow_html=True)
         return
 
     st.markdown("<div class='field-label' style='margin-top:1.2rem;'>Entry</div>", unsafe_allow_html=True)
@@ -156,6 +272,8 @@ def main() -> None:
     st.markdown("<div class='media-pill'>Entry summary</div>", unsafe_allow_html=True)
     _render_entry_details(selected_option)
 
+    _render_export_section(class_info.slug, options)
+
     with st.container():
         st.markdown("<div class='danger-zone'>", unsafe_allow_html=True)
         st.markdown("<h3>Delete entry</h3>", unsafe_allow_html=True)
@@ -164,7 +282,13 @@ def main() -> None:
             unsafe_allow_html=True,
         )
         if st.button("Delete selected entry", key="confirm_delete", use_container_width=True):
-            if delete_entry(class_info.slug, selected_option.date_value, selected_option.entry_id):
+            try:
+                with admit("delete"):
+                    deleted = delete_entry(class_info.slug, selected_option.date_value, selected_option.entry_id)
+            except AdmissionRejected as exc:
+                st.session_state["delete_feedback"] = ("warning", str(exc))
+                st.rerun()
+            if deleted:
                 st.session_state["delete_feedback"] = (
                     "success",
                     f"Deleted entry from {selected_option.date_value.isoformat()} in {class_info.name}.",
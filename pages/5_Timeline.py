@@ -0,0 +1,4 @@
+from app.gallery import render_timeline_page
+
+
+render_timeline_page()